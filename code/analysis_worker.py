@@ -0,0 +1,73 @@
+import time
+import queue
+import threading
+from pipeline import AnalysisCancelled
+
+
+class AnalysisWorker(threading.Thread):
+    """
+    Runs the extraction / analysis in a background thread, so the GUI stays responsive. The pipeline reports its
+    progress in this thread and the worker only puts events into a thread-safe queue. The GUI takes them in its own
+    thread (Tk widgets can not be changed from other threads):
+
+        ('progress', stage, done, total, eta) -> progress of a stage, eta - estimated time to its end [s] or None
+        ('result', result)                    -> SpectrumResult of one analysed T_stop
+        ('finished', value)                   -> the task is done, value returned by the task
+        ('cancelled', None)                   -> the task was stopped by cancel()
+        ('failed', error)                     -> exception raised by the task
+
+    cancel() sets cancel_event checked by the pipeline after each extracted PMT file and after each group of spectra,
+    the task ends after the current file / group (results calculated before stay in the cache).
+    """
+
+    def __init__(self, task, *args, **kwargs):
+        """
+        :param task: Function running the pipeline (e.g., extract_and_analyse), it gets progress and cancel_event
+        keyword arguments (see AnalysisPipeline)
+        :param args: Positional arguments of the task
+        :param kwargs: Other keyword arguments of the task
+        """
+        super().__init__(name='AnalysisWorker', daemon=True)
+        self.task = task
+        self.args = args
+        self.kwargs = kwargs
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.stage = None
+        self.stage_start = None
+
+    def progress(self, stage, done, total, result=None):
+        """
+        Progress callback of the pipeline (called in the worker thread)
+        """
+        now = time.perf_counter()
+        if stage != self.stage:
+            self.stage, self.stage_start = stage, now
+        eta = (now - self.stage_start) / done * (total - done) if done else None
+        if result is not None:
+            self.events.put(('result', result))
+        self.events.put(('progress', stage, done, total, eta))
+
+    def run(self):
+        try:
+            value = self.task(*self.args, progress=self.progress, cancel_event=self.cancel_event, **self.kwargs)
+        except AnalysisCancelled:
+            self.events.put(('cancelled', None))
+        except Exception as error:
+            self.events.put(('failed', error))
+        else:
+            self.events.put(('finished', value))
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def take_events(self):
+        """
+        :return: List of events waiting in the queue (called by the GUI thread)
+        """
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
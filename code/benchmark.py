@@ -0,0 +1,238 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import datetime
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+from graph_analysis import CreatingFormatToAnalysis, PlotAnalysis
+from initial_rise_method import InitialRise
+from plot_charts import PlotChart
+from pdf_file import CreatePDFSummaryFile
+from file_organization import save_data_set_file, DividingRawDataToFolders
+from pipeline import SpectrumResult, render_spectrum_charts, create_summary_data_frame
+from glow_curve import GlowPeak, GlowCurveGenerator
+
+
+# extraction -> INTiBS measurement files to Data_set.npz, CreatingFormatToAnalysis -> reading Data_set.xlsx (the
+# original format) and Data_set.npz, mean_of_intensity_points -> binning, InitialRise -> IRM, PlotChart -> charts
+STAGES = ('extraction', 'CreatingFormatToAnalysis xlsx', 'CreatingFormatToAnalysis npz', 'mean_of_intensity_points',
+          'peak_finder', 'InitialRise', 'PlotChart', 'CreatePDFSummaryFile')
+FIRST_PMT = 3  # Numbers of the first PMT/Heater_measured files in the synthetic INTiBS folder
+FIRST_HEAT = 4
+
+
+def write_intibs_folder(folder, t_stops, data_frames, heat_rate, irradiation=1, first_step=0):
+    """
+    Saves synthetic spectra as INTiBS measurement files (T_stop file, wait file, PMT_measured and Heater_measured file
+    for each T_stop) with the same timestamps in PMT and heater files
+
+    :param folder: Folder for the measurement files
+    :param t_stops: List of T_stop temperatures [°C]
+    :param data_frames: List of DataFrames with 'Temp' and 'Int' columns
+    :param heat_rate: Heating rate [K/s] (time step between the points)
+    :param irradiation: Irradiation time in PMT headers (sub folder Irradiation_<irradiation>)
+    :param first_step: Number of measurement steps (4 files each) written to the folder before
+    """
+    os.makedirs(folder, exist_ok=True)
+    pmt_header = ['Header'] * 44
+    pmt_header[15] = 'Sequence position;1'
+    pmt_header[28] = f'Irradiation;{irradiation}'
+    for index, (t_stop, data_frame) in enumerate(zip(t_stops, data_frames)):
+        number = FIRST_PMT - 2 + 4 * (first_step + index)
+        time_data = np.arange(len(data_frame)) / heat_rate
+        with open(f'{folder}/{number:04d}_Heat_stop.csv', 'w', encoding='utf-8') as t_stop_file:
+            t_stop_file.write('\n'.join(['Header'] * 38 + [f'Tstop,{t_stop:.2f}']) + '\n')
+        with open(f'{folder}/{number + 1:04d}_Wait.csv', 'w', encoding='utf-8') as wait_file:
+            wait_file.write('Header\n')
+        for offset, header, values in ((2, pmt_header, data_frame['Int']), (3, ['Header'] * 41, data_frame['Temp'])):
+            name = 'PMT_measured' if offset == 2 else 'Heater_measured'
+            with open(f'{folder}/{number + offset:04d}_{name}.csv', 'w', encoding='utf-8') as measurement_file:
+                measurement_file.write('\n'.join(header) + '\n')
+                np.savetxt(measurement_file, np.column_stack((time_data, values)), delimiter=',', fmt='%.10g')
+
+
+def save_excel_data_set(path, t_stop_names, data_frames):
+    """
+    Saves spectra as Data_set.xlsx (the same format as the 'INTiBS folder' option creates)
+    """
+    frames = [data_frame.rename(columns={'Temp': 'Temperature', 'Int': 'Intensity'}).reset_index(drop=True)
+              for data_frame in data_frames]
+    pd.concat(frames, axis=1, keys=t_stop_names).to_excel(path)
+
+
+def benchmark_size(points, arguments, work_folder):
+    """
+    Times each stage of the analysis for one data size (synthetic Tmax-Tstop series)
+
+    :param points: Number of points in each spectrum
+    :param arguments: Parsed command line arguments
+    :param work_folder: Folder for Data_set, charts and report
+    :return: Dictionary with timings [s] and accuracy of each spectrum
+    """
+    generator = GlowCurveGenerator([GlowPeak.from_string(peak) for peak in arguments.peaks], arguments.heat_rate,
+                                   points=points, noise=arguments.noise, seed=arguments.seed)
+    t_stops = np.linspace(arguments.first_t_stop, arguments.last_t_stop, arguments.spectra)
+    t_stop_names, data_frames, truths = generator.tmax_tstop_series(t_stops)
+
+    size_folder = os.path.join(work_folder, f'points_{points}')
+    os.makedirs(size_folder, exist_ok=True)
+    data_set_path = os.path.join(size_folder, 'Data_set.npz')
+    save_data_set_file(data_set_path, t_stop_names, [data_frame['Temp'] for data_frame in data_frames],
+                       [data_frame['Int'] for data_frame in data_frames])
+    excel_data_set_path = os.path.join(size_folder, 'Data_set.xlsx')
+    save_excel_data_set(excel_data_set_path, t_stop_names, data_frames)
+    intibs_folder = os.path.join(size_folder, 'INTiBS')
+    write_intibs_folder(intibs_folder, t_stops, data_frames, arguments.heat_rate)
+
+    timings = dict.fromkeys(STAGES, 0.0)
+
+    start = time.perf_counter()
+    new_data = DividingRawDataToFolders(intibs_folder)
+    new_data.divide_data_TO_folders_sequence_position(FIRST_PMT, FIRST_HEAT, save_excel=False)
+    new_data.create_data_set_file()
+    timings['extraction'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    CreatingFormatToAnalysis(excel_data_set_path)
+    timings['CreatingFormatToAnalysis xlsx'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fine_format_file = CreatingFormatToAnalysis(data_set_path)
+    timings['CreatingFormatToAnalysis npz'] = time.perf_counter() - start
+
+    results = []
+    accuracy = []
+    for data_frame, t_stop, truth in zip(fine_format_file.final_data_frames, fine_format_file.t_stop_data, truths):
+        spectrum_accuracy = {'t_stop': t_stop, 't_max_true': truth['t_max'], 'energy_true': truth['energy']}
+        accuracy.append(spectrum_accuracy)
+        stage = 'mean_of_intensity_points'
+        try:
+            analysis = PlotAnalysis(data_frame)
+            start = time.perf_counter()
+            analysis.mean_of_intensity_points()
+            timings[stage] += time.perf_counter() - start
+
+            stage = 'peak_finder'
+            start = time.perf_counter()
+            t_max, i_max = analysis.peak_finder()
+            timings[stage] += time.perf_counter() - start
+
+            stage = 'InitialRise'
+            start = time.perf_counter()
+            initial_rise_method = InitialRise(analysis.data_frame, t_max)
+            timings[stage] += time.perf_counter() - start
+        except Exception as error:  # The algorithms do not handle every curve shape, it is reported too
+            spectrum_accuracy['error'] = f'{stage}: {type(error).__name__}: {error}'
+            continue
+
+        result = SpectrumResult(t_stop, t_max, i_max, initial_rise_method.e, initial_rise_method.a_uncertain)
+        result.algorithm_code = analysis.alg_code
+        result.set_chart_data(data_frame, fine_format_file.institute_apparatus, initial_rise_method)
+        results.append(result)
+        spectrum_accuracy.update({'algorithm_code': result.algorithm_code, 't_max': float(result.t_max),
+                                  'energy': float(result.energy)})
+
+    summary_data_frame = create_summary_data_frame(results, arguments.heat_rate)
+    summary_path = os.path.join(size_folder, 'summary_data_frame.xlsx')
+    summary_data_frame.to_excel(summary_path)
+
+    if not arguments.no_charts:
+        chart_path = os.path.join(size_folder, 'Charts')
+        os.makedirs(chart_path, exist_ok=True)
+        data_plot = PlotChart(chart_path)
+        start = time.perf_counter()
+        for result in results:
+            render_spectrum_charts(data_plot, result)
+        data_plot.t_max_stop_energy(list(summary_data_frame['T_stop (value)']), [result.t_max for result in results],
+                                    [result.energy for result in results])
+        timings['PlotChart'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        CreatePDFSummaryFile(summary_path, chart_path, size_folder)
+        timings['CreatePDFSummaryFile'] = time.perf_counter() - start
+
+    return {'points': points, 'spectra': len(accuracy), 'timings': timings, 'accuracy': accuracy}
+
+
+def git_commit():
+    """
+    :return: Hash of the current commit (None outside of git repository)
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summary_table(report):
+    """
+    :param report: Benchmark report
+    :return: DataFrame with time per spectrum [ms] of each stage, mean errors and number of failed spectra for each
+    data size
+    """
+    rows = []
+    for size in report['sizes']:
+        accuracy = pd.DataFrame(size['accuracy'], columns=['t_max', 't_max_true', 'energy', 'energy_true', 'error'])
+        row = {'points': size['points']}
+        row.update({stage: seconds / size['spectra'] * 1000 for stage, seconds in size['timings'].items()})
+        row['|dT_max| [°C]'] = (accuracy['t_max'] - accuracy['t_max_true']).abs().mean()
+        row['|dE| [eV]'] = (accuracy['energy'] - accuracy['energy_true']).abs().mean()
+        row['failed'] = int(accuracy['error'].notna().sum())
+        rows.append(row)
+    return pd.DataFrame(rows).set_index('points')
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark of the Tmax-Tstop analysis on synthetic glow curves')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 2000, 8000],
+                        help='Numbers of points in each spectrum')
+    parser.add_argument('--spectra', type=int, default=8, help='Number of T_stop spectra')
+    parser.add_argument('--first-t-stop', type=float, default=30.0, help='First T_stop [°C]')
+    parser.add_argument('--last-t-stop', type=float, default=100.0, help='Last T_stop [°C]')
+    parser.add_argument('--peaks', nargs='+', default=['0.9:1e11:1000:1', '1.1:1e11:600:2'],
+                        help="Glow peaks 'E:s[:amplitude[:order]]'")
+    parser.add_argument('--heat-rate', type=float, default=0.5, help='Heating rate [K/s]')
+    parser.add_argument('--noise', type=float, default=0.005, help='Intensity noise (part of the highest peak)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random numbers generator')
+    parser.add_argument('--no-charts', action='store_true', help='Without PlotChart and CreatePDFSummaryFile')
+    parser.add_argument('--work-folder', help='Folder for created files (default - temporary folder)')
+    parser.add_argument('--output', default='benchmark.json', help='JSON file with results')
+    parser.add_argument('--compare', help='JSON file from previous run, times are compared with it')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    arguments = parse_arguments(argv)
+    report = {'created': datetime.datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(),
+              'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+              'platform': platform.platform(), 'parameters': vars(arguments).copy(), 'sizes': []}
+
+    with tempfile.TemporaryDirectory() as temporary_folder:
+        work_folder = arguments.work_folder or temporary_folder
+        for points in arguments.sizes:
+            report['sizes'].append(benchmark_size(points, arguments, work_folder))
+            print(f'{points} points done', file=sys.stderr)
+
+    with open(arguments.output, 'w', encoding='utf-8') as output_file:
+        json.dump(report, output_file, ensure_ascii=False, indent=1)
+
+    table = summary_table(report)
+    print('Time per spectrum [ms] and mean errors')
+    print(table.round(3).to_string())
+
+    if arguments.compare:
+        with open(arguments.compare, encoding='utf-8') as previous_file:
+            previous = summary_table(json.load(previous_file))
+        stages = [stage for stage in STAGES if stage in previous.columns]
+        print(f'Speed-up against {arguments.compare} (previous time / current time)')
+        print((previous[stages] / table[stages].replace(0, np.nan)).dropna(how='all').round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import numpy as np
+
+
+class SortedBins:
+    """
+    Values sorted by integer bin and by value inside each bin, so every bin is a sorted segment
+    offsets[i]:offsets[i + 1] and medians / percentiles of all bins are read from the segment boundaries (like
+    groupby(bins).median() without a DataFrame).
+
+    The rows are grouped by bin with a stable sort of small integers (radix sort, nothing to do for bins that are
+    already sorted). Bins of similar size (up to the same power of two) are then rows of one padded array sorted
+    along the rows, which is several times faster than argsort of all values and needs at most twice their memory.
+    """
+
+    def __init__(self, bins, values, size=None):
+        """
+        :param bins: Array with non-negative integer bin numbers (e.g., segment numbers, temperature windows)
+        :param values: Array with values without NaN (e.g., intensities)
+        :param size: Number of bins (default - the biggest bin number + 1)
+        """
+        bins = np.asarray(bins, dtype=np.int64)
+        values = np.asarray(values, dtype=float)
+        self.size = size if size is not None else int(bins.max()) + 1 if len(bins) else 0
+        self.counts = np.bincount(bins, minlength=self.size)
+        self.offsets = np.concatenate(([0], np.cumsum(self.counts))).astype(np.int64)
+
+        if np.any(bins[1:] < bins[:-1]):
+            order = np.argsort(bins.astype(np.min_scalar_type(self.size)), kind='stable')
+            bins = bins[order]
+            values = values[order]
+
+        self.values = np.empty(len(values))
+        widths = 2 ** np.ceil(np.log2(np.maximum(self.counts, 1))).astype(np.int64)
+        for width in np.unique(widths[self.counts > 0]):
+            same_width = widths == width
+            # Flat index of the row in the padded array: row of its bin * width + position inside the bin
+            shift = (np.cumsum(same_width) - 1) * width - self.offsets[:-1]
+            if np.all(same_width[self.counts > 0]):
+                rows = slice(None)
+                cells = np.arange(len(bins)) + shift[bins]
+            else:
+                rows = np.flatnonzero(same_width[bins])
+                cells = rows + shift[bins[rows]]
+            padded = np.full((np.count_nonzero(same_width), width), np.inf)
+            padded.ravel()[cells] = values[rows]
+            padded.sort(axis=1)
+            self.values[rows] = padded.ravel()[cells]
+
+    def median(self):
+        """
+        :return: Array with the median of each bin (mean of the two middle values in even bins, NaN in empty bins)
+        """
+        middle = self.offsets[:-1] + self.counts // 2
+        even = (self.counts % 2 == 0).astype(np.int64)
+        filled = self.counts > 0
+        median = np.full(self.size, np.nan)
+        median[filled] = (self.values[(middle - even)[filled]] + self.values[middle[filled]]) / 2
+        return median
+
+    def percentile(self, q):
+        """
+        :param q: Percentile or array of percentiles [0-100]
+        :return: Array (size) or (len(q), size) with percentiles of each bin, linear interpolation like np.percentile
+        (NaN in empty bins)
+        """
+        q = np.asarray(q, dtype=float)
+        filled = self.counts > 0
+        position = q[..., None] / 100 * (self.counts[filled] - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, self.counts[filled] - 1)
+        first = self.offsets[:-1][filled]
+        low_values = self.values[first + lower]
+        high_values = self.values[first + upper]
+        result = np.full(q.shape + (self.size,), np.nan)
+        result[..., filled] = low_values + (high_values - low_values) * (position - lower)
+        return result
@@ -0,0 +1,300 @@
+import os
+import argparse
+import time
+from pipeline import *
+from profiling import profiler, ENVIRONMENT_VARIABLE
+from watch_folder import FolderWatcher
+from curve_fitting import SMOOTHING_METHODS
+from graph_analysis import WINDOW_STATISTICS
+from initial_rise_method import UNCERTAINTY_METHODS, FITTERS
+from parameter_sweep import run_parameter_sweep, save_sweep_table
+
+
+def add_analysis_arguments(parser):
+    """
+    Options of AnalysisPipeline (the same for each command that runs the analysis)
+    """
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of processes analysing spectra (1 - serial, 0 - all CPU cores)')
+    add_parameter_arguments(parser)
+    add_cache_arguments(parser)
+    add_chart_arguments(parser)
+
+
+def add_parameter_arguments(parser):
+    """
+    Analysis parameters (ANALYSIS_PARAMETERS) that can be changed from the command line
+    """
+    parser.add_argument('--window-statistic', choices=WINDOW_STATISTICS,
+                        default=ANALYSIS_PARAMETERS['window_statistic'],
+                        help='Intensity of a mean point: mean or median of the points in the temperature window')
+    parser.add_argument('--smoothing', choices=SMOOTHING_METHODS, default=ANALYSIS_PARAMETERS['smoothing'],
+                        help='Curve fitted to mean intensity points: degree 10 polynomial (polyfit), the same in '
+                             'Chebyshev basis (stable) or Savitzky-Golay filter')
+    parser.add_argument('--fitter', choices=list(FITTERS), default=ANALYSIS_PARAMETERS['fitter'],
+                        help='Line of the Initial Rise Method: blind fit (original) or the steeper segment of the best '
+                             'two-segment linear regression')
+    parser.add_argument('--uncertainty', choices=UNCERTAINTY_METHODS, default=ANALYSIS_PARAMETERS['uncertainty'],
+                        help='u(E) from the covariance of the linear fit, bootstrap or jackknife of the fit points '
+                             '(also adds the confidence interval of E to the summary)')
+    parser.add_argument('--resamples', type=int, default=ANALYSIS_PARAMETERS['resamples'],
+                        help='Number of bootstrap resamples of each T_stop')
+
+
+def add_cache_arguments(parser):
+    """
+    ResultCache options (the cache is used only with --cache)
+    """
+    parser.add_argument('--cache', action=argparse.BooleanOptionalAction, default=False,
+                        help='Take spectra analysed before from the result cache and store new results in it '
+                             '(off by default)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_FOLDER, help='Folder of the result cache')
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_CACHE_SIZE / 1024 ** 2,
+                        help='Maximum size of the result cache [MB]')
+
+
+def add_alignment_arguments(parser):
+    """
+    TimeAlignment options
+    """
+    parser.add_argument('--align', choices=['nearest', 'linear'], default='nearest',
+                        help='Temperature for PMT timestamps: nearest heater sample or linear interpolation')
+    parser.add_argument('--time-tolerance', type=float, default=0.0,
+                        help='Max distance between PMT and heater timestamps (0 - equal timestamps only)')
+
+
+def add_chart_arguments(parser):
+    """
+    Chart options (analysis and rendering of stored results)
+    """
+    parser.add_argument('--render-workers', type=int,
+                        help='Number of processes rendering charts (default - the same as --workers)')
+    parser.add_argument('--dpi', type=int, default=100, help='Resolution of the charts')
+    parser.add_argument('--chart-format', default='png',
+                        help='Format of the charts (png, jpg, svg, pdf...), the report is created for png and jpg')
+    parser.add_argument('--charts', choices=CHART_POLICIES, default='all',
+                        help='Charts to create: none, summary chart only, charts for the report, all')
+
+
+def add_sweep_arguments(parser):
+    """
+    Lists of analysis parameter values (default - one value from ANALYSIS_PARAMETERS)
+    """
+    parser.add_argument('--bin-step', type=int, nargs='+', help='Distances between temperature windows [°C]')
+    parser.add_argument('--bin-width', type=int, nargs='+', help='Widths of temperature windows [°C]')
+    parser.add_argument('--window-statistic', choices=WINDOW_STATISTICS, nargs='+',
+                        help='Intensities of mean points (mean or median of a window)')
+    parser.add_argument('--smoothing', choices=SMOOTHING_METHODS, nargs='+', help='Curves fitted to mean points')
+    parser.add_argument('--dp', type=int, nargs='+', help='Minimal numbers of T points in the shelf (Delta Positive)')
+    parser.add_argument('--dn', type=int, nargs='+', help='Minimal numbers of T points in the shelf (Delta Negative)')
+    parser.add_argument('--cut-bins', type=int, nargs='+',
+                        help='Numbers of intensity intervals, the lowest one is not analysed by peak_finder')
+    parser.add_argument('--rise-threshold', type=float, nargs='+', help='Parts of the intensity range used by IRM')
+    parser.add_argument('--residual-limit', type=float, nargs='+',
+                        help='The biggest residuals of significant points in the IRM blind fit')
+    parser.add_argument('--fit-percent', type=float, nargs='+',
+                        help='Points where the blind fit is at least this %% of ln(I) are fitted by IRM')
+    parser.add_argument('--fitter', choices=list(FITTERS), nargs='+', help='Fitters of the IRM line')
+
+
+def pipeline_options(arguments):
+    """
+    :param arguments: Parsed command line arguments
+    :return: Keyword arguments for AnalysisPipeline
+    """
+    return {'workers': arguments.workers, 'render_workers': arguments.render_workers, 'dpi': arguments.dpi,
+            'chart_format': arguments.chart_format, 'chart_policy': arguments.charts, 'cache': result_cache(arguments),
+            'parameters': analysis_parameters(arguments)}
+
+
+def analysis_parameters(arguments):
+    """
+    :param arguments: Parsed command line arguments
+    :return: Analysis parameters changed by add_parameter_arguments options
+    """
+    return {'window_statistic': arguments.window_statistic, 'smoothing': arguments.smoothing,
+            'fitter': arguments.fitter, 'uncertainty': arguments.uncertainty, 'resamples': arguments.resamples}
+
+
+def sweep_values(arguments):
+    """
+    :param arguments: Parsed command line arguments of the sweep command
+    :return: Dictionary parameter name -> list of values given by add_sweep_arguments options (parameters without sweep
+    options, e.g. uncertainty, are skipped)
+    """
+    return {name: getattr(arguments, name) for name in ANALYSIS_PARAMETERS if getattr(arguments, name, None)}
+
+
+def result_cache(arguments):
+    """
+    :param arguments: Parsed command line arguments
+    :return: ResultCache (--cache) or None
+    """
+    if not arguments.cache:
+        return None
+    return ResultCache(arguments.cache_dir, int(arguments.cache_size * 1024 ** 2))
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='T_max - T_stop analysis without the GUI')
+    parser.add_argument('--profile', metavar='TRACE_FILE',
+                        help=f'Measure each stage and save Chrome trace file (also {ENVIRONMENT_VARIABLE} variable)')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='Trace peak memory of each stage with tracemalloc (much slower)')
+    sub_parsers = parser.add_subparsers(dest='command', required=True)
+
+    analysis_parser = sub_parsers.add_parser('analysis', help='Analyse one or more Data_set Excel files')
+    analysis_parser.add_argument('data_sets', nargs='+', help='Data_set files (.xlsx or .npz)')
+    analysis_parser.add_argument('--heat-rate', type=float, required=True, help='Heating rate')
+    add_analysis_arguments(analysis_parser)
+
+    folder_parser = sub_parsers.add_parser('intibs', help='Extract INTiBS folder and (optionally) analyse it')
+    folder_parser.add_argument('folder', help='Folder with INTiBS measurement files')
+    folder_parser.add_argument('--first-pmt', type=int, required=True, help='First PMT_measured file number')
+    folder_parser.add_argument('--first-heat', type=int, required=True, help='First Heater_measured file number')
+    folder_parser.add_argument('--heat-rate', type=float, help='Heating rate, if given the extracted spectra are '
+                                                               'analysed in memory (Excel files are saved in '
+                                                               'the background)')
+    folder_parser.add_argument('--no-excel', action='store_true',
+                               help='Save only binary Data_set.npz (without Excel files)')
+    folder_parser.add_argument('--incremental', action='store_true',
+                               help='Extract only measurement files that were not extracted before')
+    add_alignment_arguments(folder_parser)
+    add_analysis_arguments(folder_parser)
+
+    watch_parser = sub_parsers.add_parser('watch', help='Watch INTiBS folder and analyse new measurements')
+    watch_parser.add_argument('folder', help='Folder with INTiBS measurement files')
+    watch_parser.add_argument('--first-pmt', type=int, required=True, help='First PMT_measured file number')
+    watch_parser.add_argument('--first-heat', type=int, required=True, help='First Heater_measured file number')
+    watch_parser.add_argument('--heat-rate', type=float, required=True, help='Heating rate')
+    watch_parser.add_argument('--poll-interval', type=float, default=5.0, help='Time between folder checks [s]')
+    watch_parser.add_argument('--settle-time', type=float, default=2.0,
+                              help='Time without changes after which a file is complete [s]')
+    watch_parser.add_argument('--duration', type=float, help='Watching time [s] (default - until Ctrl+C)')
+    watch_parser.add_argument('--workers', type=int, default=1,
+                              help='Number of processes analysing spectra (1 - serial, 0 - all CPU cores)')
+    add_alignment_arguments(watch_parser)
+    add_parameter_arguments(watch_parser)
+    add_cache_arguments(watch_parser)
+
+    convert_parser = sub_parsers.add_parser('convert', help='Save Data_set Excel files as binary .npz files')
+    convert_parser.add_argument('data_sets', nargs='+', help='Data_set Excel files')
+
+    sweep_parser = sub_parsers.add_parser('sweep', help='Analyse Data_set files with a grid of analysis parameters')
+    sweep_parser.add_argument('data_sets', nargs='+', help='Data_set files (.xlsx or .npz)')
+    sweep_parser.add_argument('--workers', type=int, default=1,
+                              help='Number of processes analysing spectra (1 - serial, 0 - all CPU cores)')
+    sweep_parser.add_argument('--output-format', choices=['xlsx', 'csv'], default='xlsx',
+                              help='Format of the results table (saved next to the Data_set file)')
+    add_sweep_arguments(sweep_parser)
+
+    charts_parser = sub_parsers.add_parser('charts', help='Render charts from stored analysis results')
+    charts_parser.add_argument('results', help=f'{RESULTS_FILE_NAME} file from the chart folder')
+    add_chart_arguments(charts_parser)
+
+    return parser.parse_args(argv)
+
+
+def run_analysis(data_set_paths, heat_rate, **options):
+    """
+    Runs the analysis for each Data_set file and prints the time of each run
+    :param data_set_paths: List of Data_set Excel files
+    :param heat_rate: Heating rate
+    :param options: Other AnalysisPipeline parameters (workers, dpi...)
+    :return: List of summary DataFrames
+    """
+    summaries = []
+    start_all = time.perf_counter()
+    for data_set_path in data_set_paths:
+        start = time.perf_counter()
+        pipeline = AnalysisPipeline(data_set_path, heat_rate, **options)
+        summaries.append(pipeline.run())
+        print(f'{data_set_path}: {len(pipeline.results)} spectra in {time.perf_counter() - start:.2f} s')
+        if pipeline.cache is not None:
+            print(f'Result cache: {pipeline.cache.hits} hits, {pipeline.cache.misses} misses')
+
+    time_all = time.perf_counter() - start_all
+    print(f'Analysed {len(data_set_paths)} data sets in {time_all:.2f} s '
+          f'({len(data_set_paths) / time_all:.3f} data sets/s)')
+    return summaries
+
+
+def print_profile():
+    """
+    Saves the trace file and prints the time of each stage and each T_stop
+    """
+    pd.set_option('display.width', 200)
+    print(f'Profile of stages (trace file: {profiler.save()})')
+    print(profiler.summary().round(1).to_string())
+    t_stop_summary = profiler.t_stop_summary()
+    if not t_stop_summary.empty:
+        print('Wall time of each T_stop [ms]')
+        print(t_stop_summary.round(1).to_string())
+
+
+def main(argv=None):
+    arguments = parse_arguments(argv)
+    if arguments.profile:
+        profiler.enable(arguments.profile, arguments.profile_memory)
+
+    if arguments.command == 'analysis':
+        run_analysis(arguments.data_sets, arguments.heat_rate, **pipeline_options(arguments))
+    elif arguments.command == 'charts':
+        start = time.perf_counter()
+        render_workers = 1 if arguments.render_workers is None else arguments.render_workers
+        render_stored_charts(arguments.results, arguments.charts, render_workers, arguments.dpi,
+                             arguments.chart_format)
+        print(f'Charts created in {time.perf_counter() - start:.2f} s')
+    elif arguments.command == 'watch':
+        watcher = FolderWatcher(arguments.folder, arguments.first_pmt, arguments.first_heat, arguments.heat_rate,
+                                arguments.poll_interval, arguments.settle_time,
+                                time_alignment=TimeAlignment(arguments.align, arguments.time_tolerance),
+                                cache=result_cache(arguments), workers=arguments.workers,
+                                parameters=analysis_parameters(arguments))
+        print(f'Watching {arguments.folder} (Ctrl+C to stop)')
+        watcher.run(arguments.duration)
+    elif arguments.command == 'sweep':
+        values = sweep_values(arguments)
+        for data_set_path in arguments.data_sets:
+            start = time.perf_counter()
+            table = run_parameter_sweep(data_set_path, values, arguments.workers)
+            path = save_sweep_table(table, data_set_path, arguments.output_format)
+            print(f'{path}: {table["combination"].nunique() if len(table) else 0} parameter combinations in '
+                  f'{time.perf_counter() - start:.2f} s')
+    elif arguments.command == 'convert':
+        for excel_file_path in arguments.data_sets:
+            print(f'{convert_data_set_file(excel_file_path)} created')
+    else:
+        start = time.perf_counter()
+        time_alignment = TimeAlignment(arguments.align, arguments.time_tolerance)
+        if arguments.heat_rate is None:
+            data_set_paths, dropped_samples = extract_intibs_folder(arguments.folder, arguments.first_pmt,
+                                                                    arguments.first_heat, not arguments.no_excel,
+                                                                    time_alignment, arguments.incremental)
+            for data_set_path in data_set_paths:
+                print(f'Data_set file: {data_set_path}')
+            print(f'Extracted in {time.perf_counter() - start:.2f} s')
+        else:
+            pipelines, dropped_samples = extract_and_analyse(arguments.folder, arguments.first_pmt,
+                                                             arguments.first_heat, arguments.heat_rate,
+                                                             not arguments.no_excel, time_alignment,
+                                                             arguments.incremental, **pipeline_options(arguments))
+            for pipeline in pipelines:
+                print(f'{pipeline.excel_file_path}: {len(pipeline.results)} spectra analysed')
+            print(f'Extracted and analysed in {time.perf_counter() - start:.2f} s')
+        for path, dropped_in_sub_folder in dropped_samples.items():
+            for t_stop, dropped in dropped_in_sub_folder.items():
+                if dropped > 0:
+                    print(f'{os.path.dirname(path)} T_stop {t_stop}: {dropped} PMT samples without temperature dropped')
+        if arguments.incremental:
+            for path, dropped_in_sub_folder in dropped_samples.items():
+                print(f'{os.path.dirname(path)}: {len(dropped_in_sub_folder)} new T_stop spectra extracted')
+            if not dropped_samples:
+                print('No new T_stop spectra extracted')
+
+    if profiler.enabled:
+        print_profile()
+
+
+if __name__ == "__main__":
+    main()
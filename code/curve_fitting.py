@@ -0,0 +1,149 @@
+import numpy as np
+
+
+# Smoothing of mean intensity points (over fitted curve used by peak_finder):
+#   polyfit   -> polynomial of POLYNOMIAL_DEGREE in powers of temperature (like np.polyfit)
+#   chebyshev -> polynomial of POLYNOMIAL_DEGREE in Chebyshev basis on temperatures mapped to [-1, 1]
+#   savgol    -> Savitzky-Golay filter (SAVGOL_DEGREE polynomial in a window of SAVGOL_WINDOW points)
+SMOOTHING_METHODS = ('polyfit', 'chebyshev', 'savgol')
+POLYNOMIAL_DEGREE = 10
+SAVGOL_WINDOW = 9
+SAVGOL_DEGREE = 3
+
+
+class CurveBatch:
+    """
+    Curves of different lengths stacked into (S, L) arrays padded with zeros. mask marks the real points, so all
+    curves can be fitted with one call of batched NumPy functions.
+    """
+
+    def __init__(self, xs, ys):
+        """
+        :param xs: List of x arrays (one for each curve)
+        :param ys: List of y arrays
+        """
+        self.lengths = np.array([len(x) for x in xs], dtype=np.int64)
+        width = int(self.lengths.max()) if len(xs) else 0
+        self.mask = np.arange(width) < self.lengths[:, None]
+        self.x = np.zeros(self.mask.shape)
+        self.y = np.zeros(self.mask.shape)
+        self.x[self.mask] = np.concatenate(xs) if len(xs) else []
+        self.y[self.mask] = np.concatenate(ys) if len(ys) else []
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def unstack(self, values):
+        """
+        :param values: (S, L) array
+        :return: List of arrays with values of real points of each curve
+        """
+        return [row[:length] for row, length in zip(values, self.lengths)]
+
+
+def batch_least_squares(design, batch):
+    """
+    Least squares solutions of all curves at once (like np.polyfit: columns scaled to unit norm, singular values
+    smaller than len(x) * eps * the biggest one are skipped). Padded rows are set to zero, so they do not change the
+    solutions.
+
+    :param design: (S, L, K) design matrices
+    :param batch: CurveBatch
+    :return: (S, K) coefficients
+    """
+    design = np.where(batch.mask[:, :, None], design, 0.0)
+    scale = np.sqrt((design * design).sum(axis=1))
+    scale[scale == 0] = 1
+    u, s, vt = np.linalg.svd(design / scale[:, None, :], full_matrices=False)
+    cutoff = (batch.lengths * np.finfo(float).eps)[:, None] * s.max(axis=1, keepdims=True)
+    inverse_s = np.divide(1, s, out=np.zeros_like(s), where=s > cutoff)
+    uy = np.einsum('slk,sl->sk', u, np.where(batch.mask, batch.y, 0.0))
+    return np.einsum('skj,sk->sj', vt, inverse_s * uy) / scale
+
+
+def polynomial_fit(batch, degree):
+    """
+    :param batch: CurveBatch
+    :param degree: Degree of the polynomial
+    :return: (S, degree + 1) coefficients (the highest power first, like np.polyfit), (S, L) fitted values
+    """
+    design = batch.x[:, :, None] ** np.arange(degree, -1, -1)
+    coefficients = batch_least_squares(design, batch)
+    fitted = np.zeros(batch.x.shape)
+    for coefficient in coefficients.T:  # Horner scheme like np.polyval
+        fitted = fitted * batch.x + coefficient[:, None]
+    return coefficients, fitted
+
+
+def chebyshev_fit(batch, degree):
+    """
+    Fit in Chebyshev basis, x of each curve is mapped to [-1, 1], so the fit is well conditioned for any degree
+
+    :param batch: CurveBatch
+    :param degree: Degree of the polynomial
+    :return: (S, degree + 1) Chebyshev coefficients, (S, L) fitted values
+    """
+    lowest = np.where(batch.mask, batch.x, np.inf).min(axis=1, keepdims=True)
+    highest = np.where(batch.mask, batch.x, -np.inf).max(axis=1, keepdims=True)
+    span = np.where(highest > lowest, highest - lowest, 1.0)
+    mapped = np.where(batch.mask, (2 * batch.x - (lowest + highest)) / span, 0.0)
+
+    coefficients = batch_least_squares(np.polynomial.chebyshev.chebvander(mapped, degree), batch)
+    fitted = np.polynomial.chebyshev.chebval(mapped, coefficients.T[:, :, None], tensor=False)
+    return coefficients, fitted
+
+
+def savgol_matrix(window, degree):
+    """
+    :return: (window, window) matrix, row k gives the value of the polynomial fitted to the window at point k
+    """
+    vander = np.vander(np.arange(window) - window // 2, degree + 1)
+    return vander @ np.linalg.pinv(vander)
+
+
+def savgol_smooth(batch, window=SAVGOL_WINDOW, degree=SAVGOL_DEGREE):
+    """
+    Savitzky-Golay smoothing of all curves (points are treated as equally spaced). Near the ends of the curve the
+    polynomial fitted to the first/last window is used (like scipy 'interp' mode). Curves shorter than window use the
+    longest odd window that fits.
+
+    :param batch: CurveBatch
+    :param window: Number of points in the window (odd)
+    :param degree: Degree of the local polynomial (smaller than window)
+    :return: (S, L) smoothed values
+    """
+    if window % 2 == 0 or degree >= window:
+        raise ValueError('Savitzky-Golay window has to be odd and bigger than degree')
+
+    fitted = np.zeros(batch.x.shape)
+    windows = np.minimum(window, batch.lengths - (batch.lengths % 2 == 0))
+    for curve_window in np.unique(windows):
+        curves = np.flatnonzero(windows == curve_window)
+        matrix = savgol_matrix(curve_window, min(degree, curve_window - 1))
+        points = np.arange(batch.x.shape[1])
+        starts = np.clip(points - curve_window // 2, 0, (batch.lengths[curves] - curve_window)[:, None])
+        offsets = np.minimum(points - starts, curve_window - 1)  # Padded points use the last row
+        values = batch.y[curves][np.arange(len(curves))[:, None, None], starts[:, :, None] + np.arange(curve_window)]
+        fitted[curves] = np.einsum('slw,slw->sl', matrix[offsets], values)
+    return np.where(batch.mask, fitted, 0.0)
+
+
+def smooth_curves(xs, ys, method='polyfit'):
+    """
+    Smoothing of all curves in one batch
+
+    :param xs: List of x arrays (e.g., temperatures of mean points of each spectrum)
+    :param ys: List of y arrays
+    :param method: One of SMOOTHING_METHODS
+    :return: List of smoothed y arrays
+    """
+    if method not in SMOOTHING_METHODS:
+        raise ValueError(f'Unknown smoothing method: {method}')
+    batch = CurveBatch(xs, ys)
+    if method == 'polyfit':
+        fitted = polynomial_fit(batch, POLYNOMIAL_DEGREE)[1]
+    elif method == 'chebyshev':
+        fitted = chebyshev_fit(batch, POLYNOMIAL_DEGREE)[1]
+    else:
+        fitted = savgol_smooth(batch)
+    return batch.unstack(fitted)
@@ -1,5 +1,9 @@
 import os
+import json
+import hashlib
+import numpy as np
 import pandas as pd
+from profiling import profiler
 
 
 class DividingRawDataToFolders:
@@ -14,19 +18,23 @@ class DividingRawDataToFolders:
      you can extract the data that we are interested in.
     """
 
-    def __init__(self, path_of_folder):
+    def __init__(self, path_of_folder, time_alignment=None):
 
         self.path_of_folder = path_of_folder
         self.list_of_files_in_folder = []
         self.paths_to_sub_folders = []
         self.combine_path = []
+        self.data_frames = {}  # Extracted data frames: {path to sub folder: {t_stop: DataFrame}}
+        self.time_alignment = time_alignment if time_alignment is not None else TimeAlignment()
+        self.dropped_samples = {}  # PMT samples without temperature: {path to sub folder: {t_stop: number of samples}}
 
         # Creates a list of files all in given path and save it into array list_of_files_in_folder
         for entry in os.scandir(self.path_of_folder):
             if entry.is_file():
                 self.list_of_files_in_folder.append(entry.name)
 
-    def divide_data_TO_folders_sequence_position(self, first_pmt, first_heat):  # name of function to change!!!
+    def divide_data_TO_folders_sequence_position(self, first_pmt, first_heat, save_excel=True,
+                                                 manifest=None, progress=None):  # name to change!!!
         """
         This method sorts all csv data files and extracts information about temperature, intensity and t_stop
         temperature (required for thermal cleaning algorithm) and saves it afterwards into separate folders dividing
@@ -34,123 +42,154 @@ class DividingRawDataToFolders:
 
         :param first_pmt: Number of first PMT file that contains the intensity data
         :param first_heat: Number of first heat file that contains the temperature data corresponds to the first PMT
+        :param save_excel: False -> data is kept only in memory (self.data_frames) without Excel file for each T_stop
+        :param manifest: IngestManifest -> incremental mode, PMT/Heater_measured pairs ingested before are skipped and
+        spectra saved before in Data_set.npz are loaded into memory (only new spectra are added)
+        :param progress: Function progress(done, total) called after each PMT file (total - number of PMT files from
+        first_pmt), it can raise an exception to stop the extraction (e.g., AnalysisCancelled), None -> no progress
         :return: Saved temperature/intensity Excel files separated by T_stop name
         """
-        # Sorting to obtain numerical order
-        self.list_of_files_in_folder.sort()
         # Creating first numbers to start analysis
         initial_number_file_PMT = int(first_pmt)
         initial_number_file_HM = int(first_heat)
         step_between_PMT_HM = initial_number_file_HM - initial_number_file_PMT
 
-        # Converting int number to numbers that are in folder example: 1->0001, 12 -> 0012
-        # return string file number
-        def number_converter(number):
-            if number < 10:
-                file_number = f'000{number}'
-            elif 10 < number < 100:
-                file_number = f'00{number}'
-            else:
-                file_number = f'0{number}'
-            return file_number
-
-        # Calculate difference between PMT files
-        # to obtain a step_number
-        def PMT_step():
-
-            pmt_files = []
-            for file_name_pmt in self.list_of_files_in_folder:
-                if str(file_name_pmt)[5:8] == 'PMT':
-                    pmt_files.append(file_name_pmt)
-
-            pmt_files.sort()
-            pmt_first = int(str(pmt_files[0])[:4])
-            pmt_second = int(str(pmt_files[1])[:4])
-
-            return pmt_second - pmt_first
+        # File number -> file name (one pass over the folder)
+        files_index = MeasurementFilesIndex(self.list_of_files_in_folder)
 
         # Diff between files PMT
-        next_pmt_file_number = PMT_step()
+        next_pmt_file_number = files_index.pmt_step()
 
         # Actual number of PMT files
         actual_number_of_file_number = initial_number_file_PMT
+        number_of_pmt_files = len([number for number in files_index.by_type['PMT']
+                                   if number >= initial_number_file_PMT])
+        done = 0
+
+        # Iteration for each PMT file (Heater_measured and T_stop files are found by their numbers)
+        while actual_number_of_file_number in files_index.by_number:
+            file_name = files_index.by_number[actual_number_of_file_number]
+            path_to_file = f'{self.path_of_folder}/{file_name}'
+            file_name_temp = files_index.by_number.get(actual_number_of_file_number + step_between_PMT_HM)
+
+            done += 1
+            if manifest is not None and manifest.is_ingested(file_name, file_name_temp):
+                if progress is not None:
+                    progress(done, number_of_pmt_files)
+                if next_pmt_file_number is None:
+                    break
+                actual_number_of_file_number += next_pmt_file_number
+                continue
 
-        # Iteration for each file in given folder
-        for file_name in self.list_of_files_in_folder:
-
-            actual_number_of_file_txt = number_converter(actual_number_of_file_number)  # only for PMT files
+            # Static data
+            time_temperature_data = np.empty(0)
+            temperature_data = np.empty(0)
+            t_stop = str()
 
-            if str(file_name)[:4] == actual_number_of_file_txt:  # Taking first PMT file
-                path_to_file = f'{self.path_of_folder}/{file_name}'
-                data_table = pd.read_table(path_to_file, header=None, skip_blank_lines=True)
+            with profiler.stage('INTiBSMeasurementFile', file=file_name) as stage:
+                # Extraction Time and Intensity from PMT file
+                pmt_file = INTiBSMeasurementFile(path_to_file, 44)
+                time_intensity_data, intensity_data = pmt_file.time, pmt_file.values
 
-                # Static data
-                time_intensity_data = []
-                intensity_data = []
-                time_temperature_data = []
-                temperature_data = []
-                t_stop = str()
+                sequence_position = pmt_file.header[15].split(';')[-1]
+                irradiation = pmt_file.header[28].split(';')[-1]
 
-                sequence_position = str(data_table.iloc[15, 0]).split(';')[-1]
-                irradiation = str(data_table.iloc[28, 0]).split(';')[-1]
+                # Extraction Temperature data from file Heater_measured
+                if file_name_temp is not None:
+                    heater_file = INTiBSMeasurementFile(f'{self.path_of_folder}/{file_name_temp}', 41)
+                    time_temperature_data, temperature_data = heater_file.time, heater_file.values
 
-                # Extraction Time and Intensity from PMT file
+                # Extract T_stop information
+                file_name_temp_pre = files_index.by_number.get(actual_number_of_file_number - 2)
+                if file_name_temp_pre is not None:
+                    t_stop_file = INTiBSMeasurementFile(f'{self.path_of_folder}/{file_name_temp_pre}', 39,
+                                                        read_data=False)
+                    t_stop = t_stop_file.header[38].split(',')[-1]
+                stage.set(t_stop=t_stop, rows=len(intensity_data) + len(temperature_data))
+
+            # Creating sequence_position folder SEQ-> IRR
+            sequence_position_path = str(self.path_of_folder) + '/Sequence_position_' + sequence_position
+            if not os.path.exists(sequence_position_path):
+                os.makedirs(sequence_position_path)
+
+            # Creating irradiation folder
+            irradiation_path = sequence_position_path + '/Irradiation_' + irradiation + '/Excel_files'
+            if not os.path.exists(irradiation_path):
+                os.makedirs(irradiation_path)
+            if irradiation_path not in self.paths_to_sub_folders:
+                self.paths_to_sub_folders.append(irradiation_path)  # adding path
+                self.combine_path = sequence_position_path + '/Irradiation_' + irradiation
+                if manifest is not None:
+                    self.load_data_set_file(irradiation_path)
+
+            # Temperature for each PMT time and saving that in folder.
+            with profiler.stage('TimeAlignment', t_stop=t_stop, rows=len(time_intensity_data)):
+                data_frame, dropped = self.time_alignment.align(time_intensity_data, intensity_data,
+                                                                time_temperature_data, temperature_data)
+            self.dropped_samples.setdefault(irradiation_path, {})[t_stop] = dropped
+            self.data_frames.setdefault(irradiation_path, {})[t_stop] = data_frame
+            if save_excel:
+                with profiler.stage('T_stop Excel file', t_stop=t_stop, rows=len(data_frame)):
+                    new_file_path = f'{irradiation_path}/{t_stop}.xlsx'
+                    time_temp_irr_data_frame = pd.DataFrame(data_frame)
+                    time_temp_irr_data_frame.to_excel(new_file_path, index=False)
+
+            if manifest is not None:
+                manifest.record(file_name, file_name_temp, t_stop, irradiation_path)
+            if progress is not None:
+                progress(done, number_of_pmt_files)
+            if next_pmt_file_number is None:  # Only one PMT file (e.g., the first step of the measurement)
+                break
+            actual_number_of_file_number += next_pmt_file_number
+
+    def load_data_set_file(self, path):
+        """
+        Loads spectra saved before in Data_set.npz of the sub folder into memory (self.data_frames)
+        :param path: Path to sub folder with Excel files
+        """
+        data_set_path = os.path.dirname(path) + '/Data_set.npz'
+        if not os.path.exists(data_set_path):
+            return
 
-                for data in data_table.iloc[44:, 0]:
-                    time = float(str(data).split(',')[0])
-                    intensity = float(str(data).split(',')[-1])
-                    time_intensity_data.append(time)
-                    intensity_data.append(intensity)
+        t_stop_names, spectra, _ = load_data_set_file(data_set_path)
+        frames = self.data_frames.setdefault(path, {})
+        for t_stop_name, (temperature, intensity) in zip(t_stop_names, spectra):
+            t_stop = str(t_stop_name).split(':')[-1].strip()
+            frames.setdefault(t_stop, pd.DataFrame({'Temperature': temperature, 'Intensity': intensity}))
 
-                # Extraction Temperature data from file Heater_measured
-                temp_number_related_to_PMT = int(actual_number_of_file_txt) + step_between_PMT_HM
-                for file_name_temp in self.list_of_files_in_folder:
+    def sorted_data_frames(self, path):
+        """
+        Temperature/Intensity data frames of one sub folder sorted by T_stop. Data extracted in this run is taken from
+        memory, otherwise Excel files from the sub folder are read.
 
-                    if str(file_name_temp)[:4] == number_converter(
-                            temp_number_related_to_PMT):
-                        path_to_file_temp = f'{self.path_of_folder}/{file_name_temp}'
-                        data_table_temp = pd.read_table(path_to_file_temp, header=None, skip_blank_lines=True)
+        :param path: Path to sub folder with Excel files
+        :return: List of T_stop names (like 'T_stop: 30'), list of DataFrames with Temperature and Intensity columns
+        """
+        if path in self.data_frames:
+            frames = {int(str(t_stop).split('.')[0]): data_frame
+                      for t_stop, data_frame in self.data_frames[path].items()}
+        else:
+            files_list = os.listdir(path)
+            files_list = [str(files_without_xlsx).split('.')[0] for files_without_xlsx in files_list]
+            frames = {int(x): pd.read_excel(str(path) + '/' + str(x) + '.xlsx') for x in files_list}
 
-                        for data_temp in data_table_temp.iloc[41:, 0]:
-                            time = float(str(data_temp).split(',')[0])
-                            heat = float(str(data_temp).split(',')[-1])
-                            time_temperature_data.append(time)
-                            temperature_data.append(heat)
+        level_column_name = []
+        data_frames = []
+        for t_stop in sorted(frames):
+            data_frames.append(frames[t_stop][['Temperature', 'Intensity']])
+            level_column_name.append(f'T_stop: {t_stop}')
 
-                # Extract T_stop information
-                t_stop_temperature = int(actual_number_of_file_txt) - 2
-                for file_name_temp_pre in self.list_of_files_in_folder:
-
-                    if str(file_name_temp_pre)[:4] == number_converter(
-                            t_stop_temperature):
-                        path_to_file_temp_stop = f'{self.path_of_folder}/{file_name_temp_pre}'
-                        data_table_temp = pd.read_table(path_to_file_temp_stop, header=None, skip_blank_lines=True)
-                        t_stop = str(data_table_temp.iloc[38, 0]).split(',')[-1]
-
-                # Creating sequence_position folder SEQ-> IRR
-                sequence_position_path = str(self.path_of_folder) + '/Sequence_position_' + sequence_position
-                if not os.path.exists(sequence_position_path):
-                    os.makedirs(sequence_position_path)
-
-                # Creating irradiation folder
-                irradiation_path = sequence_position_path + '/Irradiation_' + irradiation + '/Excel_files'
-                if not os.path.exists(irradiation_path):
-                    os.makedirs(irradiation_path)
-                    self.paths_to_sub_folders.append(irradiation_path)  # adding path
-                    self.combine_path = sequence_position_path + '/Irradiation_' + irradiation
-
-                # Making two data_frames
-                data_frame_PMT = pd.DataFrame({'Time': time_intensity_data, 'Intensity': intensity_data})
-                data_frame_Heat_measurement = pd.DataFrame(
-                    {'Time': time_temperature_data, 'Temperature': temperature_data})
-
-                # Merging two dataframes by right-join on Time value and saving that in folder.
-                data_frame = data_frame_Heat_measurement.merge(data_frame_PMT, how='right', on='Time')
-                new_file_path = f'{irradiation_path}/{t_stop}.xlsx'
-                time_temp_irr_data_frame = pd.DataFrame(data_frame)
-                time_temp_irr_data_frame.to_excel(new_file_path, index=False)
+        return level_column_name, data_frames
 
-                actual_number_of_file_number += next_pmt_file_number
+    def save_excel_files(self):
+        """
+        Saves Excel file for each T_stop extracted in this run (when the extraction was run with save_excel=False)
+        :return: Saved temperature/intensity Excel files separated by T_stop name
+        """
+        for path in self.paths_to_sub_folders:
+            for t_stop, data_frame in self.data_frames.get(path, {}).items():
+                if t_stop in self.dropped_samples.get(path, {}):  # Spectra loaded from Data_set.npz have their files
+                    pd.DataFrame(data_frame).to_excel(f'{path}/{t_stop}.xlsx', index=False)
 
     def create_one_excel_file(self):
         """
@@ -158,28 +197,291 @@ class DividingRawDataToFolders:
         :return: Data_set.xlsx file
         """
         # Create a all_data_frame excel file with all data in folder
-        if len(self.paths_to_sub_folders) > 0:
-            for path in self.paths_to_sub_folders:
-
-                data_frames = []
-                level_column_name = []
-                files_list = os.listdir(path)
-                files_list = [str(files_without_xlsx).split('.')[0] for files_without_xlsx in files_list]
-                files_list = [int(x) for x in files_list]
-                files_list.sort()
-
-                for excel_file_name in files_list:
-                    path_to_excel_file = str(path) + '/' + str(excel_file_name) + '.xlsx'
-                    excel_data_frame = pd.read_excel(path_to_excel_file)
-                    data_frames.append(excel_data_frame.iloc[:, 1:])
-                    level_name = f'''T_stop: {str(excel_file_name).split('.')[0]}'''
-                    level_column_name.append(level_name)
-
-                all_data_frames = pd.concat([df for df in data_frames], axis=1,
-                                            keys=level_column_name)
-
-                combined_file_path = str(self.combine_path) + '/Data_set.xlsx'
-                all_data_frames.to_excel(combined_file_path)
+        for path in self.paths_to_sub_folders:
+            level_column_name, data_frames = self.sorted_data_frames(path)
+
+            all_data_frames = pd.concat([df for df in data_frames], axis=1,
+                                        keys=level_column_name)
+
+            combined_file_path = os.path.dirname(path) + '/Data_set.xlsx'
+            all_data_frames.to_excel(combined_file_path)
+
+    def create_data_set_file(self):
+        """
+        This method combines all data frames into one binary file (Data_set.npz) that can be analysed like
+        Data_set.xlsx but loads much faster.
+        :return: Data_set.npz and Data_set.json files
+        """
+        for path in self.paths_to_sub_folders:
+            level_column_name, data_frames = self.sorted_data_frames(path)
+            save_data_set_file(os.path.dirname(path) + '/Data_set.npz', level_column_name,
+                               [data_frame['Temperature'] for data_frame in data_frames],
+                               [data_frame['Intensity'] for data_frame in data_frames])
+
+
+def data_set_metadata_path(path):
+    """
+    :param path: Path to Data_set.npz file
+    :return: Path to the metadata file (Data_set.json)
+    """
+    return os.path.splitext(str(path))[0] + '.json'
+
+
+def save_data_set_file(path, t_stop_names, temperatures, intensities, institute_apparatus=True):
+    """
+    Saves all spectra into one binary NumPy file. Temperatures and intensities of all spectra are saved one after
+    another in two arrays, 'offsets' array shows where each spectrum starts. T_stop names are saved in JSON sidecar
+    file.
+
+    :param path: Path to new .npz file
+    :param t_stop_names: List of T_stop names
+    :param temperatures: List of temperature arrays (one for each T_stop)
+    :param intensities: List of intensity arrays (one for each T_stop)
+    :param institute_apparatus: True/False if data came from INTiBS (Only for chart title)
+    :return: Saved .npz and .json files
+    """
+    lengths = [len(temperature) for temperature in temperatures]
+    offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+    np.savez(path, temperature=np.concatenate(temperatures).astype(float),
+             intensity=np.concatenate(intensities).astype(float), offsets=offsets)
+
+    metadata = {'t_stop': [str(t_stop) for t_stop in t_stop_names], 'institute_apparatus': bool(institute_apparatus)}
+    with open(data_set_metadata_path(path), 'w', encoding='utf-8') as metadata_file:
+        json.dump(metadata, metadata_file, ensure_ascii=False, indent=1)
+
+
+def load_data_set_file(path):
+    """
+    Loads file saved by save_data_set_file
+    :param path: Path to .npz file
+    :return: List of T_stop names, list of (temperature array, intensity array), institute_apparatus
+    """
+    with open(data_set_metadata_path(path), encoding='utf-8') as metadata_file:
+        metadata = json.load(metadata_file)
+
+    with np.load(path) as data:
+        temperature = data['temperature']
+        intensity = data['intensity']
+        offsets = data['offsets']
+
+    spectra = [(temperature[start:stop], intensity[start:stop]) for start, stop in zip(offsets[:-1], offsets[1:])]
+    return metadata['t_stop'], spectra, metadata['institute_apparatus']
+
+
+class IngestManifest:
+    """
+    List of INTiBS files already ingested into Data_set files (saved as ingest_manifest.json in the INTiBS folder).
+    For each PMT file the manifest keeps its Heater_measured file, T_stop and the sub folder where the spectrum was
+    saved. A file is treated as unchanged when its size and modification time are the same, or (after a copy or
+    'touch') when its SHA-256 hash is the same.
+    """
+
+    FILE_NAME = 'ingest_manifest.json'
+
+    def __init__(self, path_of_folder):
+        self.path_of_folder = path_of_folder
+        self.path = os.path.join(str(path_of_folder), IngestManifest.FILE_NAME)
+        self.entries = {}  # {PMT file name: {'pmt': file state, 'heater': file state, 't_stop', 'irradiation_path'}}
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as manifest_file:
+                self.entries = json.load(manifest_file)['files']
+
+    def file_state(self, file_name, with_hash=True):
+        """
+        :param file_name: Name of the file in INTiBS folder (or None)
+        :param with_hash: False -> without SHA-256 hash
+        :return: Dictionary with name, size, mtime and sha256 of the file
+        """
+        if file_name is None:
+            return None
+        path = f'{self.path_of_folder}/{file_name}'
+        stat = os.stat(path)
+        state = {'name': file_name, 'size': stat.st_size, 'mtime': stat.st_mtime}
+        if with_hash:
+            with open(path, 'rb') as measurement_file:
+                state['sha256'] = hashlib.sha256(measurement_file.read()).hexdigest()
+        return state
+
+    def unchanged(self, saved_state, file_name):
+        """
+        :param saved_state: File state saved in the manifest
+        :param file_name: Actual file name (or None)
+        :return: True if it is the same file with the same content
+        """
+        if saved_state is None or file_name is None:
+            return saved_state is None and file_name is None
+        if saved_state['name'] != file_name:
+            return False
+
+        state = self.file_state(file_name, with_hash=False)
+        if state['size'] != saved_state['size']:
+            return False
+        if state['mtime'] == saved_state['mtime']:
+            return True
+        return self.file_state(file_name)['sha256'] == saved_state['sha256']
+
+    def is_ingested(self, pmt_file_name, heater_file_name):
+        """
+        :param pmt_file_name: Name of PMT file
+        :param heater_file_name: Name of Heater_measured file (or None)
+        :return: True if this pair was ingested before and the files have not changed
+        """
+        entry = self.entries.get(pmt_file_name)
+        if entry is None:
+            return False
+        return self.unchanged(entry['pmt'], pmt_file_name) and self.unchanged(entry['heater'], heater_file_name)
+
+    def record(self, pmt_file_name, heater_file_name, t_stop, irradiation_path):
+        """
+        Adds ingested PMT/Heater_measured pair to the manifest (saved by save())
+        """
+        self.entries[pmt_file_name] = {'pmt': self.file_state(pmt_file_name),
+                                       'heater': self.file_state(heater_file_name),
+                                       't_stop': t_stop, 'irradiation_path': irradiation_path}
+
+    def combine_paths(self):
+        """
+        :return: Sub folders with Data_set files of all ingested files (in order of ingestion)
+        """
+        return list(dict.fromkeys(os.path.dirname(entry['irradiation_path']) for entry in self.entries.values()))
+
+    def save(self):
+        temporary_path = self.path + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as manifest_file:
+            json.dump({'files': self.entries}, manifest_file, ensure_ascii=False, indent=1)
+        os.replace(temporary_path, self.path)
+
+
+class TimeAlignment:
+    """
+    Assigns heater temperature to PMT timestamps using sorted time arrays (instead of merging on equal Time values).
+
+        -> nearest: temperature of the nearest heater sample
+        -> linear: temperature linearly interpolated between two heater samples
+
+    PMT samples farther than 'tolerance' from the nearest heater sample (or outside of the heater time range) have no
+    temperature and are dropped. With tolerance=0 only equal timestamps are used (like the merge on Time column).
+    """
+
+    def __init__(self, method='nearest', tolerance=0.0):
+        if method not in ('nearest', 'linear'):
+            raise ValueError(f'Unknown alignment method: {method}')
+        self.method = method
+        self.tolerance = float(tolerance)
+
+    def align(self, pmt_time, intensity, heater_time, temperature):
+        """
+        :param pmt_time: Array with PMT timestamps
+        :param intensity: Array with intensities
+        :param heater_time: Array with heater timestamps
+        :param temperature: Array with temperatures
+        :return: DataFrame (Time, Temperature, Intensity) in PMT order, number of dropped PMT samples
+        """
+        pmt_time = np.asarray(pmt_time, dtype=float)
+        intensity = np.asarray(intensity, dtype=float)
+        heater_time = np.asarray(heater_time, dtype=float)
+        temperature = np.asarray(temperature, dtype=float)
+
+        if len(heater_time) == 0:
+            return pd.DataFrame({'Time': pmt_time[:0], 'Temperature': temperature[:0], 'Intensity': intensity[:0]}), \
+                len(pmt_time)
+
+        if np.any(heater_time[1:] < heater_time[:-1]):
+            order = np.argsort(heater_time, kind='stable')
+            heater_time = heater_time[order]
+            temperature = temperature[order]
+
+        # Neighbouring heater samples (left <= PMT time < right)
+        right = np.searchsorted(heater_time, pmt_time, side='left')
+        left = np.clip(right - 1, 0, len(heater_time) - 1)
+        right = np.clip(right, 0, len(heater_time) - 1)
+
+        distance_left = np.abs(pmt_time - heater_time[left])
+        distance_right = np.abs(heater_time[right] - pmt_time)
+        nearest = np.where(distance_right <= distance_left, right, left)
+        keep = np.minimum(distance_left, distance_right) <= self.tolerance
+
+        if self.method == 'nearest':
+            aligned_temperature = temperature[nearest]
+        else:
+            keep &= (pmt_time >= heater_time[0]) & (pmt_time <= heater_time[-1])
+            aligned_temperature = np.interp(pmt_time, heater_time, temperature)
+
+        data_frame = pd.DataFrame({'Time': pmt_time[keep], 'Temperature': aligned_temperature[keep],
+                                   'Intensity': intensity[keep]})
+        return data_frame, int(len(pmt_time) - np.count_nonzero(keep))
+
+
+class INTiBSMeasurementFile:
+    """
+    Reader of one INTiBS measurement file. The file starts with header lines (sequence position, irradiation, T_stop
+    etc.) and then there are 'time,value' rows. Only the header lines are read line by line, the whole numeric part is
+    loaded by one NumPy call into float arrays.
+    Blank lines are skipped (header line numbers are the same as in pd.read_table(skip_blank_lines=True)).
+    """
+
+    def __init__(self, path, header_length, read_data=True):
+        """
+        :param path: Path to INTiBS file
+        :param header_length: Number of non-blank lines before the data rows (44 for PMT, 41 for Heater_measured)
+        :param read_data: False -> only header is read (e.g., file with T_stop)
+        """
+        self.header = []  # Header lines
+        self.time = np.empty(0)  # Time column
+        self.values = np.empty(0)  # Last column (Intensity or Temperature)
+
+        with open(path, encoding='utf-8', errors='replace') as measurement_file:
+            while len(self.header) < header_length:
+                line = measurement_file.readline()
+                if line == '':  # End of file
+                    break
+                line = line.rstrip('\r\n')
+                if line.strip():  # Whitespace-only lines are blank too
+                    self.header.append(line)
+
+            if read_data and len(self.header) == header_length:
+                data = np.loadtxt((line for line in measurement_file if line.strip()), delimiter=',', ndmin=2)
+                if data.size > 0:
+                    self.time = data[:, 0]
+                    self.values = data[:, -1]
+
+
+class MeasurementFilesIndex:
+    """
+    Index of INTiBS measurement files created in one pass over the folder. Each file name starts with a 4-digit file
+    number (e.g., 0005_PMT_measured), so every PMT/Heater_measured/T_stop file can be found by its number without
+    scanning the whole folder again.
+    """
+
+    def __init__(self, list_of_files):
+        self.by_number = {}  # {file number: file name}
+        self.by_type = {'PMT': [], 'Heater': [], 'other': []}  # {file type: sorted file numbers}
+
+        for file_name in sorted(list_of_files):
+            file_number = str(file_name)[:4]
+            if not file_number.isdigit():
+                continue
+            file_number = int(file_number)
+            if file_number in self.by_number:  # Only the first file with this number (like in sorted folder)
+                continue
+            self.by_number[file_number] = file_name
+
+            if str(file_name)[5:8] == 'PMT':
+                self.by_type['PMT'].append(file_number)
+            elif 'Heater_measured' in str(file_name):
+                self.by_type['Heater'].append(file_number)
+            else:
+                self.by_type['other'].append(file_number)
+
+    def pmt_step(self):
+        """
+        Calculate difference between PMT files to obtain a step_number
+        :return: Difference between numbers of the first two PMT files (None if there is only one PMT file)
+        """
+        pmt_files = self.by_type['PMT']
+        if len(pmt_files) < 2:
+            return None
+        return pmt_files[1] - pmt_files[0]
 
 
 class TStopInterpreter:
@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+
+
+K_BOLTZMANN = 8.617333262145E-5  # Boltzmann constant [eV/K]
+
+
+class GlowPeak:
+    """
+    One TL peak (one trap type)
+
+        -> energy: activation energy E [eV]
+        -> frequency_factor: s [1/s]
+        -> amplitude: height of the peak when the trap is full (before thermal cleaning)
+        -> order: 1 (Randall-Wilkins) or 2 (Garlick-Gibson) kinetics
+    """
+
+    def __init__(self, energy, frequency_factor, amplitude=1000.0, order=1):
+        if order not in (1, 2):
+            raise ValueError(f'Unknown kinetics order: {order}')
+        self.energy = float(energy)
+        self.frequency_factor = float(frequency_factor)
+        self.amplitude = float(amplitude)
+        self.order = order
+
+    @classmethod
+    def from_string(cls, text):
+        """
+        :param text: 'E:s[:amplitude[:order]]', e.g. '0.8:1e10:1000:1'
+        :return: GlowPeak
+        """
+        values = text.split(':')
+        return cls(float(values[0]), float(values[1]), *(float(value) for value in values[2:3]),
+                   *(int(value) for value in values[3:4]))
+
+
+class GlowCurveGenerator:
+    """
+    Synthetic thermoluminescence glow curves with known T_max and E (for benchmarks and accuracy checks).
+
+    Each peak is calculated from first-order (Randall-Wilkins) or second-order (Garlick-Gibson) kinetics for a linear
+    heating with heat_rate [K/s]. The integral of exp(-E/kT) is calculated once on a fine temperature grid (cumulative
+    trapezoid) and interpolated to the measurement temperatures.
+
+    Tmax-Tstop sequence: before each readout the sample is heated to T_stop, so a part of the trapped charge is released
+    (the population of each trap is reduced like during the readout up to T_stop). Then the whole glow curve is
+    measured. Gaussian noise (noise * the highest full peak) and a constant background are added.
+    """
+
+    def __init__(self, peaks, heat_rate=0.5, start_temperature=25.0, stop_temperature=300.0, points=2000,
+                 noise=0.005, background=20.0, temperature_noise=0.05, seed=None):
+        """
+        :param peaks: List of GlowPeak
+        :param heat_rate: Heating rate [K/s]
+        :param start_temperature: First temperature of the readout [°C]
+        :param stop_temperature: Last temperature of the readout [°C]
+        :param points: Number of points in each spectrum
+        :param noise: Standard deviation of intensity noise (part of the highest peak amplitude)
+        :param background: Constant background intensity
+        :param temperature_noise: Standard deviation of temperature readings [°C]
+        :param seed: Seed of the random numbers generator
+        """
+        self.peaks = list(peaks)
+        self.heat_rate = float(heat_rate)
+        self.start_temperature = float(start_temperature)
+        self.stop_temperature = float(stop_temperature)
+        self.points = int(points)
+        self.noise = float(noise)
+        self.background = float(background)
+        self.temperature_noise = float(temperature_noise)
+        self.random = np.random.default_rng(seed)
+
+        # Fine grid for integrals [K]
+        self.grid = np.linspace(self.start_temperature, self.stop_temperature, 20001) + 273.15
+        self.integrals = []  # (s/beta) * integral of exp(-E/kT) from the start temperature, for each peak
+        self.scales = []  # Intensity scale: the full peak has max = amplitude
+        for index, peak in enumerate(self.peaks):
+            rate = np.exp(-peak.energy / (K_BOLTZMANN * self.grid))
+            integral = np.concatenate(([0.0], np.cumsum((rate[1:] + rate[:-1]) / 2 * np.diff(self.grid))))
+            self.integrals.append(peak.frequency_factor / self.heat_rate * integral)
+            self.scales.append(1.0)
+            self.scales[index] = peak.amplitude / self.peak_intensity(index, self.grid - 273.15).max()
+
+    def released(self, index, temperature):
+        """
+        :return: (s/beta) * integral of exp(-E/kT) up to temperature [°C] for peak index
+        """
+        return np.interp(np.asarray(temperature, dtype=float) + 273.15, self.grid, self.integrals[index])
+
+    def peak_intensity(self, index, temperature, population=1.0):
+        """
+        Intensity of one peak without noise
+
+        :param index: Index of the peak
+        :param temperature: Array with temperatures [°C]
+        :param population: Part of the full trap population at the start of the readout
+        :return: Intensity array
+        """
+        peak = self.peaks[index]
+        kelvin = np.asarray(temperature, dtype=float) + 273.15
+        rate = peak.frequency_factor * np.exp(-peak.energy / (K_BOLTZMANN * kelvin))
+        released = self.released(index, temperature)
+        if peak.order == 1:
+            intensity = population * rate * np.exp(-released)
+        else:
+            intensity = population ** 2 * rate / (1 + population * released) ** 2
+        return self.scales[index] * intensity
+
+    def population_after_cleaning(self, index, t_stop):
+        """
+        :param index: Index of the peak
+        :param t_stop: Temperature of the thermal cleaning [°C] (None -> no cleaning)
+        :return: Part of the full trap population left after heating to t_stop
+        """
+        if t_stop is None:
+            return 1.0
+        released = float(self.released(index, t_stop))
+        if self.peaks[index].order == 1:
+            return float(np.exp(-released))
+        return 1 / (1 + released)
+
+    def spectrum(self, t_stop=None):
+        """
+        :param t_stop: Temperature of the thermal cleaning [°C] (None -> no cleaning)
+        :return: DataFrame with 'Temp' and 'Int' columns, dictionary with true 't_max' [°C] and 'energy' [eV] of the
+        first peak (the lowest temperature peak higher than 10 % of the glow curve maximum and 3 x noise). When all
+        peaks are emptied by the cleaning, the true values are NaN.
+        """
+        temperature = np.linspace(self.start_temperature, self.stop_temperature, self.points)
+        components = [self.peak_intensity(index, temperature, self.population_after_cleaning(index, t_stop))
+                      for index in range(len(self.peaks))]
+        glow_curve = np.sum(components, axis=0)
+        noise_level = self.noise * max(peak.amplitude for peak in self.peaks)
+
+        truth = {'t_max': np.nan, 'energy': np.nan}
+        for index in np.argsort([temperature[np.argmax(component)] for component in components]):
+            height = components[index].max()
+            if height >= 0.1 * glow_curve.max() and height > 3 * noise_level:
+                truth = {'t_max': float(temperature[np.argmax(components[index])]),
+                         'energy': self.peaks[index].energy}
+                break
+
+        intensity = glow_curve + self.background + self.random.normal(0, noise_level, self.points)
+        measured_temperature = temperature + self.random.normal(0, self.temperature_noise, self.points)
+        data_frame = pd.DataFrame({'Temp': measured_temperature, 'Int': np.round(intensity)})
+        return data_frame.sort_values(by='Temp'), truth
+
+    def tmax_tstop_series(self, t_stops):
+        """
+        :param t_stops: List of T_stop temperatures [°C]
+        :return: List of T_stop names (like in Data_set files), list of DataFrames, list of true values
+        """
+        names, data_frames, truths = [], [], []
+        for t_stop in t_stops:
+            data_frame, truth = self.spectrum(t_stop)
+            names.append(f'T_stop: {int(round(t_stop))}')
+            data_frames.append(data_frame)
+            truths.append(truth)
+        return names, data_frames, truths
@@ -1,38 +1,95 @@
 import pandas as pd
 import numpy as np
+from spectrum_set import Spectrum, SpectrumSet
+from curve_fitting import CurveBatch, polynomial_fit, smooth_curves
+from binned_statistics import SortedBins
+
+
+WINDOW_STATISTICS = ('mean', 'median')  # Intensity of one mean point (see mean_in_temperature_windows)
 
 
 class CreatingFormatToAnalysis:
     """
     This class takes Excel file with given Temperature/Intensity and T_stop data. This data is transformed and split
     into separate data frames that will be used in further analysis.
+    The binary Data_set.npz file (created by INTiBS folder option) is loaded directly without Excel parsing.
+
+    All spectra are kept in one SpectrumSet (self.spectra), DataFrames in final_data_frames are only its views.
     """
 
     def __init__(self, excel_file):
         self.t_stop_data = []  # T_stop names data
         self.final_data_frames = []  # List with DataFrames contain Temperature and Intensity for each T_stop
-        self.excel = pd.read_excel(excel_file)
         self.institute_apparatus = False
-        if len(self.excel.columns) % 2 == 1:  # Only for files generated by this Program (Option INTiBS Folder)
-            self.excel.drop([0, 1], inplace=True)
-            self.excel = self.excel.drop('Unnamed: 0', axis='columns')
-            self.excel = self.excel.reset_index(drop=True)
-            self.institute_apparatus = True
-
-        # Extraction T_stop values
-        for col_name in self.excel.columns:
-            if 'Unnamed' not in str(col_name):
-                self.t_stop_data.append(col_name)
+        self.excel = None  # The Excel file is not kept after extraction of the spectra
 
-        # Extraction Temperatures and Intensities
-        number_of_columns = len(self.excel.columns)
-        for t_index, int_index in list(zip(range(0, number_of_columns, 2), range(1, number_of_columns, 2))):
-            temp_data = self.excel.iloc[:, t_index].astype('float')
-            int_data = self.excel.iloc[:, int_index].astype('float')
-            temporary_pandas_file_to_sort = pd.DataFrame({'Temp': temp_data, 'Int': int_data})
-            temporary_pandas_file = temporary_pandas_file_to_sort.sort_values(by='Temp')
-
-            self.final_data_frames.append(temporary_pandas_file)  # Saving into class attribute
+        if str(excel_file).endswith('.npz'):
+            self.spectra = SpectrumSet.load(excel_file)
+        else:
+            excel = pd.read_excel(excel_file)
+            if len(excel.columns) % 2 == 1:  # Only for files generated by this Program (Option INTiBS Folder)
+                excel.drop([0, 1], inplace=True)
+                excel = excel.drop('Unnamed: 0', axis='columns')
+                excel = excel.reset_index(drop=True)
+                self.institute_apparatus = True
+
+            # Extraction T_stop values
+            t_stop_data = [col_name for col_name in excel.columns if 'Unnamed' not in str(col_name)]
+
+            # Extraction Temperatures and Intensities
+            number_of_columns = len(excel.columns)
+            column_pairs = list(zip(range(0, number_of_columns, 2), range(1, number_of_columns, 2)))
+            self.spectra = SpectrumSet.from_arrays(t_stop_data,
+                                                   [excel.iloc[:, t_index].to_numpy(dtype=float)
+                                                    for t_index, _ in column_pairs],
+                                                   [excel.iloc[:, int_index].to_numpy(dtype=float)
+                                                    for _, int_index in column_pairs],
+                                                   self.institute_apparatus)
+
+        self.t_stop_data = self.spectra.t_stop_names
+        self.institute_apparatus = self.spectra.institute_apparatus
+        self.final_data_frames = self.spectra.data_frames()
+
+
+def mean_in_temperature_windows(temperature, intensity, bin_step=2, bin_width=1, statistic='mean'):
+    """
+    Mean intensity in temperature windows calculated in one pass over the data (without a mask for each window).
+    Each point is assigned to a window by searching the sorted window edges and the sums are collected with bincount
+    (medians are taken from intensities sorted inside each window, see binned_statistics.SortedBins).
+
+    :param temperature: Array with temperatures (do not have to be sorted)
+    :param intensity: Array with intensities
+    :param bin_step: Distance between the beginnings of the temperature windows [°C]
+    :param bin_width: Width of one temperature window [°C]
+    :param statistic: One of WINDOW_STATISTICS
+    :return: Array with centers of non-empty windows (sorted), array with mean (median) intensities
+    """
+    if statistic not in WINDOW_STATISTICS:
+        raise ValueError(f'Unknown window statistic: {statistic}')
+    if bin_width > bin_step:
+        raise ValueError('bin_width can not be bigger than bin_step (windows can not overlap)')
+
+    # The first window starts at the lowest full degree (empty cells from shorter spectra are skipped)
+    temp_range = np.arange(np.nanmin(temperature), np.nanmax(temperature) + 1, dtype=int)
+    starts = np.arange(temp_range[0], temp_range.max() + 2, bin_step, dtype=float)
+    stops = starts + bin_width
+    starts = starts[stops < temp_range.max() + 2]
+    stops = stops[:len(starts)]
+
+    # Edges: start_0, stop_0, start_1, stop_1 ... -> even position = inside the window
+    edges = np.column_stack((starts, stops)).ravel()
+    position = np.searchsorted(edges, temperature, side='right') - 1
+    inside = (position >= 0) & (position % 2 == 0) & ~np.isnan(temperature) & ~np.isnan(intensity)
+    window = position[inside] // 2
+
+    counts = np.bincount(window, minlength=len(starts))
+    not_empty = counts > 0
+    if statistic == 'median':
+        values = SortedBins(window, intensity[inside], len(starts)).median()[not_empty]
+    else:
+        values = np.bincount(window, weights=intensity[inside], minlength=len(starts))[not_empty] / counts[not_empty]
+
+    return (starts[not_empty] + stops[not_empty]) / 2, values
 
 
 class PlotAnalysis:
@@ -47,48 +104,28 @@ class PlotAnalysis:
     """
 
     def __init__(self, data_frame):
+        if isinstance(data_frame, Spectrum):
+            data_frame = data_frame.data_frame()
         self.data_frame = data_frame  # Raw data from excel file
         self.mean_df = 0  # Data with mean values
         self.fitted_df = 0  # Fitted value
+        self.alg_code = None  # Code of the peak_finder path that found T_max
 
-    def mean_of_intensity_points(self):
+    def mean_of_intensity_points(self, bin_step=2, bin_width=1, smoothing='polyfit', statistic='mean'):
         """
-        Creating mean intensity value for temperature interval
+        Creating mean intensity value for temperature interval.
+        Temperature windows [start, start + bin_width) begin every bin_step degrees (from the lowest full degree).
+        Empty windows are skipped.
+
+        :param bin_step: Distance between the beginnings of the temperature windows [°C]
+        :param bin_width: Width of one temperature window [°C], not bigger than bin_step
+        :param smoothing: Over fitted curve, one of curve_fitting.SMOOTHING_METHODS
+        :param statistic: Intensity of a window, one of WINDOW_STATISTICS
         :return: mean dataframe, over_fitted_polynomial dataframe
         """
+        mean_of_intensity_points([self], bin_step, bin_width, smoothing, statistic)
 
-        min_temperature = self.data_frame['Temp'].min()
-        max_temperature = self.data_frame['Temp'].max()
-
-        temp_range = np.arange(min_temperature, max_temperature + 1, dtype=int)
-
-        mean_intensity_points = []  # Mean Int Points
-        mean_temp_points = []  # Mean Temp points
-
-        for start, stop in list(
-                zip(range(temp_range[0], temp_range.max() + 2, 2), range(temp_range[1], temp_range.max() + 2, 2))):
-            intensities_in_temperature = self.data_frame[
-                (self.data_frame['Temp'] >= start) & (self.data_frame['Temp'] < stop)]
-            mean_intensity = intensities_in_temperature['Int'].mean()
-            if mean_intensity is np.NAN:
-                continue
-            mean_intensity_points.append(mean_intensity)
-            mean_temp_points.append(np.mean([start, stop]))
-
-        df = pd.DataFrame({'Temp': mean_temp_points, 'Int': mean_intensity_points})
-        df = df.sort_values(by='Temp')
-        self.mean_df = df  # Mean DataFrame
-
-        # Over fitted polynomial function
-        cof = np.polyfit(self.mean_df['Temp'], self.mean_df['Int'], 10)
-        polynomial_equation = np.poly1d(cof)
-        fitted_intensity = [polynomial_equation(t) for t in mean_temp_points]
-
-        df_fitted = pd.DataFrame({'Temp': mean_temp_points, 'Int': fitted_intensity})
-        df_fitted = df_fitted.sort_values(by='Temp')
-        self.fitted_df = df_fitted  # Over fitted DataFrame
-
-    def peak_finder(self, dp=3, dn=5):
+    def peak_finder(self, dp=3, dn=5, cut_bins=7):
         """
         Finding the first temperature and intensity peak:
 
@@ -99,225 +136,256 @@ class PlotAnalysis:
         5. If there is a peak we need to check if there is a flattened line before this obvious peak
         6. If there is no peak, we are checking if there is a flattened line
 
-        :param dp: Explained in delta_plus_or_minus
-        :param dn: Like above
-        :return:
+        The steps 2-6 are done by find_t_max on arrays (see there), T_max is refined by fit_t_max.
+
+        :param dp: Minimal number of T points in the shelf (Delta Positive)
+        :param dn: Like above (Delta Negative)
+        :param cut_bins: Number of intensity intervals, points in the interval of the first point are not analysed
+        :return: T_max, Int_max
         """
+        return peak_finder([self], dp, dn, cut_bins)[0]
 
-        def delta_plus_or_minus(data):
-            """
-            If there are values less than 0 in the entire expected range, then we have a peak between the maximum
-            value and the starting point => delta will be negative
-
-            DP => Clear peak between MaxIntensity and the starting point
-            DN => Growing function that can have a suspected flattened interval.
-
-            :param data: DataFrame
-            :return: Improved DataFrame with new columns
-            """
-
-            minus_indexes_mean = data[data['diff_Int_mean'] < 0]
-            minus_indexes_fit = data[data['diff_Int_fit'] < 0]
-            delta_value = False
-
-            if len(minus_indexes_mean) > 0:
-                if len(minus_indexes_fit) > 0:
-                    delta_value = True
-
-            return delta_value
-
-        def diff_anomaly(data_version):
-            """
-            Calculate the difference between mean_intensity and over_fitted_value.
-            Also adds a new columns divOT ( T - 10% between points, O-no difference)
-            :param data_version: DataFrame to improve
-            :return: Data
-            """
-
-            # Delete the lowest values
-            data_version['c'] = pd.cut(data_version['Int_mean'], 7)  # 14%
-            drop_range_1 = data_version['c'].unique()[0]
-
-            # Create % difference between mean and over_fitted values
-            data_to_divide_1 = list(data_version['diff_Int_mean'])
-            data_to_divide_2 = data_to_divide_1.copy()[1:]
-            data_to_divide_2.append(0)
-
-            data_div = pd.DataFrame({'x': data_to_divide_1, 'y': data_to_divide_2})
-            data_div['div%'] = abs(data_div['y']) / data_div['x'] * 100
-            data_version['div%_mean'] = list(data_div['div%'])
-
-            # divOT_mean information to finding shelf's
-            data_version = data_version[data_version['c'] != drop_range_1].copy()
-            data_version['divOT_mean'] = data_version['div%_mean'].apply(lambda x: 'T' if x <= 10 else 'O')
-
-            # divOT_fit (like in divOT_mean)
-            data_to_divide_1 = list(data_version['diff_Int_fit'])
-            data_to_divide_2 = data_to_divide_1.copy()[1:]
-            data_to_divide_2.append(0)
-
-            data_div = pd.DataFrame({'x': data_to_divide_1, 'y': data_to_divide_2})
-            data_div['div%_fit'] = abs(data_div['y']) / data_div['x'] * 100
-            data_version['div%_fit'] = list(data_div['div%_fit'])
-            data_version['divOT_fit'] = data_version['div%_fit'].apply(lambda x: 'T' if x <= 10 else 'O')
-
-            return data_version
-
-        def shelf_anomaly(data, n):
-            """
-            Check if there is a shelf. If number of T repeats n times in series, then there is a shelf.
-            :param data: DataFrame with OT values
-            :param n: n times repeats
-            :return: Final temperature and (AlgoCode only for me)
-            """
-
-            code_number = 0
-            max_index_shelf_anomaly = data.index[-1]
-
-            data_with_T_shelf_anomaly = data[data['divOT_mean'] == 'T'].index
-            for index_T_shelf_anomaly in data_with_T_shelf_anomaly:
-                if index_T_shelf_anomaly + 4 > max_index_shelf_anomaly:
-                    final_tmax_shelf_anomaly = data['Temp'][max_index_shelf_anomaly].copy()
-                    break
-                else:
-                    data_set_suspect_shelf_anomaly = data.loc[index_T_shelf_anomaly:index_T_shelf_anomaly + n + 1,
-                                                              :].copy()  # n=3 , N=5
-
-                    num_of_T_shelf_anomaly = len(
-                        data_set_suspect_shelf_anomaly[data_set_suspect_shelf_anomaly['divOT_mean'] == 'T'])
-                    # n+2, Example n=3 -> N=5 ->3/5
-                    if num_of_T_shelf_anomaly >= n:
-                        final_tmax_shelf_anomaly = data_set_suspect_shelf_anomaly.sort_values(by=['diff_Int_fit'])
-                        final_tmax_shelf_anomaly = final_tmax_shelf_anomaly.reset_index()['Temp'][0]
-                        break
-                    else:
-                        code_number += 1
-
-            return [final_tmax_shelf_anomaly, code_number]
-
-        def fit(t_max, code):
-            """
-            Calculate T_max and Int_max by fitting using the quadratic function
-            :param t_max: predicted T_max
-            :param code: Information (nothing important)
-            :return: T_max, Int_max
-            """
-            data = self.data_frame.reset_index(drop=True)
-            shift_number = code.split('-')[-1]
-            T_min = data['Temp'].min()
-            T_max = data['Temp'].max()
-            T_diff = T_max - T_min
-            T_8 = (8 * T_diff) / 100
-            delta_t = T_8 / 2
-            t_suspend = float(t_max)
-
-            # Fitting interval
-            if shift_number == '0' or shift_number == 'DPFM':
-                left_t = t_suspend - delta_t
-                right_t = t_suspend + delta_t
-            else:
-                left_t = t_suspend - (delta_t + float(shift_number))
-                right_t = t_suspend + delta_t
-
-            data_to_fit = data[(data['Temp'] >= left_t) & (data['Temp'] <= right_t)].copy()
-
-            # Creating fitting function
-            temp_points = data_to_fit['Temp']
-            coeff = np.polyfit(data_to_fit['Temp'], data_to_fit['Int'], 2)
-            polynomial_equation = np.poly1d(coeff)
-            fitted_intensity = [polynomial_equation(t) for t in temp_points]
-
-            data_fitted = pd.DataFrame({'Temp': temp_points, 'Int': fitted_intensity})
-            data_fitted = data_fitted.sort_values(by='Temp')
-
-            int_max = data_fitted[data_fitted['Int'] == data_fitted['Int'].max()].index[0]
-            T_fit = data_fitted.loc[int_max]['Temp']
-            I_fit = data_fitted.loc[int_max]['Int']
-
-            return T_fit, I_fit
-
-        # Main algorythm function
-
-        df_fitted = self.fitted_df
-        df_mean = self.mean_df
-
-        df_fitted = df_fitted.rename(columns={'Int': 'Int_fit'})
-        df_mean = df_mean.rename(columns={'Int': 'Int_mean'})
-
-        max_int = df_mean['Int_mean'].max()
-        index_max_int = df_mean[df_mean['Int_mean'] == max_int].index[0]
-        suspended_area = df_mean.iloc[:index_max_int + 1, :].copy()
-        suspended_area['Int_fit'] = df_fitted.loc[:index_max_int + 1, 'Int_fit']
-
-        alg_code = "None"
-        # Starts analysis if more than 10 data points otherwise T_max calculated by (DataFrame.max())
-        if len(suspended_area) <= 10:
-            final_tmax = suspended_area[suspended_area['Int_mean'] == max_int]['Temp']
-            alg_code = 'FM'  # First_max
-        else:
-            # Calculate difference between intensity values (mean_intensity and over_fitted)
-            suspended_area['diff_Int_mean'] = suspended_area['Int_mean'].diff()
-            suspended_area['diff_Int_fit'] = suspended_area['Int_fit'].diff()
-            suspended_area.fillna(0, inplace=True)
-
-            # New data_set that checked the anomaly
-            data_set = diff_anomaly(suspended_area)
-
-            # Estimating the DeltaPositive or Negative
-            minus_indexes = delta_plus_or_minus(data_set)
-
-            # Delta Positive (peak between max int and starting point)
-            if minus_indexes is False:
-                # Check if there is the shelf
-                divOT_mean = list(data_set['divOT_mean'])[:-1]
-                divOT_fit = list(data_set['divOT_fit'])[:-1]
-                divOT_fusion = divOT_mean + divOT_fit
-                # If there is no T (look at shelf anomaly for more details)
-                if 'T' not in divOT_fusion:
-                    final_tmax = data_set[data_set['Int_mean'] == max_int]['Temp']
-                    alg_code = 'DPFM'  # Delta-Positive-First-Max
-                else:
-                    final_tmax_ = shelf_anomaly(data_set, dp)  # DP=3
-                    final_tmax = final_tmax_[0]
-                    code_n = final_tmax_[1]
-                    alg_code = f'DP-{dp}-{code_n}'
-
-            # Delta Negative (No peak, checking for shelf)
-            else:
-
-                max_index = data_set.index[-1]
-                data_with_T = data_set[data_set['divOT_fit'] == 'T'].index
-
-                minus_code = 0
-                for index_T in data_with_T:
-
-                    # When T is at the end of data set
-                    if index_T + 4 > max_index:
-                        final_tmax = data_set.loc[index_T, 'Temp']
-                        alg_code = f'DN-FM-{minus_code}'  # Delta negative
-                        break
-
-                    # T in the middle of dataset
-                    else:
-                        suspected_shelf = data_set.loc[:index_T, :].copy()
-                        suspected_shelf_temp = suspected_shelf.loc[index_T, 'Temp']
-                        suspected_temp = shelf_anomaly(suspected_shelf, dn)  # 5
-
-                        if suspected_temp[0] != suspected_shelf_temp:
-                            final_tmax = suspected_temp[0]
-                            alg_code = f'DN-{dn}-SS-{minus_code}-{suspected_temp[1]}'
-                            break
-                        else:
-                            # Checking if T is continuously in next 3
-                            data_set_suspect_shelf = data_set.loc[index_T:index_T + 3, :].copy()  # 4
-                            num_of_T = len(data_set_suspect_shelf[data_set_suspect_shelf['divOT_fit'] == 'T'])
-                            if num_of_T >= 3:
-                                final_tmax = data_set.loc[index_T, 'Temp']
-                                alg_code = f'DN-{dn}-{minus_code}'
-                                break
-                            else:
-                                minus_code += 1
-
-        t_M, i_M = fit(final_tmax, alg_code)
-
-        return t_M, i_M
+
+def mean_of_intensity_points(analyses, bin_step=2, bin_width=1, smoothing='polyfit', statistic='mean'):
+    """
+    PlotAnalysis.mean_of_intensity_points of several spectra, the over fitted curves of all spectra are calculated in
+    one batch (see curve_fitting.smooth_curves)
+
+    :param analyses: List of PlotAnalysis
+    :param bin_step: Distance between the beginnings of the temperature windows [°C]
+    :param bin_width: Width of one temperature window [°C], not bigger than bin_step
+    :param smoothing: Over fitted curve, one of curve_fitting.SMOOTHING_METHODS
+    :param statistic: Intensity of a window, one of WINDOW_STATISTICS
+    """
+    mean_points = [mean_in_temperature_windows(analysis.data_frame['Temp'].to_numpy(dtype=float),
+                                               analysis.data_frame['Int'].to_numpy(dtype=float), bin_step, bin_width,
+                                               statistic)
+                   for analysis in analyses]
+    fitted_intensities = smooth_curves([temperature for temperature, _ in mean_points],
+                                       [intensity for _, intensity in mean_points], smoothing)
+
+    for analysis, (mean_temp_points, mean_intensity_points), fitted_intensity in zip(analyses, mean_points,
+                                                                                      fitted_intensities):
+        analysis.mean_df = pd.DataFrame({'Temp': mean_temp_points, 'Int': mean_intensity_points})  # Mean DataFrame
+        analysis.fitted_df = pd.DataFrame({'Temp': mean_temp_points, 'Int': fitted_intensity})  # Over fitted DataFrame
+
+
+def peak_finder(analyses, dp=3, dn=5, cut_bins=7):
+    """
+    PlotAnalysis.peak_finder of several spectra, the quadratic fits of all spectra are calculated in one batch
+
+    :param analyses: List of PlotAnalysis after mean_of_intensity_points
+    :param dp: Minimal number of T points in the shelf (Delta Positive)
+    :param dn: Like above (Delta Negative)
+    :param cut_bins: Number of intensity intervals, points in the interval of the first point are not analysed
+    :return: List of (T_max, Int_max)
+    """
+    predicted = []
+    for analysis in analyses:
+        final_tmax, analysis.alg_code = find_t_max(analysis.mean_df['Temp'].to_numpy(),
+                                                   analysis.mean_df['Int'].to_numpy(),
+                                                   analysis.fitted_df['Int'].to_numpy(), dp, dn, cut_bins)
+        predicted.append(final_tmax)
+
+    return fit_t_max([analysis.data_frame['Temp'].to_numpy(dtype=float) for analysis in analyses],
+                     [analysis.data_frame['Int'].to_numpy(dtype=float) for analysis in analyses],
+                     predicted, [analysis.alg_code for analysis in analyses])
+
+
+def cut_codes(values, bins=7):
+    """
+    Number of equal-width interval of each value, like pd.cut(values, bins) (the lowest interval is extended by 0.1 %
+    of the range, intervals are closed on the right side)
+
+    :param values: Array without NaN values
+    :param bins: Number of intervals
+    :return: Array with interval numbers (0 - the lowest)
+    """
+    lowest, highest = values.min() + 0.0, values.max() + 0.0
+    if lowest == highest:
+        lowest -= 0.001 * abs(lowest) if lowest != 0 else 0.001
+        highest += 0.001 * abs(highest) if highest != 0 else 0.001
+        edges = np.linspace(lowest, highest, bins + 1)
+    else:
+        edges = np.linspace(lowest, highest, bins + 1)
+        edges[0] -= (highest - lowest) * 0.001
+    return np.searchsorted(edges, values, side='left') - 1
+
+
+def flat_points(differences):
+    """
+    'T' points of diff_anomaly: the next difference is at most 10 % of this one (|d[i + 1]| / d[i] <= 10 %, the last
+    difference is compared with 0). Other points are 'O' points (also when d[i] = 0 and the ratio is not a number).
+
+    :param differences: Array with differences of intensity
+    :return: Boolean array (True -> 'T')
+    """
+    following = np.append(np.abs(differences[1:]), 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return following / differences * 100 <= 10
+
+
+def count_in_windows(labels, points, first_labels, width, size=None):
+    """
+    Number of True points in label windows [first_label, first_label + width] (like len of DataFrame.loc slices),
+    calculated from the cumulative sum of points
+
+    :param labels: Sorted array with row labels (index of suspended_area)
+    :param points: Boolean array (e.g., 'T' points)
+    :param first_labels: Array with labels of the window beginnings
+    :param width: Width of the window in labels
+    :param size: Only first size rows are used (None -> all rows)
+    :return: Array with numbers of points, array with positions of window beginnings and ends (exclusive)
+    """
+    size = len(labels) if size is None else size
+    cumulative = np.concatenate(([0], np.cumsum(points[:size])))
+    left = np.searchsorted(labels[:size], first_labels, side='left')
+    right = np.searchsorted(labels[:size], first_labels + width, side='right')
+    return cumulative[right] - cumulative[left], left, right
+
+
+def shelf_anomaly(labels, temperature, diff_fit, points, n, size=None):
+    """
+    Check if there is a shelf. If at least n 'T' points are in the window of n + 2 rows starting at 'T' point, then
+    there is a shelf. The windows of all 'T' points are counted at once, the first one with the shelf (or the first
+    'T' point at the end of data) is taken.
+
+    :param labels: Sorted array with row labels
+    :param temperature: Array with temperatures
+    :param diff_fit: Array with differences of over fitted intensity
+    :param points: Boolean array with 'T' points
+    :param n: Minimal number of 'T' points in the window
+    :param size: Only first size rows are used (None -> all rows)
+    :return: Temperature of the shelf, number of 'T' points checked before (AlgoCode)
+    """
+    size = len(labels) if size is None else size
+    last_label = labels[size - 1]
+    candidates = np.flatnonzero(points[:size])
+    counts, left, right = count_in_windows(labels, points, labels[candidates], n + 1, size)
+    at_end = labels[candidates] + 4 > last_label
+    found = np.flatnonzero(at_end | (counts >= n))
+    if len(found) == 0:
+        raise ValueError('There is no shelf in the data')
+
+    code_number = int(found[0])
+    if at_end[code_number]:
+        return temperature[size - 1], code_number
+    window = slice(left[code_number], right[code_number])
+    return temperature[window][np.argmin(diff_fit[window])], code_number
+
+
+def find_t_max(temperature, int_mean, int_fit, dp=3, dn=5, cut_bins=7):
+    """
+    The first peak of mean intensity points (peak_finder without the final fit). All steps are done on NumPy arrays:
+    rows of DataFrames are boolean masks, T/O columns are boolean arrays and shelves are found by counting 'T' points
+    in windows with the cumulative sum.
+
+    :param temperature: Array with temperatures of mean points
+    :param int_mean: Array with mean intensities
+    :param int_fit: Array with over fitted intensities
+    :param dp: Minimal number of T points in the shelf (Delta Positive)
+    :param dn: Like above (Delta Negative)
+    :param cut_bins: Number of intensity intervals (7 -> the lowest 14 % of the intensity range is not analysed)
+    :return: Predicted T_max, AlgoCode (FM, DPFM, DP-n-k, DN-...)
+    """
+    max_int = int_mean.max()
+    index_max_int = int(np.argmax(int_mean == max_int))
+    size = index_max_int + 1  # suspended area: from the start to the first max
+
+    # Starts analysis if more than 10 data points otherwise T_max calculated by max()
+    if size <= 10:
+        return temperature[index_max_int], 'FM'  # First_max
+
+    # Difference between intensity values (mean_intensity and over_fitted)
+    diff_mean = np.diff(int_mean[:size], prepend=np.nan)
+    diff_fit = np.diff(int_fit[:size], prepend=np.nan)
+    diff_mean[0] = diff_fit[0] = 0
+    flat_mean = flat_points(diff_mean)
+
+    # Delete the lowest values (the interval of the first point)
+    codes = cut_codes(int_mean[:size], cut_bins)
+    kept = codes != codes[0]
+    labels = np.flatnonzero(kept)
+    temperature = temperature[:size][kept]
+    int_mean = int_mean[:size][kept]
+    diff_mean = diff_mean[kept]
+    diff_fit = diff_fit[kept]
+    flat_mean = flat_mean[kept]
+    flat_fit = flat_points(diff_fit)
+
+    # Delta Positive (peak between max int and starting point)
+    if not ((diff_mean < 0).any() and (diff_fit < 0).any()):
+        # If there is no T (look at shelf anomaly for more details)
+        if not (flat_mean[:-1].any() or flat_fit[:-1].any()):
+            first_max = temperature[int_mean == max_int]
+            if len(first_max) == 0:
+                raise ValueError('The maximum is in the interval of the first point')
+            return first_max[0], 'DPFM'  # Delta-Positive-First-Max
+        t_max, code_number = shelf_anomaly(labels, temperature, diff_fit, flat_mean, dp)
+        return t_max, f'DP-{dp}-{code_number}'
+
+    # Delta Negative (No peak, checking for shelf)
+    last_label = labels[-1]
+    for minus_code, position in enumerate(np.flatnonzero(flat_fit)):
+        # When T is at the end of data set
+        if labels[position] + 4 > last_label:
+            return temperature[position], f'DN-FM-{minus_code}'  # Delta negative
+
+        # T in the middle of dataset
+        suspected_temp, code_number = shelf_anomaly(labels, temperature, diff_fit, flat_mean, dn, position + 1)
+        if suspected_temp != temperature[position]:
+            return suspected_temp, f'DN-{dn}-SS-{minus_code}-{code_number}'
+
+        # Checking if T is continuously in next 3
+        num_of_t, _, _ = count_in_windows(labels, flat_fit, labels[position:position + 1], 3)
+        if num_of_t[0] >= 3:
+            return temperature[position], f'DN-{dn}-{minus_code}'
+
+    raise ValueError('There is no shelf in the data')
+
+
+def fitting_interval(temperature, t_max, code):
+    """
+    Points used by the quadratic fit of T_max: T_max +/- 4 % of the temperature range, the left side is moved by the
+    last number of the AlgoCode
+    :param temperature: Array with temperatures (raw data)
+    :param t_max: predicted T_max
+    :param code: AlgoCode
+    :return: Boolean array
+    """
+    shift_number = code.split('-')[-1]
+    delta_t = (8 * (np.nanmax(temperature) - np.nanmin(temperature))) / 100 / 2
+    t_suspend = float(t_max)
+
+    if shift_number == '0' or shift_number == 'DPFM':
+        left_t = t_suspend - delta_t
+    else:
+        left_t = t_suspend - (delta_t + float(shift_number))
+    right_t = t_suspend + delta_t
+
+    return (temperature >= left_t) & (temperature <= right_t)
+
+
+def fit_t_max(temperatures, intensities, t_maxes, codes):
+    """
+    Calculate T_max and Int_max by fitting using the quadratic function (all spectra in one batch)
+    :param temperatures: List of arrays with temperatures (raw data)
+    :param intensities: List of arrays with intensities
+    :param t_maxes: List of predicted T_max
+    :param codes: List of AlgoCodes
+    :return: List of (T_max, Int_max)
+    """
+    to_fit = [fitting_interval(temperature, t_max, code)
+              for temperature, t_max, code in zip(temperatures, t_maxes, codes)]
+    if any(not points.any() for points in to_fit):
+        raise TypeError('There are no points to fit around T_max')
+
+    batch = CurveBatch([temperature[points] for temperature, points in zip(temperatures, to_fit)],
+                       [intensity[points] for intensity, points in zip(intensities, to_fit)])
+    fitted_intensity = np.where(batch.mask, polynomial_fit(batch, 2)[1], -np.inf)
+
+    # The highest fitted point (the lowest temperature if there are more of them)
+    highest = fitted_intensity == fitted_intensity.max(axis=1, keepdims=True)
+    highest = np.where(highest, batch.x, np.inf).argmin(axis=1)
+    rows = np.arange(len(batch))
+    return list(zip(batch.x[rows, highest], fitted_intensity[rows, highest]))
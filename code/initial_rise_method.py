@@ -1,224 +1,623 @@
+import copy
+from statistics import NormalDist
 import numpy as np
 import pandas as pd
+from binned_statistics import SortedBins
 
 
-class InitialRise:
+K_BOLTZMANN = 8.617333262145E-5  # Boltzmann constant [eV/K]
+BLIND_FIT_VALUES = 2 ** 22  # Max size of residual arrays (curves x linear functions x points) in one blind_fit call
+
+# u(E) of the linear fit: covariance -> np.polyfit-like covariance of the slope, bootstrap -> standard deviation of
+# E fitted again to resampled chosen points (with replacement), jackknife -> E without one point
+UNCERTAINTY_METHODS = ('covariance', 'bootstrap', 'jackknife')
+CONFIDENCE_LEVEL = 0.95  # Confidence interval of E calculated by bootstrap / jackknife
+RESAMPLE_MIN_POINTS = 5  # Spectra with fewer fit points have no resampled u(E) and interval (NaN)
+SEGMENT_MIN_POINTS = 3  # Minimal number of points in a segment of segment_fitter
+
+
+def group_reduce(ufunc, values, groups, size, initial):
     """
-    The Initial Rise Method implemented in Python. This Class is made to find a depth of the
-    traps in persistent luminescence materials.
+    :return: Array with ufunc (np.minimum, np.fmin, np.add, ...) of values of each group (initial for empty groups)
     """
+    result = np.full(size, initial, dtype=float)
+    ufunc.at(result, groups, values)
+    return result
 
-    def __init__(self, data, t_max):
-        self.k = 8.617333262145E-5  # Boltzmann constant [eV/K]
 
-        # Selecting data lower than T_max and transform data to log(I) and 1/kT
-        data = data.drop_duplicates()
-        data = data[data['Temp'] <= t_max].copy()
-        data.reset_index(drop=True, inplace=True)
+def group_boundaries(groups, size):
+    """
+    :param groups: Sorted array with group numbers of rows
+    :param size: Number of groups
+    :return: Array with the first row of each group and the end of the last one (like offsets of SpectrumSet)
+    """
+    return np.searchsorted(groups, np.arange(size + 1))
 
-        raw_data = data.copy()
-        raw_data = raw_data[raw_data['Int'] > 1]  # Bo log
-        raw_data['1/kT'] = 1 / ((raw_data['Temp'] + 273.15) * self.k)
-        raw_data['ln(I)'] = np.log(raw_data['Int'])
-        raw_data['round_temp'] = round(raw_data['Temp'])
-        self.raw_data = raw_data
 
-        data_median = pd.DataFrame(raw_data.groupby(by='round_temp').median()['Int'])
-        data_median.reset_index(inplace=True)
-        data_median['1/kT'] = 1 / ((data_median['round_temp'] + 273.15) * self.k)
-        data_median['ln(I)'] = np.log(data_median['Int'])
-        self.data_median = data_median
+def segment_numbers(*keys):
+    """
+    :param keys: Arrays sorted by all keys together (like rows sorted by spectrum and temperature)
+    :return: Array with the number of the segment of equal keys of each row (0, 0, 1, 2, 2, ...)
+    """
+    if len(keys[0]) == 0:
+        return np.empty(0, dtype=np.int64)
+    change = np.zeros(len(keys[0]), dtype=bool)
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    return np.cumsum(change)
 
-        # Data above 15% of max value
 
-        i_min = data_median['Int'].min()
-        i_max = data_median['Int'].max()
-        i_value = (i_max - i_min) * 0.15 + i_min
-
-        data_int_15 = raw_data[raw_data['Int'] <= i_value].copy()
-        data_int_15.reset_index(drop=True, inplace=True)
-
-        mean_points_chosen = data_median[data_median['Int'] <= i_value].copy()
-        mean_points_chosen.sort_values(by='round_temp', inplace=True)
-        mean_points_chosen.reset_index(drop=True, inplace=True)
-
-        self.mean_points_chosen = mean_points_chosen
-
-        def linear_function(x, a, b):
-            return a * x + b
-
-        def blind_fit(mean_points_blind_function):
-            """
-            The algorithm:
-
-            1. Determine all possible linear functions on a given interval
-            2. Fit these functions and calculate residuals
-            3. Create a DataFrame containing columns-- first: number of data taking part in fitting,
-            selected: data size with residues less or equal 0.1
-            4. Create 'p' parameter which is a fraction of p = selected/len(all_data) => Fraction of significant data
-            5. Create a difference between p values
-            6. The p value will be increasing all the time because every next fitting line is more accurate than
-            the previous one. However, when the fitted line has an L-shape we will observe a decreasing trend
-            which means that we should take this ‘p’ value.
-
-            :param mean_points_blind_function: Mean transformed data points 
-            :return: slope and intercept of linear fitting 
-            """
-
-            # Specify data length, max and min points in function 
-            data_l = len(mean_points_blind_function) - 1
-            max_kT_value = mean_points_blind_function['1/kT'].loc[data_l]
-            min_kT_value = mean_points_blind_function['1/kT'].loc[0]
-            min_ln_value = mean_points_blind_function['ln(I)'].loc[0]
-
-            kT_range = np.linspace(min_kT_value, max_kT_value, data_l)
-            kT_range = kT_range[::-1]
-
-            diff_sum = []
-            a_values = []
-            b_values = []
-            kT_values = []
-
-            data_length = []
-            data_under1 = []
-
-            # Checking all possible linear functions for each linear function
-            # Calculate data length and residua
-            for x_2 in kT_range:
-
-                y_2 = mean_points_blind_function['ln(I)'].max()
-                y_1 = mean_points_blind_function['ln(I)'].min()
-                x_1 = mean_points_blind_function['1/kT'].min()
-
-                if x_1 == x_2:
-                    continue
-
-                a = abs((y_2 - y_1) / (x_2 - x_1))
-                b = y_2 - (-a) * x_1
-
-                original = mean_points_blind_function.copy()
-
-                fitted = [linear_function(x, -a, b) for x in original['1/kT']]
-                df_fitted = pd.DataFrame(fitted, columns=['fitted'])
-                original = pd.concat([original, df_fitted], axis=1)
-                original['diff'] = abs(original['ln(I)'] - original['fitted'])
-
-                original = original[original['fitted'] > min_ln_value].copy()
-
-                data_all = len(original)
-                data_under = len(original[original['diff'] <= 0.1])
-
-                data_length.append(data_all)
-                data_under1.append(data_under)
-
-                diff_sum.append(original['diff'].sum())
-                a_values.append(a)
-                b_values.append(b)
-                kT_values.append(x_2)
-
-                # plt.scatter(mean_points_chosen['1/kT'], mean_points_chosen['ln(I)'])
-                # plt.scatter(original['1/kT'], original['fitted'])
-                # plt.show()
-
-            # Data Frame with summary values 
-            data_length_result = pd.DataFrame({'first': data_length, 'selected': data_under1,
-                                               'a': a_values, 'b': b_values, 'kT': kT_values,
-                                               'sum_error': diff_sum})
-            data_length_result['p'] = data_length_result['selected'] / len(kT_range)
-            
-            data_length_result['p_diff'] = data_length_result['p'].diff()
-    
-            max_value = data_length_result['p'].max()
-            max_p_index = data_length_result[data_length_result['p'] == max_value].index[0]
-
-            index_count = 0
-            for p_diff in data_length_result['p_diff']:  
-                if p_diff < 0 and index_count < max_p_index:
-                    max_value_supp = data_length_result['p'].loc[index_count - 1]
-                    if max_value_supp > 0.05:
-                        max_value = data_length_result['p'].loc[index_count - 1] 
-                        break
-                index_count += 1
-
-            highest_data = data_length_result[data_length_result['p'] == max_value].copy()
-            e_value = highest_data['a']
-
-            # Checking the optimal values
-            if len(highest_data) == 1:
-                max_value_up = max_value + 0.05
-                data_length_result = data_length_result[
-                    (data_length_result['p'] <= max_value_up) & (data_length_result['p'] >= max_value)].copy()
-                min_error = data_length_result['sum_error'].min()
-                e_value = data_length_result[data_length_result['sum_error'] == min_error]['a']
-                b = data_length_result[data_length_result['sum_error'] == min_error]['b']
-                b_F = b.values[0]
-                a_F = e_value.values[0]
-                cof = [a_F, b_F]
-                return cof
+def blind_fit(kT_points, ln_points, lengths, residual_limit=0.1):
+    """
+    The algorithm (for all curves at once, curves are padded to the longest one):
+
+    1. Determine all possible linear functions on a given interval
+    2. Fit these functions and calculate residuals
+    3. Create a table containing columns-- first: number of data taking part in fitting,
+    selected: data size with residues less or equal 0.1 (residual_limit)
+    4. Create 'p' parameter which is a fraction of p = selected/len(all_data) => Fraction of significant data
+    5. Create a difference between p values
+    6. The p value will be increasing all the time because every next fitting line is more accurate than
+    the previous one. However, when the fitted line has an L-shape we will observe a decreasing trend
+    which means that we should take this 'p' value.
+
+    :param kT_points: (S, M) array with 1/kT of mean transformed data points (sorted by temperature)
+    :param ln_points: (S, M) array with ln(I) of mean transformed data points
+    :param lengths: Array with numbers of points of each curve
+    :param residual_limit: The biggest residual of a significant point
+    :return: Arrays with slope (a, the line is -a * x + b) and intercept (b) of each curve, NaN if not found
+    """
+    curves, width = kT_points.shape
+    points = np.arange(width) < lengths[:, None]
+    last = np.maximum(lengths - 1, 0)
+    rows = np.arange(curves)
+
+    # kT_range = np.linspace(kT[0], kT[-1], len - 1)[::-1] of each curve
+    number = lengths - 1
+    division = number - 1
+    start = kT_points[:, 0]
+    stop = kT_points[rows, last]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        step = np.where(division > 0, (stop - start) / np.maximum(division, 1), 0.0)
+    columns = np.arange(max(width - 1, 0))
+    kT_range = columns * step[:, None] + start[:, None]
+    has_end = division > 0
+    kT_range[rows[has_end], division[has_end]] = stop[has_end]
+    reverse = np.clip(number[:, None] - 1 - columns, 0, None)
+    kT_range = kT_range[rows[:, None], reverse] if len(columns) else kT_range
+
+    # All possible linear functions (one per x_2 value)
+    y_2 = np.where(points, ln_points, -np.inf).max(axis=1, initial=-np.inf)
+    y_1 = np.where(points, ln_points, np.inf).min(axis=1, initial=np.inf)
+    x_1 = np.where(points, kT_points, np.inf).min(axis=1, initial=np.inf)
+    functions = (columns < number[:, None]) & (kT_range != x_1[:, None])
+    order = np.argsort(~functions, axis=1, kind='stable')  # Functions moved to the beginning (in kT_range order)
+    kT_values = np.take_along_axis(kT_range, order, axis=1)
+    functions = np.take_along_axis(functions, order, axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a_values = abs((y_2 - y_1)[:, None] / (kT_values - x_1[:, None]))
+        b_values = y_2[:, None] - (-a_values) * x_1[:, None]
+
+        # Residual array: curve -> linear function -> data point
+        fitted = (-a_values)[:, :, None] * kT_points[:, None, :] + b_values[:, :, None]
+        diff = abs(ln_points[:, None, :] - fitted)
+        in_range = (fitted > ln_points[:, :1, None]) & points[:, None, :] & functions[:, :, None]
+
+    data_under1 = (in_range & (diff <= residual_limit)).sum(axis=2)
+    sum_error = np.where(in_range, diff, 0).sum(axis=2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_values = np.where(functions, data_under1 / number[:, None], -np.inf)
+
+    max_value = p_values.max(axis=1, initial=-np.inf)
+    max_p_index = np.argmax(p_values, axis=1)
+
+    # First decrease of p before the highest p value (L-shape)
+    p_index = np.arange(1, p_values.shape[1])
+    with np.errstate(invalid='ignore'):
+        decrease = (functions[:, 1:] & (np.diff(p_values, axis=1) < 0) & (p_index < max_p_index[:, None]) &
+                    (p_values[:, :-1] > 0.05))
+    has_decrease = decrease.any(axis=1)
+    first_decrease = np.argmax(decrease, axis=1)
+    max_value = np.where(has_decrease, p_values[rows, first_decrease], max_value)
+
+    highest = functions & (p_values == max_value[:, None])
+    single = highest.sum(axis=1) == 1
+
+    # Checking the optimal values
+    candidates = np.where(single[:, None], functions & (p_values <= (max_value + 0.05)[:, None]) &
+                          (p_values >= max_value[:, None]),
+                          functions & (sum_error > 0) &
+                          ((a_values[:, :, None] == a_values[:, None, :]) & highest[:, None, :]).any(axis=2))
+    errors = np.where(candidates, sum_error, np.inf)
+    chosen = np.argmax(candidates & (errors == errors.min(axis=1, initial=np.inf)[:, None]), axis=1)
+    found = candidates.any(axis=1) & (number > 0)
+    return np.where(found, a_values[rows, chosen], np.nan), np.where(found, b_values[rows, chosen], np.nan)
+
+
+def blind_fit_curves(kT, ln, offsets, residual_limit=0.1, max_values=BLIND_FIT_VALUES):
+    """
+    blind_fit of all curves, curves with similar numbers of points are fitted together (the residual arrays grow with
+    the square of the longest curve)
+
+    :param kT: Array with 1/kT of mean points of all curves
+    :param ln: Array with ln(I) of mean points of all curves
+    :param offsets: Points of curve i are kT[offsets[i]:offsets[i + 1]]
+    :param residual_limit: The biggest residual of a significant point
+    :param max_values: Max size of residual arrays in one blind_fit call
+    :return: Arrays with slope and intercept of each curve (see blind_fit)
+    """
+    lengths = np.diff(offsets)
+    a_blind = np.full(len(lengths), np.nan)
+    b_blind = np.full(len(lengths), np.nan)
+    order = np.argsort(lengths, kind='stable')
+    start = 0
+    while start < len(order):
+        stop = start + 1
+        while stop < len(order) and (stop + 1 - start) * int(lengths[order[stop]]) ** 2 <= max_values:
+            stop += 1
+        curves = order[start:stop]
+        width = max(int(lengths[curves[-1]]), 1)
+        points = np.arange(width) < lengths[curves, None]
+        indexes = np.minimum(offsets[curves, None] + np.arange(width), len(kT) - 1)
+        kT_points = np.where(points, kT[indexes], 0.0) if len(kT) else np.zeros(points.shape)
+        ln_points = np.where(points, ln[indexes], 0.0) if len(ln) else np.zeros(points.shape)
+        a_blind[curves], b_blind[curves] = blind_fit(kT_points, ln_points, lengths[curves], residual_limit)
+        start = stop
+    return a_blind, b_blind
+
+
+def blind_fitter(kT, ln, offsets, residual_limit=0.1):
+    """
+    Fitter of the original IRM: the blind fit line (see blind_fit_curves), the fit points are chosen by fit_percent
+    :return: Arrays with slope (a, the line is -a * x + b) and intercept (b) of each curve, None (no fit points)
+    """
+    return (*blind_fit_curves(kT, ln, offsets, residual_limit), None)
 
-            else:
-                result_matrix = pd.DataFrame({'kT': kT_values, 'sum_error': diff_sum,
-                                              'a': a_values, 'b': b_values})
-
-                result_matrix = result_matrix[result_matrix['sum_error'] > 0].copy()
-                result_matrix = result_matrix[result_matrix['a'].isin(e_value.values)]
-                min_error = result_matrix['sum_error'].min()
-                e_value = result_matrix[result_matrix['sum_error'] == min_error]['a']
-                b_v = result_matrix[result_matrix['sum_error'] == min_error]['b']
-                a_F = e_value.values[0]
-                b_F = b_v.values[0]
-                cof = [a_F, b_F]
-                return cof
-
-        def linear_fit_r2(data_frame):
-            """
-            A method that returns covariance matrix, r2, slope and the intercept
-            :param data_frame: DataFrame with values to calculate.
-            :return: r2, a, b, u(a)
-            """
-            results = data_frame.copy()
-
-            lin_cof, cov_matrix = np.polyfit(data_frame['1/kT'], data_frame['ln(I)'], 1, cov=True)
-            cov = np.sqrt(cov_matrix[0][0])
-
-            linear_equation = np.poly1d(lin_cof)
-            fitted_linear = [linear_equation(t) for t in data_frame['1/kT']]
-            results['fitted'] = fitted_linear
-
-            RSS = np.sum(np.square(results['ln(I)'] - results['fitted']))
-            TSS = np.sum(np.square(results['ln(I)'] - results['fitted'].mean()))
-
-            r2 = 1 - RSS / TSS
-            return r2, lin_cof[0], lin_cof[1], cov
+
+def line_from_sums(count, sum_x, sum_y, sum_xx, sum_xy, sum_yy):
+    """
+    Least squares lines of point sets given only by their sums
+    :return: Arrays with slope, intercept and residual sum of squares of each line
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sxx = sum_xx - sum_x * sum_x / count
+        sxy = sum_xy - sum_x * sum_y / count
+        syy = sum_yy - sum_y * sum_y / count
+        slope = sxy / sxx
+        return slope, (sum_y - slope * sum_x) / count, np.maximum(syy - slope * sxy, 0)
+
+
+def segment_fitter(kT, ln, offsets, residual_limit=0.1, min_points=SEGMENT_MIN_POINTS):
+    """
+    Two-segment linear regression of each curve: the points are split at the breakpoint with the smallest residual sum
+    of squares of both least squares lines. The sums of each segment are differences of prefix sums of x, y, x^2, xy
+    and y^2, so every breakpoint of all curves is checked at once in linear time. Of the two segments the one with the
+    steeper decline of ln(I) (higher E) is the initial rise, the other one is the background or the bend near T_max.
+    Curves with less than 2 * min_points points are fitted with one line.
+
+    :param kT: Array with 1/kT of mean points of all curves (sorted by temperature)
+    :param ln: Array with ln(I) of mean points of all curves
+    :param offsets: Points of curve i are kT[offsets[i]:offsets[i + 1]]
+    :param residual_limit: Not used (the same parameters as blind_fitter)
+    :param min_points: Minimal number of points in a segment
+    :return: Arrays with slope (a, the line is -a * x + b) and intercept (b) of each curve, boolean array with fit
+    points (points of the initial rise segment)
+    """
+    size = len(offsets) - 1
+    lengths = np.diff(offsets)
+    group = np.repeat(np.arange(size), lengths)
+    with np.errstate(invalid='ignore'):
+        mean_x = np.bincount(group, weights=kT, minlength=size) / lengths
+        mean_y = np.bincount(group, weights=ln, minlength=size) / lengths
+    x = kT - mean_x[group]  # Centred values (the sums are not cancelled)
+    y = ln - mean_y[group]
+    prefix = [np.concatenate(([0.0], np.cumsum(values))) for values in (x, y, x * x, x * y, y * y)]
+
+    def segment_lines(start, stop):
+        return line_from_sums(stop - start, *(sums[stop] - sums[start] for sums in prefix))
+
+    # Each point is the last point of the left segment (the lower temperatures)
+    first, end, last = offsets[:-1][group], np.arange(len(x)) + 1, offsets[1:][group]
+    left, right = segment_lines(first, end), segment_lines(end, last)
+    total = np.where((end - first >= min_points) & (last - end >= min_points), left[2] + right[2], np.inf)
+    best = group_reduce(np.minimum, total, group, size, np.inf)
+    positions = np.flatnonzero(np.isfinite(total) & (total == best[group]))
+    curves, first_positions = np.unique(group[positions], return_index=True)
+    split = positions[first_positions]
+
+    # The steeper segment, one segment of all points if there is no breakpoint
+    start = offsets[:-1].copy()
+    stop = offsets[1:].copy()
+    steeper_left = left[0][split] <= right[0][split]
+    stop[curves[steeper_left]] = end[split[steeper_left]]
+    start[curves[~steeper_left]] = end[split[~steeper_left]]
+    slope, intercept, _ = segment_lines(start, stop)
+
+    position = np.arange(len(x))
+    points = (position >= start[group]) & (position < stop[group]) & ~np.isnan(slope[group])
+    return -slope, intercept + mean_y - slope * mean_x, points
+
+
+# Fitters of the initial rise line, fitter(kT, ln, offsets, residual_limit) -> a, b, fit points (None -> fit_percent
+# and E is the mean of the fitter line and the linear fit, otherwise E = a of the fitter line)
+FITTERS = {'blind': blind_fitter, 'segment': segment_fitter}
+
+
+def resample_indexes(size, method='bootstrap', resamples=2000, random=None):
+    """
+    :param size: Number of points
+    :param method: 'bootstrap' (resamples x size random indexes) or 'jackknife' (each point left out once)
+    :param resamples: Number of bootstrap resamples
+    :param random: np.random.Generator (bootstrap)
+    :return: (resamples, size) or (size, size - 1) array with sorted indexes of points of each resample (the points
+    stay in the temperature order)
+    """
+    if method == 'jackknife':
+        return np.arange(1, size)[None, :] - np.tri(size, size - 1, -1, dtype=np.int64)
+    random = np.random.default_rng() if random is None else random
+    return np.sort(random.integers(0, size, (resamples, size)), axis=1)
+
+
+def linear_fit_r2(x, y, groups, size):
+    """
+    Linear least squares fit of each group of points (centred sums, like np.polyfit(x, y, 1, cov=True))
+    :param x: Array with 1/kT values
+    :param y: Array with ln(I) values
+    :param groups: Array with group numbers of points
+    :param size: Number of groups
+    :return: Arrays with r2, slope, intercept and uncertainty of slope of each group (NaN for less than 3 points)
+    """
+    count = np.bincount(groups, minlength=size).astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_mean = np.bincount(groups, weights=x, minlength=size) / count
+        y_mean = np.bincount(groups, weights=y, minlength=size) / count
+        dx = x - x_mean[groups]
+        dy = y - y_mean[groups]
+        sxx = np.bincount(groups, weights=dx * dx, minlength=size)
+        slope = np.bincount(groups, weights=dx * dy, minlength=size) / sxx
+        intercept = y_mean - slope * x_mean
+
+        residual = y - (slope[groups] * x + intercept[groups])
+        rss = np.bincount(groups, weights=residual * residual, minlength=size)
+        tss = np.bincount(groups, weights=dy * dy, minlength=size)
+        r2 = 1 - rss / tss
+        uncertain_slope = np.sqrt(rss / (count - 2) / sxx)
+
+    fitted = count > 2  # Covariance needs more points than coefficients
+    return (np.where(fitted, r2, np.nan), np.where(fitted, slope, np.nan), np.where(fitted, intercept, np.nan),
+            np.where(fitted, uncertain_slope, np.nan))
+
+
+class InitialRiseBatch:
+    """
+    The Initial Rise Method of all T_stop spectra at once. All spectra are kept in flat arrays with the spectrum number
+    of each row, so each step is one array operation over all curves:
+
+        -> data lower than T_max without duplicates, transformed to 1/kT and ln(I)
+        -> median intensity for each full degree (binned_statistics.SortedBins)
+        -> medians lower than 15% (rise_threshold) of the intensity range
+        -> blind fit of all curves (padded arrays) and the linear fit of chosen points (grouped sums)
+
+    The line found by the blind fit can be replaced by another fitter from FITTERS (e.g., 'segment' - segment_fitter).
+
+    table contains E, u(E) and the selected points of each spectrum, spectra where IRM fails have NaN values and the
+    reason in the 'error' column. InitialRise.from_batch gives DataFrames of one spectrum (charts, IRM results).
+    with_parameters() repeats only the fits (the medians do not depend on the IRM parameters).
+    """
+
+    def __init__(self, spectra, t_maxes, rise_threshold=0.15, t_stop_names=None, residual_limit=0.1, fit_percent=90,
+                 fitter='blind'):
+        """
+        :param spectra: SpectrumSet or list of DataFrames ('Temp', 'Int') / Spectrum
+        :param t_maxes: T_max of each spectrum
+        :param rise_threshold: Part of the intensity range used by IRM
+        :param t_stop_names: Names of spectra in the table (default - names from SpectrumSet or numbers)
+        :param residual_limit: The biggest residual of a significant point in the blind fit
+        :param fit_percent: Points where the blind fit line is at least fit_percent % of ln(I) are fitted
+        :param fitter: Name of the fitter in FITTERS
+        """
+        if t_stop_names is None:
+            t_stop_names = getattr(spectra, 't_stop_names', None)
+        curves = [(spectrum.temperature, spectrum.intensity) if hasattr(spectrum, 'temperature') else
+                  (spectrum['Temp'].to_numpy(dtype=float), spectrum['Int'].to_numpy(dtype=float))
+                  for spectrum in spectra]
+        size = len(curves)
+        self.size = size
+        self.t_maxes = np.asarray(t_maxes, dtype=float)
+        self.t_stop_names = list(t_stop_names) if t_stop_names is not None else list(range(size))
+
+        lengths = np.array([len(temperature) for temperature, _ in curves], dtype=np.int64)
+        group = np.repeat(np.arange(size), lengths)
+        temperature = np.concatenate([temperature for temperature, _ in curves]) if size else np.empty(0)
+        intensity = np.concatenate([intensity for _, intensity in curves]) if size else np.empty(0)
+
+        # Selecting data lower than T_max, rows sorted by spectrum and temperature (spectra are usually sorted already)
+        with np.errstate(invalid='ignore'):
+            below = np.flatnonzero(temperature <= self.t_maxes[group])
+        if np.any((np.diff(temperature[below]) < 0) & (np.diff(group[below]) == 0)):
+            below = below[np.lexsort((temperature[below], group[below]))]
+
+        # Without duplicated rows (only rows with repeated temperature are compared)
+        kept = np.zeros(len(temperature), dtype=bool)
+        kept[below] = True
+        run = segment_numbers(group[below], temperature[below])
+        repeated = np.flatnonzero(np.bincount(run)[run] > 1) if len(run) else run
+        order = below[repeated[np.lexsort((below[repeated], intensity[below[repeated]], run[repeated]))]]
+        same_intensity = (intensity[order[1:]] == intensity[order[:-1]]) | (np.isnan(intensity[order[1:]]) &
+                                                                           np.isnan(intensity[order[:-1]]))
+        duplicated = (group[order[1:]] == group[order[:-1]]) & (temperature[order[1:]] == temperature[order[:-1]])
+        kept[order[1:][duplicated & same_intensity]] = False
+        labels = np.cumsum(kept) - 1  # Row labels like after reset_index
+        labels = labels - np.concatenate(([0], np.cumsum(np.bincount(group[kept], minlength=size))))[group]
+
+        # Transform data to log(I) and 1/kT
+        with np.errstate(invalid='ignore'):
+            raw_sorted = below[kept[below] & (intensity[below] > 1)]  # Bo log
+        raw = np.sort(raw_sorted)  # Rows in the order of data
+        self.raw_group = group[raw]
+        self.raw_labels = labels[raw]
+        self.raw_temperature = temperature[raw]
+        self.raw_intensity = intensity[raw]
+        self.raw_kT = 1 / ((self.raw_temperature + 273.15) * K_BOLTZMANN)
+        self.raw_ln = np.log(self.raw_intensity)
+        self.raw_round = np.round(self.raw_temperature)
+        self.raw_offsets = group_boundaries(self.raw_group, size)
+
+        # Median of each full degree (rows are sorted by spectrum and temperature, so each degree is one segment)
+        sorted_group = group[raw_sorted]
+        sorted_round = np.round(temperature[raw_sorted])
+        degrees = SortedBins(segment_numbers(sorted_group, sorted_round), intensity[raw_sorted])
+        first = degrees.offsets[:-1]
+        self.median_group = sorted_group[first]
+        self.median_round = sorted_round[first]
+        self.median_intensity = degrees.median()
+        self.median_kT = 1 / ((self.median_round + 273.15) * K_BOLTZMANN)
+        self.median_ln = np.log(self.median_intensity)
+        self.median_offsets = group_boundaries(self.median_group, size)
+
+        self.fit(rise_threshold, residual_limit, fit_percent, fitter)
+
+    def fit(self, rise_threshold=0.15, residual_limit=0.1, fit_percent=90, fitter='blind'):
+        """
+        Selects points below the rise threshold and fits them (blind fit and the linear fit), sets table
+        """
+        self.rise_threshold = rise_threshold
+        self.residual_limit = residual_limit
+        self.fit_percent = fit_percent
+        if fitter not in FITTERS:
+            raise ValueError(f'Unknown Initial Rise Method fitter: {fitter}')
+        self.fitter = fitter
+        size = self.size
+        median = self.median_intensity
+
+        # Data above 15% (rise_threshold) of max value
+        i_min = group_reduce(np.minimum, median, self.median_group, size, np.inf)
+        i_max = group_reduce(np.maximum, median, self.median_group, size, -np.inf)
+        i_value = (i_max - i_min) * rise_threshold + i_min
+        chosen = np.flatnonzero(median <= i_value[self.median_group])
+        self.chosen_group = self.median_group[chosen]
+        self.chosen_round = self.median_round[chosen]
+        self.chosen_intensity = median[chosen]
+        self.chosen_kT = self.median_kT[chosen]
+        self.chosen_ln = self.median_ln[chosen]
+        self.chosen_offsets = group_boundaries(self.chosen_group, size)
+
+        self.fit_chosen()
+        self.table = self.create_table(np.diff(self.chosen_offsets))
+        self.u_resampled = self.e_low = self.e_high = None
+
+    def fit_chosen(self):
+        """
+        Fits the chosen points (the fitter line and the linear fit of the points chosen from it), sets E of each curve
+        """
+        size = self.size
 
         # Finding blind coefficient for fitting function
-        cof_blind = blind_fit(mean_points_chosen)
-        a_blind, b_blind = cof_blind[0], cof_blind[1]
-        fitted_blind = [linear_function(x, -a_blind, b_blind) for x in mean_points_chosen['1/kT']]
-
-        data_frame_fitted_blind = pd.DataFrame(
-            {'1/kT': mean_points_chosen['1/kT'], 'ln(I)': mean_points_chosen['ln(I)'], 'fitted_blind': fitted_blind})
-        data_frame_fitted_blind = data_frame_fitted_blind[data_frame_fitted_blind['fitted_blind'] > 0].copy()
-        data_frame_fitted_blind['perc'] = data_frame_fitted_blind['fitted_blind'] / data_frame_fitted_blind[
-            'ln(I)'] * 100
-        data_frame_chosen_from_blind = data_frame_fitted_blind[data_frame_fitted_blind['perc'] >= 90].copy()
-
-        if len(data_frame_chosen_from_blind) > 2:
-            r2_chosen, a_chosen, b_chosen, uncertain_a = linear_fit_r2(data_frame_chosen_from_blind)
-
-            a_mean = (a_chosen + (-a_blind)) / 2
-            b_mean = (b_chosen + b_blind) / 2
-            fitted_mean = [linear_function(x, a_mean, b_mean) for x in data_frame_chosen_from_blind['1/kT']]
-            x_line = data_frame_chosen_from_blind
-
-        else:
-            r2_chosen, a_chosen, b_chosen, uncertain_a = linear_fit_r2(data_frame_fitted_blind)
-            a_mean = (a_chosen + (-a_blind)) / 2
-            b_mean = (b_chosen + b_blind) / 2
-            fitted_mean = [linear_function(x, a_mean, b_mean) for x in data_frame_fitted_blind['1/kT']]
-            x_line = data_frame_fitted_blind
-
-        self.a_uncertain = uncertain_a
-        self.e = - a_mean
-        self.x_line = x_line
-        self.y_line = fitted_mean
+        self.a_blind, self.b_blind, fit_points = FITTERS[self.fitter](self.chosen_kT, self.chosen_ln,
+                                                                      self.chosen_offsets, self.residual_limit)
+
+        a_blind = self.a_blind[self.chosen_group]
+        b_blind = self.b_blind[self.chosen_group]
+        self.fitted_blind = (-a_blind) * self.chosen_kT + b_blind
+        with np.errstate(divide='ignore', invalid='ignore'):
+            positive = self.fitted_blind > 0
+            self.perc = self.fitted_blind / self.chosen_ln * 100
+            chosen_from_blind = positive & (self.perc >= self.fit_percent)
+
+        # Points chosen from blind fit, all points over 0 if there are not more than 2 (or points given by the fitter)
+        enough = np.bincount(self.chosen_group[chosen_from_blind], minlength=size) > 2
+        self.line_points = np.where(enough[self.chosen_group], chosen_from_blind, positive)
+        if fit_points is not None:
+            self.line_points = fit_points
+        line = np.flatnonzero(self.line_points)
+        self.r2, a_chosen, b_chosen, self.a_uncertain = linear_fit_r2(self.chosen_kT[line], self.chosen_ln[line],
+                                                                      self.chosen_group[line], size)
+
+        self.a_chosen = a_chosen
+        if fit_points is None:
+            self.a_mean = (a_chosen + (-self.a_blind)) / 2
+            self.b_mean = (b_chosen + self.b_blind) / 2
+        else:  # The fitter line is already the linear fit of its points (E = -slope)
+            self.a_mean = a_chosen
+            self.b_mean = b_chosen
+        self.e = - self.a_mean
+
+    def resample(self, method='bootstrap', resamples=2000, confidence=CONFIDENCE_LEVEL, seed=0):
+        """
+        Uncertainty of E from resampled points chosen below the rise threshold (see resample_indexes). The fitter line
+        (e.g., the blind fit), the fit points chosen from it and the linear fit are repeated for each resample (see
+        resampled_energies), so it is the uncertainty of both the fit and the selection of the fit points (the rise
+        threshold is not repeated). The confidence interval is made of percentiles of resampled E (bootstrap) or
+        E +/- z * u (jackknife). Spectra with less than RESAMPLE_MIN_POINTS fit points get NaN. Adds u_resampled,
+        e_low and e_high arrays and table columns.
+
+        :param method: 'bootstrap' or 'jackknife'
+        :param resamples: Number of bootstrap resamples of each spectrum
+        :param confidence: Confidence level of the interval
+        :param seed: Seed of the random numbers generator (the same results for the same data)
+        """
+        if method not in UNCERTAINTY_METHODS[1:]:
+            raise ValueError(f'Unknown resampling method: {method}')
+        random = np.random.default_rng(seed)
+        self.u_resampled = np.full(self.size, np.nan)
+        self.e_low = np.full(self.size, np.nan)
+        self.e_high = np.full(self.size, np.nan)
+
+        fit_points = np.bincount(self.chosen_group[self.line_points], minlength=self.size)
+        for index in np.flatnonzero(~np.isnan(self.e) & (fit_points >= RESAMPLE_MIN_POINTS)):
+            chosen = np.arange(self.chosen_offsets[index], self.chosen_offsets[index + 1])
+            energies = self.resampled_energies(chosen[resample_indexes(len(chosen), method, resamples, random)])
+            energies = energies[~np.isnan(energies)]
+            if len(energies) < 2:
+                continue
+            if method == 'jackknife':
+                self.u_resampled[index] = np.sqrt((len(energies) - 1) / len(energies) *
+                                                  np.sum((energies - energies.mean()) ** 2))
+                z = NormalDist().inv_cdf((1 + confidence) / 2)
+                self.e_low[index] = self.e[index] - z * self.u_resampled[index]
+                self.e_high[index] = self.e[index] + z * self.u_resampled[index]
+            else:
+                self.u_resampled[index] = np.std(energies, ddof=1)
+                self.e_low[index], self.e_high[index] = np.percentile(energies, [(1 - confidence) / 2 * 100,
+                                                                                 (1 + confidence) / 2 * 100])
+
+        self.table[f'u(E) {method} [eV]'] = self.u_resampled
+        self.table[f'E low ({confidence:.0%}) [eV]'] = self.e_low
+        self.table[f'E high ({confidence:.0%}) [eV]'] = self.e_high
+
+    def resampled_energies(self, indexes):
+        """
+        :param indexes: (resamples, points) array with indexes of chosen points in each resample
+        :return: Array with E of each resample fitted like in fit() (all resamples are curves of one batch), NaN if
+        the linear fit has less than 3 different points
+        """
+        resampled = copy.copy(self)
+        resampled.size, width = indexes.shape
+        resampled.chosen_group = np.repeat(np.arange(resampled.size), width)
+        resampled.chosen_kT = self.chosen_kT[indexes.ravel()]
+        resampled.chosen_ln = self.chosen_ln[indexes.ravel()]
+        resampled.chosen_offsets = np.arange(resampled.size + 1) * width
+        resampled.fit_chosen()
+
+        # One point taken many times gives a rounding error instead of 0 / 0
+        line = np.flatnonzero(resampled.line_points)
+        point = indexes.ravel()[line]
+        group = resampled.chosen_group[line]
+        different = np.ones(len(line), dtype=bool)
+        different[1:] = (point[1:] != point[:-1]) | (group[1:] != group[:-1])
+        return np.where(np.bincount(group[different], minlength=resampled.size) > 2, resampled.e, np.nan)
+
+    def with_parameters(self, rise_threshold=None, residual_limit=None, fit_percent=None, fitter=None):
+        """
+        :return: InitialRiseBatch of the same spectra and T_max with other IRM parameters (None -> the same value), the
+        data and medians are shared with this batch
+        """
+        batch = copy.copy(self)
+        batch.fit(self.rise_threshold if rise_threshold is None else rise_threshold,
+                  self.residual_limit if residual_limit is None else residual_limit,
+                  self.fit_percent if fit_percent is None else fit_percent,
+                  self.fitter if fitter is None else fitter)
+        return batch
+
+    def create_table(self, chosen_lengths):
+        """
+        :return: DataFrame with E, u(E) and selected points of each spectrum
+        """
+        line_group = self.chosen_group[self.line_points]
+        line_round = self.chosen_round[self.line_points]
+        errors = np.full(self.size, None, dtype=object)
+        errors[np.isnan(self.e)] = 'Not enough points for the linear fit'
+        errors[np.isnan(self.a_blind)] = f'No {self.fitter} fit line'
+        errors[chosen_lengths < 2] = 'Not enough points below the rise threshold'
+
+        return pd.DataFrame({
+            'T_stop': self.t_stop_names,
+            'T_max [°C]': self.t_maxes,
+            'E [eV]': self.e,
+            'u(E) [eV]': self.a_uncertain,
+            'r2': self.r2,
+            'raw points': np.diff(self.raw_offsets),
+            'median points': np.diff(self.median_offsets),
+            'chosen points': chosen_lengths,
+            'fit points': np.bincount(line_group, minlength=self.size),
+            'fit from [°C]': group_reduce(np.fmin, line_round, line_group, self.size, np.nan),
+            'fit to [°C]': group_reduce(np.fmax, line_round, line_group, self.size, np.nan),
+            'error': errors,
+        })
+
+    def error(self, index):
+        """
+        :return: Reason why IRM failed for the spectrum, None if E was found
+        """
+        return self.table['error'].iloc[index]
+
+
+class InitialRise:
+    """
+    The Initial Rise Method implemented in Python. This Class is made to find a depth of the
+    traps in persistent luminescence materials.
+
+    The calculation is done by InitialRiseBatch (one spectrum is a batch of one), the object holds the data of one
+    spectrum used by charts and IRM results.
+    """
+
+    def __init__(self, data, t_max, rise_threshold=0.15, residual_limit=0.1, fit_percent=90, uncertainty='covariance',
+                 resamples=2000, fitter='blind'):
+        """
+        :param uncertainty: One of UNCERTAINTY_METHODS, bootstrap and jackknife also give u_resampled and e_interval
+        :param resamples: Number of bootstrap resamples
+        :param fitter: Name of the fitter in FITTERS ('blind' - the original blind fit)
+        """
+        batch = InitialRiseBatch([data], [t_max], rise_threshold, residual_limit=residual_limit,
+                                 fit_percent=fit_percent, fitter=fitter)
+        if uncertainty != 'covariance':
+            batch.resample(uncertainty, resamples)
+        self.load(batch, 0)
+
+    @classmethod
+    def from_batch(cls, batch, index):
+        """
+        :param batch: InitialRiseBatch
+        :param index: Number of the spectrum in the batch
+        :return: InitialRise of the spectrum
+        """
+        initial_rise = cls.__new__(cls)
+        initial_rise.load(batch, index)
+        return initial_rise
+
+    def load(self, batch, index):
+        """
+        Takes results of one spectrum from the batch
+        """
+        if batch.error(index) is not None:
+            raise ValueError(f'Initial Rise Method failed for {batch.t_stop_names[index]}: {batch.error(index)}')
+        self.k = K_BOLTZMANN
+
+        raw = slice(batch.raw_offsets[index], batch.raw_offsets[index + 1])
+        self.raw_data = pd.DataFrame({'Temp': batch.raw_temperature[raw], 'Int': batch.raw_intensity[raw],
+                                      '1/kT': batch.raw_kT[raw], 'ln(I)': batch.raw_ln[raw],
+                                      'round_temp': batch.raw_round[raw]}, index=batch.raw_labels[raw])
+
+        median = slice(batch.median_offsets[index], batch.median_offsets[index + 1])
+        self.data_median = pd.DataFrame({'round_temp': batch.median_round[median],
+                                         'Int': batch.median_intensity[median], '1/kT': batch.median_kT[median],
+                                         'ln(I)': batch.median_ln[median]})
+
+        chosen = slice(batch.chosen_offsets[index], batch.chosen_offsets[index + 1])
+        self.mean_points_chosen = pd.DataFrame({'round_temp': batch.chosen_round[chosen],
+                                                'Int': batch.chosen_intensity[chosen], '1/kT': batch.chosen_kT[chosen],
+                                                'ln(I)': batch.chosen_ln[chosen]})
+
+        line = np.flatnonzero(batch.line_points[chosen])
+        self.x_line = pd.DataFrame({'1/kT': batch.chosen_kT[chosen][line], 'ln(I)': batch.chosen_ln[chosen][line],
+                                    'fitted_blind': batch.fitted_blind[chosen][line],
+                                    'perc': batch.perc[chosen][line]}, index=line)
+        self.y_line = list(batch.a_mean[index] * self.x_line['1/kT'].to_numpy() + batch.b_mean[index])
+
+        self.a_uncertain = batch.a_uncertain[index]
+        self.e = batch.e[index]
+
+        # Resampled u(E) and the confidence interval of E (None if not calculated, see InitialRiseBatch.resample)
+        self.u_resampled = None if batch.u_resampled is None else batch.u_resampled[index]
+        self.e_interval = None if batch.u_resampled is None else (batch.e_low[index], batch.e_high[index])
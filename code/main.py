@@ -4,6 +4,105 @@ from file_organization import *
 from plot_charts import *
 from initial_rise_method import *
 from pdf_file import *
+from pipeline import *
+from analysis_worker import *
+
+
+class TaskProgress:
+    """
+    Progress of the task running in AnalysisWorker, shown below the other widgets of the window: stage, progress bar
+    of T_stops (or charts), ETA, results of analysed T_stops and Cancel button. The worker queue is read in the Tk
+    thread every POLL_INTERVAL ms, so the window stays responsive during the whole run.
+    """
+    POLL_INTERVAL = 100  # [ms]
+    STAGE_NAMES = {'extraction': 'Extracting INTiBS files', 'reading': 'Reading Data_set file',
+                   'analysis': 'Analysed T_stops', 'charts': 'Charts', 'report': 'Creating Report.pdf'}
+
+    def __init__(self, window, row, worker):
+        """
+        :param window: Window of the task (CTk)
+        :param row: The first free grid row of the window
+        :param worker: AnalysisWorker (not started)
+        """
+        self.window = window
+        self.worker = worker
+        self.indeterminate = True
+
+        self.status_label = customtkinter.CTkLabel(master=window, text='Starting...')
+        self.eta_label = customtkinter.CTkLabel(master=window, text='')
+        self.progress_bar = customtkinter.CTkProgressBar(master=window, mode='indeterminate')
+        self.results_box = customtkinter.CTkTextbox(master=window, height=150, width=380)
+        self.cancel_button = customtkinter.CTkButton(master=window, text='Cancel', command=self.cancel)
+
+        self.status_label.grid(row=row, column=0, padx=(5, 0), pady=(10, 0), sticky=customtkinter.W)
+        self.eta_label.grid(row=row, column=1, padx=(0, 5), pady=(10, 0), sticky=customtkinter.E)
+        self.progress_bar.grid(row=row + 1, column=0, columnspan=2, padx=5, pady=(5, 5), sticky=customtkinter.EW)
+        self.results_box.grid(row=row + 2, column=0, columnspan=2, padx=5, pady=(5, 5))
+        self.cancel_button.grid(row=row + 3, column=0, padx=(5, 0), pady=(5, 10))
+        window.geometry('')  # Window grows to fit the new widgets
+
+        self.progress_bar.start()
+        worker.start()
+        window.after(self.POLL_INTERVAL, self.poll)
+
+    def poll(self):
+        for event in self.worker.take_events():
+            if event[0] == 'progress':
+                self.show_progress(*event[1:])
+            elif event[0] == 'result':
+                self.show_result(event[1])
+            else:
+                self.finish(*event)
+                return
+        self.window.after(self.POLL_INTERVAL, self.poll)
+
+    def show_progress(self, stage, done, total, eta):
+        counted = stage in ('analysis', 'charts') and total > 0
+        if counted and self.indeterminate:
+            self.progress_bar.stop()
+            self.progress_bar.configure(mode='determinate')
+        elif not counted and not self.indeterminate:
+            self.progress_bar.configure(mode='indeterminate')
+            self.progress_bar.start()
+        self.indeterminate = not counted
+
+        name = self.STAGE_NAMES.get(stage, stage)
+        if counted:
+            self.progress_bar.set(done / total)
+            self.status_label.configure(text=f'{name}: {done}/{total}')
+        else:
+            self.status_label.configure(text=f'{name}...')
+        self.eta_label.configure(text=f'ETA: {eta:.0f} s' if eta is not None and counted else '')
+
+    def show_result(self, result):
+        self.results_box.insert('end', f'{result.t_stop}: T_max = {result.t_max:.2f} [°C], E = {result.energy:.3f} '
+                                       f'+/- {result.uncertain_energy:.3f} [eV]\n')
+        self.results_box.see('end')
+
+    def finish(self, kind, value):
+        """
+        :param kind: 'finished', 'cancelled' or 'failed'
+        :param value: Value returned by the task or the exception
+        """
+        if self.indeterminate:
+            self.progress_bar.stop()
+            self.progress_bar.configure(mode='determinate')
+        self.progress_bar.set(1 if kind == 'finished' else 0)
+        messages = {'finished': 'Done', 'cancelled': 'Cancelled', 'failed': f'Failed: {value}'}
+        self.status_label.configure(text=messages[kind])
+        self.eta_label.configure(text='')
+        self.cancel_button.configure(text='Close', state='normal')
+
+    def cancel(self):
+        """
+        Cancel button: stops the task after the current group of spectra, closes the window when the task has ended
+        """
+        if self.worker.is_alive():
+            self.worker.cancel()
+            self.status_label.configure(text='Cancelling after the current step...')
+            self.cancel_button.configure(state='disabled')
+        else:
+            self.window.destroy()
 
 
 class DesktopApp:
@@ -28,37 +127,49 @@ class DesktopApp:
 
             folder_app = customtkinter.CTk()
             folder_app.title('INTiBS Data Extraction')
-            folder_app.geometry("400x200")
+            folder_app.geometry("400x240")
 
             def start():
                 """
                 This button starts data preprocessing (grouping by temperature, saving each measurement into new folder
                 and extracting most important data from measurement files). In the end it creates one Excel file
-                containing all measurement data called -Data_set.xlsx
+                containing all measurement data called -Data_set.xlsx. When the heating rate is entered, the
+                extracted data is analysed right away (like the 'Analysis' button). The work runs in the background
+                (see TaskProgress), the window is closed by the Close button. Spectra analysed before are taken from
+                the result cache only when 'Use result cache' is checked.
                 """
                 first_pmt = entry_pmt.get()
                 first_heat = entry_heater.get()
-                new_data = DividingRawDataToFolders(folder_path)
-                new_data.divide_data_TO_folders_sequence_position(first_pmt, first_heat)
-                new_data.create_one_excel_file()
-
-                folder_app.destroy()
+                heat_rate = entry_heat_rate.get()
+                if heat_rate:
+                    worker = AnalysisWorker(extract_and_analyse, folder_path, first_pmt, first_heat, float(heat_rate),
+                                            cache=ResultCache() if folder_cache.get() else None)
+                else:
+                    worker = AnalysisWorker(extract_intibs_folder, folder_path, first_pmt, first_heat)
+                start_button.configure(state='disabled')
+                TaskProgress(folder_app, 4, worker)
 
             label_pmt = customtkinter.CTkLabel(master=folder_app, text='First PMT_measured file number: ')
             label_heat = customtkinter.CTkLabel(master=folder_app, text='First Heat_measured file number: ')
+            label_heat_rate = customtkinter.CTkLabel(master=folder_app, text='Heating rate (optional): ')
 
             entry_pmt = customtkinter.CTkEntry(master=folder_app, placeholder_text='0', width=40)
             entry_heater = customtkinter.CTkEntry(master=folder_app, placeholder_text='0', width=40)
+            entry_heat_rate = customtkinter.CTkEntry(master=folder_app, width=40)
 
             start_button = customtkinter.CTkButton(master=folder_app, text='Start', command=start)
+            folder_cache = customtkinter.CTkCheckBox(master=folder_app, text='Use result cache')
 
             label_pmt.grid(row=0, column=0, padx=(5, 0), pady=(20, 10))
             label_heat.grid(row=1, column=0, padx=(5, 0), pady=(0, 10))
+            label_heat_rate.grid(row=2, column=0, padx=(5, 0), pady=(0, 10))
 
             entry_pmt.grid(row=0, column=1, padx=(5, 0), pady=(20, 10))
             entry_heater.grid(row=1, column=1, padx=(0, 0), pady=(0, 10))
+            entry_heat_rate.grid(row=2, column=1, padx=(0, 0), pady=(0, 10))
 
             start_button.grid(row=3, column=0, padx=(5, 0), pady=(25, 10))
+            folder_cache.grid(row=3, column=1, padx=(5, 0), pady=(25, 10))
 
             folder_app.mainloop()
 
@@ -76,81 +187,27 @@ class DesktopApp:
             """
 
             excel_file_path = customtkinter.filedialog.askopenfile(title='Select excel file to analysis',
-                                                                   filetypes=[("Excel files", ".xlsx .xls")]).name
+                                                                   filetypes=[("Excel files", ".xlsx .xls"),
+                                                                              ("Data_set binary files", ".npz")]).name
             analysis_app = customtkinter.CTk()
             analysis_app.title('Analysis program')
             analysis_app.geometry("300x200")
 
             def start():
-                fine_format_file = CreatingFormatToAnalysis(excel_file_path)
                 heat_rate = float(entry_heat_rate.get())
-
-                # Creating a new chart folder and IRM results folder
-                chart_folder = FolderCreator(excel_file_path)
-                chart_folder.create_chart_folder('Charts')
-                irm_folder = FolderCreator(excel_file_path)
-                irm_folder.create_chart_folder('IRM_results')
-
-                # Finding T_max, T_stop and saving information to folder
-                t_max_all = []
-                i_max_all = []
-                energy_all = []
-                uncertain_energy = []
-                t_stop_all = fine_format_file.t_stop_data  # Like: 'T_stop 30' or '30'
-                t_stop_iter = 0
-                for data_frame in fine_format_file.final_data_frames:
-                    analysis = PlotAnalysis(data_frame)
-                    analysis.mean_of_intensity_points()
-                    t_max, i_max = analysis.peak_finder()  # Finding T_max
-                    t_max_all.append(t_max)
-                    i_max_all.append(i_max)
-                    data_plot = PlotChart(chart_folder.to_save_path)  # Create and save t_max plot
-                    data_plot.t_max_stop(data_frame, t_max, t_stop_all[t_stop_iter],
-                                         fine_format_file.institute_apparatus)
-
-                    # Initial Rise Method
-                    initial_rise_method = InitialRise(analysis.data_frame, t_max)
-                    data_plot.initial_rise(t_stop_all[t_stop_iter], initial_rise_method.raw_data,
-                                           initial_rise_method.data_median, initial_rise_method.mean_points_chosen,
-                                           initial_rise_method.x_line, initial_rise_method.y_line)
-
-                    IRMExcelResults(initial_rise_method.raw_data, irm_folder.to_save_path,
-                                    PlotChart('None').title_correction(t_stop_all[t_stop_iter]))
-
-                    energy_all.append(initial_rise_method.e)
-                    uncertain_energy.append(initial_rise_method.a_uncertain)
-                    t_stop_iter += 1
-
-                # Data
-                t_stop_values_all = TStopInterpreter(t_stop_all).temperatures
-                summary_data_frame = pd.DataFrame({
-                    'T_stop [\u00b0C]': t_stop_all,
-                    'T_stop (value)': t_stop_values_all,
-                    'T_max [\u00b0C]': t_max_all,
-                    'Energy [ev]': energy_all,
-                    'u(E) [eV]': uncertain_energy
-                })
-                k_const = 8.617333262145E-5
-                summary_data_frame['s'] = (heat_rate * summary_data_frame['Energy [ev]'] / (
-                            k_const * (summary_data_frame['T_max [\u00b0C]'] + 273.15) ** 2)) / np.exp(
-                    -summary_data_frame['Energy [ev]'] / (k_const * (summary_data_frame['T_max [\u00b0C]']+273.15)))
-
-                summary_data_frame['u(E)/E [%]'] = summary_data_frame['u(E) [eV]']/summary_data_frame['Energy [ev]']*100
-
-                path_to_save_excel = chart_folder.folder_name + '/summary_data_frame.xlsx'
-                summary_data_frame.to_excel(path_to_save_excel)
-
-                PlotChart(chart_folder.to_save_path).t_max_stop_energy(t_stop_values_all, t_max_all, energy_all)
-
-                CreatePDFSummaryFile(path_to_save_excel, chart_folder.to_save_path, chart_folder.folder_name)
-
-                analysis_app.destroy()
+                cache = ResultCache() if analysis_cache.get() else None
+                worker = AnalysisWorker(lambda **options: AnalysisPipeline(excel_file_path, heat_rate, cache=cache,
+                                                                           **options).run())
+                start_button.configure(state='disabled')
+                TaskProgress(analysis_app, 2, worker)
 
             entry_heat_rate_label = customtkinter.CTkLabel(master=analysis_app, text='Enter heating rate: ')
             entry_heat_rate = customtkinter.CTkEntry(master=analysis_app, placeholder_text='0', width=40)
             start_button = customtkinter.CTkButton(master=analysis_app, text='Start', command=start)
+            analysis_cache = customtkinter.CTkCheckBox(master=analysis_app, text='Use result cache')
 
             start_button.grid(row=1, column=0, padx=(5, 0), pady=(25, 10))
+            analysis_cache.grid(row=1, column=1, padx=(5, 0), pady=(25, 10))
             entry_heat_rate.grid(row=0, column=1, padx=(0, 0), pady=(10, 10))
             entry_heat_rate_label.grid(row=0, column=0, padx=(5, 0), pady=(15, 10), sticky=customtkinter.NS)
 
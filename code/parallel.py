@@ -0,0 +1,89 @@
+import os
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from profiling import profiler
+
+
+def number_of_workers(workers):
+    """
+    Converts the workers parameter to the number of processes
+    :param workers: Number of processes, 0 or None means all CPU cores
+    :return: Number of processes (at least 1)
+    """
+    if not workers:
+        return os.cpu_count() or 1
+    return max(int(workers), 1)
+
+
+def call_with_profile(function, *args):
+    """
+    Calls function in a worker process and returns its result with profiler events recorded during the call
+    """
+    start = len(profiler.events)
+    result = function(*args)
+    return result, profiler.take_events(start)
+
+
+def iterate_tasks(function, tasks, workers=1):
+    """
+    Calls function(*task) for each task like run_tasks, but every result is yielded as soon as it is calculated (still
+    in the order of the tasks). When the iteration is stopped early (e.g., the analysis was cancelled), tasks that did
+    not start in the process pool are cancelled.
+
+    :param function: Module-level function (it has to be picklable)
+    :param tasks: List of tuples with function arguments
+    :param workers: Number of processes, 1 -> serial, 0 or None -> all CPU cores
+    :return: Generator of results in task order
+    """
+    tasks = list(tasks)
+    workers = min(number_of_workers(workers), len(tasks))
+    done = 0
+
+    if workers > 1:
+        profiled = profiler.enabled
+        try:
+            # Starting the pool (processes are started when the tasks are submitted)
+            executor = ProcessPoolExecutor(max_workers=workers)
+            try:
+                if profiled:
+                    results = executor.map(call_with_profile, repeat(function), *zip(*tasks))
+                else:
+                    results = executor.map(function, *zip(*tasks))
+            except BaseException:
+                executor.shutdown(cancel_futures=True)
+                raise
+        except (OSError, NotImplementedError, BrokenProcessPool):
+            executor = None  # No process pool in this environment -> the tasks are calculated in this process
+
+        if executor is not None:
+            try:
+                # Exceptions raised by the tasks are raised here, only a broken pool falls back to this process
+                for result in results:
+                    if profiled:
+                        result, events = result
+                        profiler.events.extend(events)
+                    done += 1
+                    yield result
+            except BrokenProcessPool:
+                pass  # A worker process died -> the rest is calculated in this process
+            finally:
+                executor.shutdown(cancel_futures=True)
+
+    for task in tasks[done:]:
+        yield function(*task)
+
+
+def run_tasks(function, tasks, workers=1):
+    """
+    Calls function(*task) for each task. If more than one worker is given, the tasks are spread over a process pool.
+    The results are always returned in the order of the tasks. When the process pool cannot be started (or a worker
+    process dies) the tasks are calculated one by one in this process. Exceptions raised by the tasks are raised again
+    (the remaining tasks are cancelled). Profiler events of the worker processes are added to this process profiler.
+
+    :param function: Module-level function (it has to be picklable)
+    :param tasks: List of tuples with function arguments
+    :param workers: Number of processes, 1 -> serial, 0 or None -> all CPU cores
+    :return: List of results in task order
+    """
+    return list(iterate_tasks(function, tasks, workers))
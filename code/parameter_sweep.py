@@ -0,0 +1,161 @@
+import os
+import itertools
+import numpy as np
+import pandas as pd
+from graph_analysis import CreatingFormatToAnalysis, PlotAnalysis, mean_of_intensity_points, find_t_max, \
+    fitting_interval, fit_t_max
+from initial_rise_method import InitialRiseBatch
+from parallel import run_tasks, number_of_workers
+from pipeline import ANALYSIS_PARAMETERS
+from profiling import profiler
+
+
+# Parameters of each step of the analysis. Results of a step are calculated once and shared by all values of the
+# parameters of the next steps (binning -> T_max -> IRM medians -> IRM fits)
+BINNING_PARAMETERS = ('bin_step', 'bin_width', 'smoothing', 'window_statistic')
+PEAK_PARAMETERS = ('dp', 'dn', 'cut_bins')
+IRM_PARAMETERS = ('rise_threshold', 'residual_limit', 'fit_percent', 'fitter')
+SWEEP_FILE_NAME = 'parameter_sweep'  # Saved next to the Data_set file (.xlsx or .csv)
+
+
+def parameter_grid(values):
+    """
+    :param values: Dictionary parameter name -> list of values, missing parameters have the value of
+    ANALYSIS_PARAMETERS
+    :return: List of parameter dictionaries (all combinations, the IRM parameters change the fastest), combinations
+    with overlapping temperature windows (bin_width > bin_step) are skipped
+    """
+    unknown = set(values) - set(ANALYSIS_PARAMETERS)
+    if unknown:
+        raise ValueError(f'Unknown analysis parameters: {", ".join(sorted(unknown))}')
+    names = BINNING_PARAMETERS + PEAK_PARAMETERS + IRM_PARAMETERS
+    grid = [values.get(name) or [ANALYSIS_PARAMETERS[name]] for name in names]
+    combinations = [dict(zip(names, combination)) for combination in itertools.product(*grid)]
+    return [parameters for parameters in combinations if parameters['bin_width'] <= parameters['bin_step']]
+
+
+def find_peaks(analyses, dp, dn, cut_bins):
+    """
+    peak_finder of several spectra, a spectrum without T_max does not stop the others
+
+    :param analyses: List of PlotAnalysis after mean_of_intensity_points
+    :return: Lists of T_max, Int_max and errors (None if T_max was found), AlgoCodes are set in analyses
+    """
+    predicted, errors = [], []
+    for analysis in analyses:
+        temperature = analysis.data_frame['Temp'].to_numpy(dtype=float)
+        try:
+            t_max, analysis.alg_code = find_t_max(analysis.mean_df['Temp'].to_numpy(),
+                                                  analysis.mean_df['Int'].to_numpy(),
+                                                  analysis.fitted_df['Int'].to_numpy(), dp, dn, cut_bins)
+            if not fitting_interval(temperature, t_max, analysis.alg_code).any():
+                raise TypeError('There are no points to fit around T_max')
+            error = None
+        except (ValueError, TypeError) as exception:
+            t_max, error = np.nan, f'peak_finder: {exception}'
+        predicted.append(t_max)
+        errors.append(error)
+
+    found = [index for index, error in enumerate(errors) if error is None]
+    t_maxes = np.full(len(analyses), np.nan)
+    i_maxes = np.full(len(analyses), np.nan)
+    if found:
+        peaks = fit_t_max([analyses[index].data_frame['Temp'].to_numpy(dtype=float) for index in found],
+                          [analyses[index].data_frame['Int'].to_numpy(dtype=float) for index in found],
+                          [predicted[index] for index in found], [analyses[index].alg_code for index in found])
+        t_maxes[found] = [t_max for t_max, _ in peaks]
+        i_maxes[found] = [i_max for _, i_max in peaks]
+    return t_maxes, i_maxes, errors
+
+
+def sweep_spectrum_group(data_frames, t_stop_data, combinations):
+    """
+    Analysis of several spectra with each parameter combination. The mean points and over fitted curves are calculated
+    once for each binning, T_max once for each binning and peak_finder parameters and the IRM medians once for each
+    T_max vector. The IRM parameters only repeat the fits (see InitialRiseBatch.with_parameters).
+
+    :param data_frames: List of DataFrames with 'Temp' and 'Int' columns sorted by temperature
+    :param t_stop_data: List of T_stop names
+    :param combinations: List of parameter dictionaries (see parameter_grid)
+    :return: DataFrame with one row for each combination and spectrum
+    """
+    rows = sum(len(data_frame) for data_frame in data_frames)
+    binned = {}  # Binning parameters -> analyses
+    peaks = {}  # Binning and peak_finder parameters -> T_max, Int_max, errors, AlgoCodes
+    initial_rise_batches = {}  # T_max of each spectrum -> InitialRiseBatch
+
+    tables = []
+    for number, parameters in enumerate(combinations):
+        binning = tuple(parameters[name] for name in BINNING_PARAMETERS)
+        if binning not in binned:
+            with profiler.stage('mean_of_intensity_points', rows=rows, spectra=len(data_frames)):
+                binned[binning] = [PlotAnalysis(data_frame) for data_frame in data_frames]
+                mean_of_intensity_points(binned[binning], *binning)
+
+        peak_key = binning + tuple(parameters[name] for name in PEAK_PARAMETERS)
+        if peak_key not in peaks:
+            with profiler.stage('peak_finder', rows=rows, spectra=len(data_frames)):
+                t_maxes, i_maxes, errors = find_peaks(binned[binning], *peak_key[len(binning):])
+            peaks[peak_key] = (t_maxes, i_maxes, errors, [analysis.alg_code for analysis in binned[binning]])
+        t_maxes, i_maxes, errors, codes = peaks[peak_key]
+
+        found = np.flatnonzero(~np.isnan(t_maxes))
+        irm_parameters = {name: parameters[name] for name in IRM_PARAMETERS}
+        irm_key = tuple(found) + tuple(t_maxes[found])
+        with profiler.stage('InitialRise', rows=rows, spectra=len(found)):
+            if irm_key in initial_rise_batches:
+                batch = initial_rise_batches[irm_key].with_parameters(**irm_parameters)
+            else:
+                batch = InitialRiseBatch([data_frames[index] for index in found], t_maxes[found],
+                                         t_stop_names=[t_stop_data[index] for index in found], **irm_parameters)
+                initial_rise_batches[irm_key] = batch
+
+        table = pd.DataFrame({'combination': number, **parameters, 'T_stop': t_stop_data, 'T_max [°C]': t_maxes,
+                              'I_max': i_maxes, 'algorithm code': [code if error is None else None
+                                                                   for code, error in zip(codes, errors)]})
+        irm_table = batch.table.drop(columns=['T_stop', 'T_max [°C]']).set_index(found)
+        table = table.join(irm_table)
+        table['error'] = [peak_error or irm_error for peak_error, irm_error in zip(errors, table['error'])]
+        tables.append(table)
+
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+
+
+def run_parameter_sweep(data_set_path, values, workers=1):
+    """
+    Analysis of one Data_set file with all combinations of the given parameter values. The spectra are split into one
+    group for each worker, each group is analysed with all combinations (the intermediates of a spectrum are calculated
+    in one process only).
+
+    :param data_set_path: Data_set file (.xlsx or .npz)
+    :param values: Dictionary parameter name -> list of values (see parameter_grid)
+    :param workers: Number of processes
+    :return: DataFrame with one row for each combination and T_stop
+    """
+    with profiler.stage('CreatingFormatToAnalysis'):
+        fine_format_file = CreatingFormatToAnalysis(data_set_path)
+    data_frames = fine_format_file.final_data_frames
+    combinations = parameter_grid(values)
+    if not data_frames:
+        return pd.DataFrame()
+
+    groups = np.array_split(np.arange(len(data_frames)), min(number_of_workers(workers), len(data_frames)))
+    tasks = [([data_frames[index] for index in group], [fine_format_file.t_stop_data[index] for index in group],
+              combinations) for group in groups]
+    table = pd.concat(run_tasks(sweep_spectrum_group, tasks, workers), ignore_index=True)
+    return table.sort_values(by='combination', kind='stable', ignore_index=True)
+
+
+def save_sweep_table(table, data_set_path, output_format='xlsx'):
+    """
+    :param table: DataFrame from run_parameter_sweep
+    :param data_set_path: Data_set file, the table is saved in the same folder
+    :param output_format: 'xlsx' or 'csv'
+    :return: Path to saved file
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(data_set_path)), f'{SWEEP_FILE_NAME}.{output_format}')
+    if output_format == 'csv':
+        table.to_csv(path, index=False)
+    else:
+        table.to_excel(path, index=False)
+    return path
@@ -1,4 +1,7 @@
+import os
+import tempfile
 import numpy as np
+from PIL import Image
 from fpdf import FPDF
 import datetime as dt
 import plot_charts as pch
@@ -9,7 +12,12 @@ class CreatePDFSummaryFile:
     """
     This class creates report file with summary table and also shows the most important graphs
     """
-    def __init__(self, summary_data, path_to_charts, path_to_save_report):
+    def __init__(self, summary_data, path_to_charts, path_to_save_report, image_format='png'):
+        with tempfile.TemporaryDirectory() as temporary_folder:
+            self.temporary_folder = temporary_folder  # RGB copies of PNG charts
+            self.create_report(summary_data, path_to_charts, path_to_save_report, image_format)
+
+    def create_report(self, summary_data, path_to_charts, path_to_save_report, image_format):
         self.summary_data = pd.read_excel(summary_data)
         t_stop_data = list(self.summary_data['T_stop [°C]'])
         self.summary_data.drop(['Unnamed: 0', 'T_stop [°C]'], axis=1, inplace=True)
@@ -39,7 +47,7 @@ class CreatePDFSummaryFile:
         pdf.ln(20)
 
         # Summary_graph
-        pdf.image(str(self.path_to_charts) + '/TmaxTstopEnergy.png', w=200, h=120)
+        self.image(pdf, str(self.path_to_charts) + '/TmaxTstopEnergy.' + image_format)
 
         # Create table name
         pdf.ln(5)
@@ -48,12 +56,12 @@ class CreatePDFSummaryFile:
         pdf.cell(0, 0, 'Summary table', align='B', ln=1)
         pdf.ln(5)
 
-        # Create column names
-        pdf.set_font('times', '', 11)
-        n_iter = 1
+        # Create column names (180 mm of the page is divided between columns, at most 30 mm each)
+        cell_width = min(30, 180 / len(self.summary_data.columns))
+        pdf.set_font('times', '', 11 if cell_width == 30 else 8)
         pdf.cell(10, 10, '')
         for col_name in self.summary_data.columns:
-            pdf.cell(30 * n_iter, 10, txt=col_name, border=1, align='C')
+            pdf.cell(cell_width, 10, txt=col_name, border=1, align='C')
         pdf.ln()
 
         # Adding rows and fill the table
@@ -61,7 +69,7 @@ class CreatePDFSummaryFile:
             pdf.cell(10, 10, '')
             row_data = list(self.summary_data.loc[row_number])
             for element in row_data:
-                pdf.cell(30 * n_iter, 10, txt=str(element), border=1, align='C')
+                pdf.cell(cell_width, 10, txt=str(element), border=1, align='C')
             pdf.ln()
 
         # Adding graphs
@@ -72,11 +80,27 @@ class CreatePDFSummaryFile:
         for t_stop in t_stop_data:
             pdf.cell(0, 0, str(t_stop), align='C', ln=1)
             pdf.ln(5)
-            our_plot = str(self.path_to_charts) + '/' + str(plot_title.title_correction(t_stop)) + '_TSTOP.png'
-            pdf.image(our_plot, w=200, h=120)
+            our_plot = str(self.path_to_charts) + '/' + str(plot_title.title_correction(t_stop)) + '_TSTOP.' + \
+                image_format
+            self.image(pdf, our_plot)
             pdf.ln(5)
-            our_plot2 = str(self.path_to_charts) + '/' + str(plot_title.title_correction(t_stop)) + '_IRM_lnkT.png'
-            pdf.image(our_plot2, w=200, h=120)
+            our_plot2 = str(self.path_to_charts) + '/' + str(plot_title.title_correction(t_stop)) + '_IRM_lnkT.' + \
+                image_format
+            self.image(pdf, our_plot2)
             pdf.ln(10)
 
         pdf.output(str(self.path_to_save_report) + '/Report.pdf')
+
+    def image(self, pdf, path):
+        """
+        Adds the chart to the report. PNG charts with the alpha channel (saved by matplotlib) are added as RGB copies
+        (the background is white anyway), because FPDF splits RGBA images pixel by pixel.
+        :param pdf: FPDF of the report
+        :param path: Path to the chart
+        """
+        if path.lower().endswith('.png'):
+            with Image.open(path) as chart:
+                if chart.mode == 'RGBA':
+                    path = os.path.join(self.temporary_folder, os.path.basename(path))
+                    chart.convert('RGB').save(path, format='png')
+        pdf.image(path, w=200, h=120)
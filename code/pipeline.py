@@ -0,0 +1,650 @@
+import os
+import pickle
+import shutil
+import threading
+from contextlib import closing
+import numpy as np
+import pandas as pd
+from graph_analysis import CreatingFormatToAnalysis, PlotAnalysis, mean_of_intensity_points, peak_finder
+from file_organization import DividingRawDataToFolders, TStopInterpreter, FolderCreator, IRMExcelResults, \
+    TimeAlignment, IngestManifest
+from plot_charts import PlotChart
+from initial_rise_method import InitialRise, InitialRiseBatch, CONFIDENCE_LEVEL
+from pdf_file import CreatePDFSummaryFile
+from parallel import run_tasks, iterate_tasks, number_of_workers
+from profiling import profiler
+from result_cache import ResultCache, DEFAULT_CACHE_FOLDER, DEFAULT_CACHE_SIZE
+from spectrum_set import SpectrumSet
+
+
+K_BOLTZMANN = 8.617333262145E-5  # Boltzmann constant [eV/K]
+REPORT_IMAGE_FORMATS = ('png', 'jpg', 'jpeg')  # Chart formats that can be put into the PDF report
+
+# Which charts are created:
+#   none    -> no charts (only summary_data_frame.xlsx)
+#   summary -> only summary chart (TmaxTstopEnergy)
+#   report  -> charts required by Report.pdf (TSTOP, IRM_lnkT and summary chart) and the report
+#   all     -> all charts and the report
+CHART_POLICIES = ('none', 'summary', 'report', 'all')
+RESULTS_FILE_NAME = 'analysis_results.pkl'  # Stored results (saved in the chart folder) to render charts later
+ANALYSED_SPECTRA_FILE_NAME = 'analysed_spectra.pkl'  # Results of the last incremental analysis (next to Data_set.npz)
+PROGRESS_GROUPS_PER_WORKER = 4  # With a progress callback spectra are analysed in 4 groups for each worker
+
+# Parameters of the spectrum analysis (mean_of_intensity_points, peak_finder and InitialRise), also a part of the
+# ResultCache key. window_statistic is one of graph_analysis.WINDOW_STATISTICS (intensity of the mean points),
+# smoothing is one of curve_fitting.SMOOTHING_METHODS, cut_bins -> the lowest 1/cut_bins of the
+# intensity range is not analysed by peak_finder, residual_limit and fit_percent -> points of the IRM blind fit,
+# fitter is a name in initial_rise_method.FITTERS, uncertainty is one of initial_rise_method.UNCERTAINTY_METHODS
+# (bootstrap uses resamples)
+ANALYSIS_PARAMETERS = {'bin_step': 2, 'bin_width': 1, 'window_statistic': 'mean', 'smoothing': 'polyfit', 'dp': 3,
+                       'dn': 5, 'cut_bins': 7, 'rise_threshold': 0.15, 'residual_limit': 0.1, 'fit_percent': 90,
+                       'fitter': 'blind', 'uncertainty': 'covariance', 'resamples': 2000}
+
+
+class AnalysisCancelled(Exception):
+    """
+    Raised when the analysis is stopped by its cancel_event (e.g., Cancel button in the GUI)
+    """
+
+
+class SpectrumResult:
+    """
+    Values calculated for one T_stop spectrum (one column pair of the Data_set file) and data needed for its charts
+    """
+    def __init__(self, t_stop, t_max, i_max, energy, uncertain_energy):
+        self.t_stop = t_stop
+        self.t_max = t_max
+        self.i_max = i_max
+        self.energy = energy
+        self.uncertain_energy = uncertain_energy
+        self.algorithm_code = None  # peak_finder code (FM, DPFM, DP-n-k, DN-...)
+        self.resampled_uncertain_energy = None  # u(E) from bootstrap / jackknife of the chosen points (if calculated)
+        self.energy_interval = None  # Confidence interval of E (if calculated)
+        self.irm_file = None  # IRM Excel results saved by the analysis (copied for cached results)
+
+        # Chart data
+        self.data_frame = None
+        self.institute_apparatus = False
+        self.raw_data = None
+        self.data_median = None
+        self.mean_points_chosen = None
+        self.x_line = None
+        self.y_line = None
+
+    def set_chart_data(self, data_frame, institute_apparatus, initial_rise_method):
+        """
+        :param data_frame: DataFrame with 'Temp' and 'Int' columns
+        :param institute_apparatus: True/False if data came from INTiBS (Only for chart title)
+        :param initial_rise_method: InitialRise object of this spectrum
+        """
+        self.data_frame = data_frame
+        self.institute_apparatus = institute_apparatus
+        self.raw_data = initial_rise_method.raw_data
+        self.data_median = initial_rise_method.data_median
+        self.mean_points_chosen = initial_rise_method.mean_points_chosen
+        self.x_line = initial_rise_method.x_line
+        self.y_line = initial_rise_method.y_line
+
+
+def analyse_spectrum_group(data_frames, t_stop_data, institute_apparatus, irm_path, parameters=ANALYSIS_PARAMETERS):
+    """
+    Analysis of several T_stop spectra: T_max search, Initial Rise Method and IRM Excel results. The over fitted curves
+    of mean points, the quadratic T_max fits and the Initial Rise Method of all spectra are calculated in one batch, IRM
+    Excel results spectrum by spectrum.
+
+    :param data_frames: List of DataFrames with 'Temp' and 'Int' columns sorted by temperature
+    :param t_stop_data: List of T_stop names from the Data_set header
+    :param institute_apparatus: True/False if data came from INTiBS (Only for chart title)
+    :param irm_path: Folder where the IRM Excel results are saved
+    :param parameters: Analysis parameters (like ANALYSIS_PARAMETERS)
+    :return: List of SpectrumResult
+    """
+    rows = sum(len(data_frame) for data_frame in data_frames)
+    group = {'t_stop': t_stop_data[0]} if len(t_stop_data) == 1 else {'spectra': len(t_stop_data)}
+    analyses = [PlotAnalysis(data_frame) for data_frame in data_frames]
+    with profiler.stage('mean_of_intensity_points', rows=rows, **group):
+        mean_of_intensity_points(analyses, parameters['bin_step'], parameters['bin_width'], parameters['smoothing'],
+                                 parameters['window_statistic'])
+    with profiler.stage('peak_finder', rows=rows, **group):
+        peaks = peak_finder(analyses, parameters['dp'], parameters['dn'], parameters['cut_bins'])  # Finding T_max
+    with profiler.stage('InitialRise', rows=rows, **group):
+        initial_rise_batch = InitialRiseBatch([analysis.data_frame for analysis in analyses],
+                                              [t_max for t_max, _ in peaks], parameters['rise_threshold'], t_stop_data,
+                                              parameters['residual_limit'], parameters['fit_percent'],
+                                              parameters['fitter'])
+        if parameters['uncertainty'] != 'covariance':
+            initial_rise_batch.resample(parameters['uncertainty'], parameters['resamples'])
+
+    results = []
+    for index, (analysis, (t_max, i_max), t_stop) in enumerate(zip(analyses, peaks, t_stop_data)):
+        initial_rise_method = InitialRise.from_batch(initial_rise_batch, index)
+        with profiler.stage('IRMExcelResults', t_stop=t_stop, rows=len(initial_rise_method.raw_data)):
+            irm_file = save_irm_results(initial_rise_method.raw_data, irm_path, t_stop)
+
+        result = SpectrumResult(t_stop, t_max, i_max, initial_rise_method.e, initial_rise_method.a_uncertain)
+        result.irm_file = irm_file
+        result.algorithm_code = analysis.alg_code
+        result.resampled_uncertain_energy = initial_rise_method.u_resampled
+        result.energy_interval = initial_rise_method.e_interval
+        result.set_chart_data(analysis.data_frame, institute_apparatus, initial_rise_method)
+        results.append(result)
+    return results
+
+
+def analyse_spectrum(data_frame, t_stop, institute_apparatus, irm_path, parameters=ANALYSIS_PARAMETERS):
+    """
+    Analysis of one T_stop spectrum (see analyse_spectrum_group)
+    :return: SpectrumResult
+    """
+    return analyse_spectrum_group([data_frame], [t_stop], institute_apparatus, irm_path, parameters)[0]
+
+
+def save_irm_results(raw_data, irm_path, t_stop):
+    """
+    Saves IRM Excel results of one spectrum
+    :return: Path to saved file
+    """
+    title = PlotChart.title_correction(t_stop)
+    IRMExcelResults(raw_data, irm_path, title)
+    return irm_path + '/' + title + '_IRM.xlsx'
+
+
+def reuse_irm_results(result, irm_path, t_stop):
+    """
+    IRM Excel results of a cached spectrum. The file saved by the analysis of the same curve is copied (the results
+    depend only on the curve), the Excel file is written again only when that file does not exist anymore.
+    :return: Path to the file in irm_path
+    """
+    path = irm_path + '/' + PlotChart.title_correction(t_stop) + '_IRM.xlsx'
+    previous = getattr(result, 'irm_file', None)  # Results cached before irm_file was added do not have it
+    if not os.path.exists(path):
+        if previous and os.path.exists(previous):
+            shutil.copyfile(previous, path)
+        else:
+            save_irm_results(result.raw_data, irm_path, t_stop)
+    return path
+
+
+def check_cancelled(cancel_event):
+    """
+    :param cancel_event: threading.Event set to stop the analysis or None
+    :raise AnalysisCancelled: When the event is set
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        raise AnalysisCancelled('The analysis was cancelled')
+
+
+def extraction_progress(progress=None, cancel_event=None):
+    """
+    :param progress: Function progress(stage, done, total, result=None) or None
+    :param cancel_event: threading.Event set to stop the extraction or None
+    :return: Function called by DividingRawDataToFolders after each PMT file, it reports 'extraction' stage and raises
+    AnalysisCancelled when cancel_event is set
+    """
+    def extracted(done, total):
+        if progress is not None:
+            progress('extraction', done, total)
+        check_cancelled(cancel_event)
+    return extracted
+
+
+def analyse_spectra(data_frames, t_stop_data, institute_apparatus, irm_path, workers=1, cache=None,
+                    parameters=ANALYSIS_PARAMETERS, progress=None, cancel_event=None, previous_results=None):
+    """
+    Analysis of all spectra. With the cache only the spectra that are not in it are calculated, the others are taken
+    from the cache. Spectra in previous_results (e.g., the results of the previous incremental update) are taken from
+    it in the same way, without the cache. The spectra are split into one group for each worker (see
+    analyse_spectrum_group), with workers > 1 the groups are analysed in the process pool.
+
+    With progress the spectra are split into PROGRESS_GROUPS_PER_WORKER groups for each worker, so the progress is
+    reported a few times during the analysis and the groups are still big enough to be analysed in batches (spectra
+    from the cache are reported first). cancel_event is checked after each group, results calculated before the
+    cancellation stay in the cache.
+
+    :param data_frames: List of DataFrames with 'Temp' and 'Int' columns
+    :param t_stop_data: List of T_stop names
+    :param institute_apparatus: True/False if data came from INTiBS (Only for chart title)
+    :param irm_path: Folder where the IRM Excel results are saved
+    :param workers: Number of processes
+    :param cache: ResultCache or None
+    :param parameters: Analysis parameters (like ANALYSIS_PARAMETERS)
+    :param progress: Function progress(stage, done, total, result=None) called at the start of 'analysis' stage and
+    with SpectrumResult of each analysed T_stop, None -> no progress
+    :param cancel_event: threading.Event, when it is set AnalysisCancelled is raised
+    :param previous_results: {ResultCache.key: SpectrumResult} of spectra analysed before or None
+    :return: List of SpectrumResult in T_stop order
+    """
+    results = [None] * len(data_frames)
+    done = 0
+    if progress is not None:
+        progress('analysis', done, len(results))
+
+    def finished(index, result):
+        nonlocal done
+        results[index] = result
+        done += 1
+        if progress is not None:
+            progress('analysis', done, len(results), result)
+
+    if cache is not None or previous_results:
+        keys = [ResultCache.key(data_frame, parameters) for data_frame in data_frames]
+        for index, (key, t_stop) in enumerate(zip(keys, t_stop_data)):
+            result = previous_results.get(key) if previous_results else None
+            if result is None and cache is not None:
+                result = cache.get(key)
+            if result is not None:
+                # The same curve can have another T_stop name
+                result.t_stop = t_stop
+                result.institute_apparatus = institute_apparatus
+                with profiler.stage('IRMExcelResults', t_stop=t_stop, cached=True):
+                    result.irm_file = reuse_irm_results(result, irm_path, t_stop)
+                finished(index, result)
+
+    missing = np.array([index for index, result in enumerate(results) if result is None], dtype=int)
+    if not len(missing):
+        return results
+
+    # One group of spectra for each worker (more groups to report the progress)
+    groups = number_of_workers(workers) * (1 if progress is None else PROGRESS_GROUPS_PER_WORKER)
+    groups = np.array_split(missing, min(groups, len(missing)))
+    tasks = [([data_frames[index] for index in group], [t_stop_data[index] for index in group],
+              institute_apparatus, irm_path, parameters) for group in groups]
+    try:
+        with closing(iterate_tasks(analyse_spectrum_group, tasks, workers)) as group_results:
+            for group, group_result in zip(groups, group_results):
+                for index, result in zip(group, group_result):
+                    if cache is not None:
+                        cache.put(keys[index], result)
+                    finished(index, result)
+                check_cancelled(cancel_event)
+    finally:
+        if cache is not None:
+            cache.evict()
+
+    return results
+
+
+def render_spectrum_charts(data_plot, result, all_charts=True):
+    """
+    Creates and saves T_max chart and Initial Rise Method charts of one spectrum
+
+    :param data_plot: PlotChart with folder and chart settings
+    :param result: SpectrumResult with chart data
+    :param all_charts: False -> only charts required by the report (without IRM_TI chart)
+    """
+    with profiler.stage('PlotChart', t_stop=result.t_stop, rows=len(result.data_frame)):
+        data_plot.t_max_stop(result.data_frame, result.t_max, result.t_stop, result.institute_apparatus)
+        data_plot.initial_rise(result.t_stop, result.raw_data, result.data_median, result.mean_points_chosen,
+                               result.x_line, result.y_line, all_charts)
+
+
+def render_charts(results, chart_path, summary_path, chart_policy='all', workers=1, dpi=100, chart_format='png',
+                  progress=None, cancel_event=None):
+    """
+    Creates charts (and the report) selected by chart_policy from already calculated results
+
+    :param results: List of SpectrumResult in T_stop order
+    :param chart_path: Folder where the charts are saved
+    :param summary_path: Path to summary_data_frame.xlsx (the report is saved in the same folder)
+    :param chart_policy: One of CHART_POLICIES
+    :param workers: Number of processes rendering charts of each spectrum
+    :param dpi: Resolution of the charts
+    :param chart_format: Format of the charts
+    :param progress: Function progress(stage, done, total) called before and after charts of each spectrum
+    ('charts') and before the report ('report'), None -> no progress
+    :param cancel_event: threading.Event, when it is set AnalysisCancelled is raised
+    """
+    if chart_policy not in CHART_POLICIES:
+        raise ValueError(f'Unknown chart policy: {chart_policy}')
+    if chart_policy == 'none':
+        return
+
+    data_plot = PlotChart(chart_path, dpi, chart_format)
+    if chart_policy in ('report', 'all'):
+        tasks = [(data_plot, result, chart_policy == 'all') for result in results]
+        if progress is not None:
+            progress('charts', 0, len(tasks))
+        with closing(iterate_tasks(render_spectrum_charts, tasks, workers)) as rendered:
+            for done, _ in enumerate(rendered, 1):
+                if progress is not None:
+                    progress('charts', done, len(tasks))
+                check_cancelled(cancel_event)
+
+    t_stop_all = [result.t_stop for result in results]
+    with profiler.stage('PlotChart summary', rows=len(results)):
+        data_plot.t_max_stop_energy(TStopInterpreter(t_stop_all).temperatures, [result.t_max for result in results],
+                                    [result.energy for result in results])
+
+    if chart_policy in ('report', 'all') and chart_format in REPORT_IMAGE_FORMATS:
+        if progress is not None:
+            progress('report', 0, 1)
+        with profiler.stage('CreatePDFSummaryFile', rows=len(results)):
+            CreatePDFSummaryFile(summary_path, chart_path, os.path.dirname(summary_path), chart_format)
+
+
+def save_analysis_results(chart_path, results, summary_path):
+    """
+    Saves results (with chart data) so the charts can be rendered later without the analysis
+    :param chart_path: Folder where the charts are saved
+    :param results: List of SpectrumResult in T_stop order
+    :param summary_path: Path to summary_data_frame.xlsx
+    :return: Path to saved file
+    """
+    results_path = str(chart_path) + '/' + RESULTS_FILE_NAME
+    with open(results_path, 'wb') as results_file:
+        pickle.dump({'results': results, 'summary_path': summary_path}, results_file)
+    return results_path
+
+
+def render_stored_charts(results_path, chart_policy='all', workers=1, dpi=100, chart_format='png'):
+    """
+    Renders charts from results saved by save_analysis_results (into the same folder)
+    :param results_path: Path to analysis_results.pkl file
+    :param chart_policy: One of CHART_POLICIES
+    :param workers: Number of processes rendering charts of each spectrum
+    :param dpi: Resolution of the charts
+    :param chart_format: Format of the charts
+    """
+    with open(results_path, 'rb') as results_file:
+        stored = pickle.load(results_file)
+    render_charts(stored['results'], os.path.dirname(os.path.abspath(results_path)), stored['summary_path'],
+                  chart_policy, workers, dpi, chart_format)
+
+
+def load_analysed_spectra(data_set_path):
+    """
+    :param data_set_path: Path to Data_set.npz
+    :return: {ResultCache.key: SpectrumResult} saved by save_analysed_spectra next to the Data_set file ({} if there
+    is no such file)
+    """
+    path = os.path.dirname(os.path.abspath(data_set_path)) + '/' + ANALYSED_SPECTRA_FILE_NAME
+    try:
+        with open(path, 'rb') as results_file:
+            return pickle.load(results_file)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return {}
+
+
+def save_analysed_spectra(data_set_path, spectra, results, parameters):
+    """
+    Saves results of all spectra of the Data_set file by their ResultCache.key, so the next incremental update
+    analyses only new T_stops (and spectra that changed or were analysed with other parameters)
+
+    :param data_set_path: Path to Data_set.npz
+    :param spectra: SpectrumSet of the Data_set file
+    :param results: List of SpectrumResult in T_stop order
+    :param parameters: Analysis parameters of the results
+    """
+    path = os.path.dirname(os.path.abspath(data_set_path)) + '/' + ANALYSED_SPECTRA_FILE_NAME
+    analysed = {ResultCache.key(data_frame, parameters): result
+                for data_frame, result in zip(spectra.data_frames(), results)}
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as results_file:
+        pickle.dump(analysed, results_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, path)
+
+
+def create_summary_data_frame(results, heat_rate):
+    """
+    Creates summary table with T_stop, T_max, activation energy, its uncertainty and frequency factor (s). When u(E)
+    was also calculated by bootstrap / jackknife, it is added with the confidence interval of E.
+
+    :param results: List of SpectrumResult in T_stop order
+    :param heat_rate: Heating rate used in the measurement
+    :return: Summary DataFrame
+    """
+    t_stop_all = [result.t_stop for result in results]
+    summary_data_frame = pd.DataFrame({
+        'T_stop [°C]': t_stop_all,
+        'T_stop (value)': TStopInterpreter(t_stop_all).temperatures,
+        'T_max [°C]': [result.t_max for result in results],
+        'Energy [ev]': [result.energy for result in results],
+        'u(E) [eV]': [result.uncertain_energy for result in results]
+    })
+    summary_data_frame['s'] = (heat_rate * summary_data_frame['Energy [ev]'] / (
+                K_BOLTZMANN * (summary_data_frame['T_max [°C]'] + 273.15) ** 2)) / np.exp(
+        -summary_data_frame['Energy [ev]'] / (K_BOLTZMANN * (summary_data_frame['T_max [°C]'] + 273.15)))
+
+    summary_data_frame['u(E)/E [%]'] = summary_data_frame['u(E) [eV]'] / summary_data_frame['Energy [ev]'] * 100
+
+    if any(getattr(result, 'energy_interval', None) is not None for result in results):
+        intervals = [getattr(result, 'energy_interval', None) or (np.nan, np.nan) for result in results]
+        summary_data_frame['u(E) resampled [eV]'] = [getattr(result, 'resampled_uncertain_energy', None)
+                                                     for result in results]
+        summary_data_frame[f'E low ({CONFIDENCE_LEVEL:.0%}) [eV]'] = [low for low, _ in intervals]
+        summary_data_frame[f'E high ({CONFIDENCE_LEVEL:.0%}) [eV]'] = [high for _, high in intervals]
+
+    return summary_data_frame
+
+
+class AnalysisPipeline:
+    """
+    The Tmax-Tstop analysis without the GUI. The pipeline takes the Data_set file (.xlsx or .npz) and the heating rate
+    and runs all steps one by one:
+
+        CreatingFormatToAnalysis -> PlotAnalysis -> InitialRise -> summary_data_frame -> charts -> Report.pdf
+
+    All charts, IRM results, the summary file and the report are saved next to the Data_set file (like in the GUI).
+
+    Spectra are independent of each other, so with workers > 1 they are analysed in a process pool (results are still
+    collected in T_stop order). workers=1 runs everything in this process. Charts are rendered afterwards in their own
+    pool (render_workers, by default the same as workers). chart_policy selects which charts are created; the results
+    are stored in the chart folder, so skipped charts can be rendered later by render_stored_charts.
+    With ResultCache (cache) spectra analysed before are not calculated again, previous_results
+    ({ResultCache.key: SpectrumResult}, see load_analysed_spectra) are used in the same way without the cache.
+
+    Spectra already in memory (SpectrumSet, e.g., just extracted from the INTiBS folder) can be given as spectra, then
+    the Data_set file is not read (its path only tells where the results are saved). parameters change the values of
+    ANALYSIS_PARAMETERS (e.g., {'smoothing': 'chebyshev'}).
+
+    progress is called in the thread running the pipeline after each step: progress(stage, done, total[, result]) with
+    stages 'reading', 'analysis' (with SpectrumResult of each T_stop), 'charts' and 'report'. When cancel_event
+    (threading.Event) is set, the pipeline stops after the current group of spectra with AnalysisCancelled.
+    """
+
+    def __init__(self, excel_file_path, heat_rate, workers=1, render_workers=None, dpi=100, chart_format='png',
+                 chart_policy='all', cache=None, spectra=None, parameters=None, progress=None, cancel_event=None,
+                 previous_results=None):
+        self.excel_file_path = os.path.abspath(excel_file_path)  # Result folders are created next to this file
+        self.heat_rate = float(heat_rate)
+        self.workers = workers
+        self.render_workers = workers if render_workers is None else render_workers
+        self.dpi = dpi
+        self.chart_format = chart_format
+        self.chart_policy = chart_policy
+        self.cache = cache
+        self.spectra = spectra
+        self.parameters = dict(ANALYSIS_PARAMETERS, **(parameters or {}))  # Changed analysis parameters
+        self.progress = progress
+        self.cancel_event = cancel_event
+        self.previous_results = previous_results
+        self.results = []  # SpectrumResult for each T_stop
+        self.summary_data_frame = None
+        self.summary_path = None
+
+    def run(self):
+        """
+        Runs the whole analysis
+        :return: Summary DataFrame
+        """
+        if self.spectra is None:
+            if self.progress is not None:
+                self.progress('reading', 0, 1)
+            with profiler.stage('CreatingFormatToAnalysis') as stage:
+                self.spectra = CreatingFormatToAnalysis(self.excel_file_path).spectra
+                stage.set(rows=len(self.spectra.values))
+
+        # Creating a new chart folder and IRM results folder
+        chart_folder = FolderCreator(self.excel_file_path)
+        chart_folder.create_chart_folder('Charts')
+        irm_folder = FolderCreator(self.excel_file_path)
+        irm_folder.create_chart_folder('IRM_results')
+
+        # Finding T_max, T_stop, energy for each spectrum
+        self.results = analyse_spectra(self.spectra.data_frames(), self.spectra.t_stop_names,
+                                       self.spectra.institute_apparatus, irm_folder.to_save_path, self.workers,
+                                       self.cache, self.parameters, self.progress, self.cancel_event,
+                                       self.previous_results)
+
+        # Summary
+        with profiler.stage('summary_data_frame', rows=len(self.results)):
+            self.summary_data_frame = create_summary_data_frame(self.results, self.heat_rate)
+            self.summary_path = chart_folder.folder_name + '/summary_data_frame.xlsx'
+            self.summary_data_frame.to_excel(self.summary_path)
+
+        # Charts
+        save_analysis_results(chart_folder.to_save_path, self.results, self.summary_path)
+        render_charts(self.results, chart_folder.to_save_path, self.summary_path, self.chart_policy,
+                      self.render_workers, self.dpi, self.chart_format, self.progress, self.cancel_event)
+
+        return self.summary_data_frame
+
+
+def extract_intibs_folder(folder_path, first_pmt, first_heat, save_excel=True, time_alignment=None,
+                          incremental=False, progress=None, cancel_event=None):
+    """
+    Data extraction from the INTiBS folder (like the 'INTiBS folder' button). The combined data is always saved in the
+    binary Data_set.npz file, Excel files are optional.
+
+    In the incremental mode only PMT/Heater_measured pairs that are not in IngestManifest are extracted and added to the
+    Data_set file saved before, so the folder can be extracted again after each step of the measurement sequence.
+
+    :param folder_path: Folder with INTiBS measurement files
+    :param first_pmt: Number of first PMT file that contains the intensity data
+    :param first_heat: Number of first heat file that contains the temperature data corresponds to the first PMT
+    :param save_excel: True -> Excel file for each T_stop and Data_set.xlsx are saved too
+    :param time_alignment: TimeAlignment of PMT and heater data (None -> equal timestamps only)
+    :param incremental: True -> only new measurement files are extracted
+    :param progress: Function progress(stage, done, total, result=None) called after each PMT file, None -> no progress
+    :param cancel_event: threading.Event checked after each PMT file, when it is set AnalysisCancelled is raised (the
+    manifest and Data_set files are not saved)
+    :return: List of paths to created Data_set.npz files (one for each sub folder with extracted files, in the
+    incremental mode without new files - all sub folders of the manifest), {path to sub folder: {t_stop: number of PMT
+    samples dropped without temperature}} (only for the extracted T_stops)
+    """
+    manifest = IngestManifest(folder_path) if incremental else None
+    new_data = DividingRawDataToFolders(folder_path, time_alignment)
+    new_data.divide_data_TO_folders_sequence_position(first_pmt, first_heat, save_excel, manifest,
+                                                      extraction_progress(progress, cancel_event))
+    with profiler.stage('create_data_set_file'):
+        new_data.create_data_set_file()
+    if save_excel:
+        with profiler.stage('create_one_excel_file'):
+            new_data.create_one_excel_file()
+
+    combine_paths = [os.path.dirname(path) for path in new_data.paths_to_sub_folders]
+    if manifest is not None:
+        manifest.save()  # After Data_set files are saved
+        if not combine_paths:  # Nothing new
+            combine_paths = manifest.combine_paths()
+
+    return [str(combine_path) + '/Data_set.npz' for combine_path in combine_paths], new_data.dropped_samples
+
+
+class ExcelPersistence(threading.Thread):
+    """
+    Saves Excel files of the extracted INTiBS data (file for each T_stop and Data_set.xlsx) in a background thread, so
+    the analysis does not wait for them. An error raised in the thread is raised again by wait().
+    """
+
+    def __init__(self, new_data):
+        """
+        :param new_data: DividingRawDataToFolders after the extraction (data is kept in memory)
+        """
+        super().__init__(name='ExcelPersistence')
+        self.new_data = new_data
+        self.error = None
+
+    def run(self):
+        try:
+            with profiler.stage('T_stop Excel files'):
+                self.new_data.save_excel_files()
+            with profiler.stage('create_one_excel_file'):
+                self.new_data.create_one_excel_file()
+        except Exception as error:
+            self.error = error
+
+    def wait(self):
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+
+def extracted_spectrum_set(new_data, path):
+    """
+    :param new_data: DividingRawDataToFolders after the extraction
+    :param path: Path to sub folder (Excel_files folder of one irradiation)
+    :return: SpectrumSet of the sub folder made from data in memory
+    """
+    level_column_name, data_frames = new_data.sorted_data_frames(path)
+    return SpectrumSet.from_arrays(level_column_name, [data_frame['Temperature'] for data_frame in data_frames],
+                                   [data_frame['Intensity'] for data_frame in data_frames], True)
+
+
+def extract_and_analyse(folder_path, first_pmt, first_heat, heat_rate, save_excel=True, time_alignment=None,
+                        incremental=False, **options):
+    """
+    Extraction of the INTiBS folder and the analysis in one run. The aligned spectra are handed to AnalysisPipeline in
+    memory (Data_set files are not read back). Data_set.npz is saved for later re-analysis, Excel files (optional) are
+    saved by ExcelPersistence during the analysis.
+
+    :param folder_path: Folder with INTiBS measurement files
+    :param first_pmt: Number of first PMT file that contains the intensity data
+    :param first_heat: Number of first heat file that contains the temperature data corresponds to the first PMT
+    :param heat_rate: Heating rate used in the measurement
+    :param save_excel: True -> Excel file for each T_stop and Data_set.xlsx are saved in the background
+    :param time_alignment: TimeAlignment of PMT and heater data (None -> equal timestamps only)
+    :param incremental: True -> only new measurement files are extracted (sub folders without new files are not
+    analysed) and only new T_stops are analysed, results of the other spectra are kept from the previous incremental
+    run (ANALYSED_SPECTRA_FILE_NAME next to Data_set.npz), so this does not depend on the result cache
+    :param options: Other AnalysisPipeline parameters (workers, cache, chart_policy, progress, cancel_event...)
+    :return: List of AnalysisPipeline (one for each analysed sub folder), {path to sub folder: {t_stop: number of PMT
+    samples dropped without temperature}} (only for the extracted T_stops)
+    """
+    manifest = IngestManifest(folder_path) if incremental else None
+    new_data = DividingRawDataToFolders(folder_path, time_alignment)
+    new_data.divide_data_TO_folders_sequence_position(first_pmt, first_heat, False, manifest,
+                                                      extraction_progress(options.get('progress'),
+                                                                          options.get('cancel_event')))
+
+    excel_persistence = None
+    if save_excel:
+        excel_persistence = ExcelPersistence(new_data)
+        excel_persistence.start()
+
+    pipelines = []
+    try:
+        for path in new_data.paths_to_sub_folders:
+            check_cancelled(options.get('cancel_event'))
+            with profiler.stage('SpectrumSet') as stage:
+                spectra = extracted_spectrum_set(new_data, path)
+                data_set_path = os.path.dirname(path) + '/Data_set.npz'
+                spectra.save(data_set_path)
+                stage.set(rows=len(spectra.values))
+            previous_results = load_analysed_spectra(data_set_path) if manifest is not None else None
+            pipeline = AnalysisPipeline(data_set_path, heat_rate, spectra=spectra, previous_results=previous_results,
+                                        **options)
+            pipeline.run()
+            if manifest is not None:
+                save_analysed_spectra(data_set_path, spectra, pipeline.results, pipeline.parameters)
+            pipelines.append(pipeline)
+        if manifest is not None:
+            manifest.save()  # After Data_set files are saved
+    finally:
+        if excel_persistence is not None:
+            excel_persistence.wait()
+
+    return pipelines, new_data.dropped_samples
+
+
+def convert_data_set_file(excel_file_path):
+    """
+    Saves Data_set Excel file as binary Data_set.npz file (next to the Excel file) for fast re-analysis
+    :param excel_file_path: Path to Data_set Excel file
+    :return: Path to created .npz file
+    """
+    fine_format_file = CreatingFormatToAnalysis(excel_file_path)
+    # Spectra are saved sorted by temperature (like analysed), so they are not sorted again after loading
+    data_set_path = os.path.splitext(excel_file_path)[0] + '.npz'
+    fine_format_file.spectra.save(data_set_path)
+    return data_set_path
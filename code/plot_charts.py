@@ -1,4 +1,4 @@
-from matplotlib import pyplot as plt
+from matplotlib.figure import Figure
 
 
 class PlotChart:
@@ -7,10 +7,27 @@ class PlotChart:
     1. T_max  Chart
     2. Initial Rise Method Chart
     3. Summary chart with all calculated values
+
+    Charts are drawn on standalone matplotlib Figures with the Agg canvas (not pyplot), so no interactive backend is
+    used and each figure is released right after saving. That is also safe in worker processes.
     """
 
-    def __init__(self, folder_save_path):
+    def __init__(self, folder_save_path, dpi=100, file_format='png'):
         self.folder_save_path = folder_save_path
+        self.dpi = dpi
+        self.file_format = file_format
+
+    def save(self, fig, file_name):
+        """
+        Saves the figure into folder given in class constructor
+        :param fig: Figure to save
+        :param file_name: File name without extension
+        :return: Path to saved chart
+        """
+        save_path = str(self.folder_save_path) + '/' + file_name + '.' + self.file_format
+        fig.savefig(save_path, dpi=self.dpi, format=self.file_format)
+        fig.clear()
+        return save_path
 
     @staticmethod
     def title_correction(title):
@@ -37,7 +54,8 @@ class PlotChart:
         :param institute_bool: True/False if data came from INTiBS (Only for title)
         :return: Save charts into path given in class constructor
         """
-        fig, ax = plt.subplots(figsize=(15, 8))
+        fig = Figure(figsize=(15, 8))
+        ax = fig.subplots()
         ax.scatter(data_points['Temp'], data_points['Int'])
         ax.vlines(t_max, data_points['Int'].min(), data_points['Int'].max(), color='black', linestyles='dashed')
         ax.set_xlabel('Temperature [\u00b0C]', fontsize='13')
@@ -48,11 +66,9 @@ class PlotChart:
             ax.set_title('T_max: ' + str(t_max) + ' [\u00b0C]' + ' - T_stop: ' + str(title) + ' [\u00b0C]', fontsize=14)
 
         title = PlotChart.title_correction(title)
-        title_save = '/' + str(title) + '_TSTOP.png'
-        title_save_path = str(self.folder_save_path) + title_save
-        plt.savefig(title_save_path)
+        self.save(fig, str(title) + '_TSTOP')
 
-    def initial_rise(self, title, raw_data, median_data, points_selected, x_line, y_line):
+    def initial_rise(self, title, raw_data, median_data, points_selected, x_line, y_line, temperature_chart=True):
         """
         Method creates and saves two graphs.
         The first one called 'IRM_TI' is created by selecting data points from Temperature vs Intensity.
@@ -65,23 +81,24 @@ class PlotChart:
         :param points_selected: DataFrame with values that meet the conditions IRM (15 % of max Intensity)
         :param x_line: DataFrame with x_axis-fitted values (Temperature transformed to  1/kT ) Linear regression points
         :param y_line: List of y_axis-fitted values (Intensity transformed to Log(Int)) Linear regression points.
+        :param temperature_chart: False -> only the second chart (IRM_lnkT) is created
         :return: Save charts into path given in class constructor
         """
         title = PlotChart.title_correction(title)
-        title_initial_int_vs_temp = '/' + title + '_IRM_TI.png'
-        fig, ax = plt.subplots(figsize=(15, 8))
-        ax.scatter(raw_data['Temp'], raw_data['Int'], color='blue', label='Original data points')
-        ax.scatter(median_data['round_temp'], median_data['Int'], color='orange', label='Median data points')
-        ax.scatter(points_selected['round_temp'], points_selected['Int'], color='green', label='Selected points')
-        ax.set_title('Initial Rise Method - Intensity vs Temperature', fontsize=14)
-        ax.set_xlabel('Temperature [\u00b0C]', fontsize='13')
-        ax.set_ylabel('Intensity (Arb. Units)', fontsize='13')
-        ax.legend()
-        save_path = str(self.folder_save_path) + title_initial_int_vs_temp
-        plt.savefig(save_path)
+        if temperature_chart:
+            fig = Figure(figsize=(15, 8))
+            ax = fig.subplots()
+            ax.scatter(raw_data['Temp'], raw_data['Int'], color='blue', label='Original data points')
+            ax.scatter(median_data['round_temp'], median_data['Int'], color='orange', label='Median data points')
+            ax.scatter(points_selected['round_temp'], points_selected['Int'], color='green', label='Selected points')
+            ax.set_title('Initial Rise Method - Intensity vs Temperature', fontsize=14)
+            ax.set_xlabel('Temperature [\u00b0C]', fontsize='13')
+            ax.set_ylabel('Intensity (Arb. Units)', fontsize='13')
+            ax.legend()
+            self.save(fig, title + '_IRM_TI')
 
-        title_initial_lni_vs_kt = '/' + title + '_IRM_lnkT.png'
-        fig, ax = plt.subplots(figsize=(15, 8))
+        fig = Figure(figsize=(15, 8))
+        ax = fig.subplots()
         ax.scatter(raw_data['1/kT'], raw_data['ln(I)'], label='Original')
         ax.scatter(points_selected['1/kT'], points_selected['ln(I)'], c='orange', label='Selected points')
         ax.plot(x_line['1/kT'], y_line, c='yellow', label='fitted_line', linestyle='dashed', linewidth=6)
@@ -89,8 +106,7 @@ class PlotChart:
         ax.set_xlabel('1/kT', fontsize='13')
         ax.set_ylabel('ln(I)', fontsize='13')
         ax.legend()
-        save_path = str(self.folder_save_path) + title_initial_lni_vs_kt
-        plt.savefig(save_path)
+        self.save(fig, title + '_IRM_lnkT')
 
     def t_max_stop_energy(self, t_stop, t_max, energy):
         """
@@ -101,7 +117,8 @@ class PlotChart:
         :param energy: List with Energy values
         :return: Save charts into path given in class constructor
         """
-        fig, ax = plt.subplots(figsize=(15, 8))
+        fig = Figure(figsize=(15, 8))
+        ax = fig.subplots()
         ax.scatter(t_stop, t_max, color='black')
         ax.set_title('T_max - T_stop & Activation Energy')
         ax.set_xlabel('T_stop', fontsize=13)
@@ -110,5 +127,4 @@ class PlotChart:
         ax2.scatter(t_stop, energy, c='blue')
         ax2.set_ylabel('Energy', c='blue', fontsize=13)
 
-        title_save_path = str(self.folder_save_path) + '/TmaxTstopEnergy.png'
-        plt.savefig(title_save_path)
+        self.save(fig, 'TmaxTstopEnergy')
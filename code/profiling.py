@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import atexit
+import threading
+import multiprocessing
+import tracemalloc
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+ENVIRONMENT_VARIABLE = 'SPECTRATL_PROFILE'  # Path to the trace file, profiling is enabled when it is set
+MEMORY_ENVIRONMENT_VARIABLE = 'SPECTRATL_PROFILE_MEMORY'  # '1' -> peak memory of each stage traced by tracemalloc
+
+
+class _DisabledStage:
+    """
+    Context manager used when the profiler is disabled (nothing is measured)
+    """
+
+    def __enter__(self):
+        return self
+
+    def set(self, **args):
+        pass
+
+    def __exit__(self, *exception):
+        return False
+
+
+DISABLED_STAGE = _DisabledStage()
+
+
+class _Stage:
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.event = {'name': name, 'args': args}
+
+    def __enter__(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            self.memory_start = tracemalloc.get_traced_memory()[0]
+        self.cpu_start = time.process_time()
+        self.start = time.perf_counter()
+        return self
+
+    def set(self, **args):
+        """
+        Adds information known only inside the stage (e.g., T_stop read from the file)
+        """
+        self.event['args'].update(args)
+
+    def __exit__(self, *exception):
+        end = time.perf_counter()
+        args = self.event['args']
+        args['cpu_ms'] = (time.process_time() - self.cpu_start) * 1000
+        if tracemalloc.is_tracing():
+            args['peak_memory_kb'] = (tracemalloc.get_traced_memory()[1] - self.memory_start) / 1024
+        if resource is not None:
+            args['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.event.update({'cat': 'stage', 'ph': 'X', 'ts': self.start * 1e6, 'dur': (end - self.start) * 1e6,
+                           'pid': os.getpid(), 'tid': threading.get_ident()})
+        self.profiler.events.append(self.event)
+        return False
+
+
+class StageProfiler:
+    """
+    Lightweight instrumentation of the analysis and INTiBS extraction stages.
+
+        with profiler.stage('peak_finder', t_stop=t_stop, rows=len(data_frame)):
+            ...
+
+    For each stage wall time, CPU time of the process, max resident memory of the process (not on Windows) and the
+    given arguments (T_stop, number of rows) are recorded. With memory=True also peak memory allocated during the stage
+    is traced by tracemalloc (it slows down the analysis several times, especially Excel files). The events are saved
+    in Chrome trace format (chrome://tracing, Perfetto) and can be summarised as a table. When the profiler is disabled,
+    stage() returns one shared context manager that does nothing.
+
+    The profiler is enabled by enable() or by SPECTRATL_PROFILE environment variable (path to the trace file). The
+    variable is also set by enable(), so worker processes are profiled too (see parallel.run_tasks). The main process
+    saves the trace file at exit (e.g., after closing the GUI).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_path = None
+        self.events = []
+        if os.environ.get(ENVIRONMENT_VARIABLE):
+            self.enable(os.environ[ENVIRONMENT_VARIABLE], os.environ.get(MEMORY_ENVIRONMENT_VARIABLE) == '1')
+
+    def enable(self, trace_path, memory=False):
+        """
+        :param trace_path: Path to the trace file saved by save()
+        :param memory: True -> peak memory of each stage traced by tracemalloc
+        """
+        if self.enabled is False and multiprocessing.parent_process() is None:
+            atexit.register(self.save)
+        self.enabled = True
+        self.trace_path = trace_path
+        os.environ[ENVIRONMENT_VARIABLE] = str(trace_path)
+        if memory:
+            os.environ[MEMORY_ENVIRONMENT_VARIABLE] = '1'
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def disable(self):
+        self.enabled = False
+        os.environ.pop(ENVIRONMENT_VARIABLE, None)
+        os.environ.pop(MEMORY_ENVIRONMENT_VARIABLE, None)
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def stage(self, name, **args):
+        """
+        :param name: Name of the stage
+        :param args: Additional information (e.g., t_stop, rows), more can be added by set() of the returned stage
+        :return: Context manager measuring the stage
+        """
+        if not self.enabled:
+            return DISABLED_STAGE
+        return _Stage(self, name, args)
+
+    def take_events(self, start=0):
+        """
+        Removes and returns events recorded after index start (used to send events from worker processes)
+        """
+        events = self.events[start:]
+        del self.events[start:]
+        return events
+
+    def summary(self):
+        """
+        :return: DataFrame with number of calls, total wall/CPU time [ms], max memory [kB] and rows of each stage
+        """
+        if not self.events:
+            return pd.DataFrame()
+        data_frame = pd.DataFrame([{'stage': event['name'], 'wall_ms': event['dur'] / 1000, **event['args']}
+                                   for event in self.events])
+        aggregation = {'calls': ('wall_ms', 'size'), 'wall_ms': ('wall_ms', 'sum'), 'cpu_ms': ('cpu_ms', 'sum')}
+        for memory_column in ('peak_memory_kb', 'max_rss_kb'):
+            if memory_column in data_frame:
+                aggregation[memory_column] = (memory_column, 'max')
+        if 'rows' in data_frame:
+            aggregation['rows'] = ('rows', 'sum')
+        return data_frame.groupby('stage', sort=False).agg(**aggregation)
+
+    def t_stop_summary(self):
+        """
+        :return: DataFrame with wall time [ms] of each T_stop (columns - stages)
+        """
+        rows = [{'t_stop': event['args']['t_stop'], 'stage': event['name'], 'wall_ms': event['dur'] / 1000}
+                for event in self.events if 't_stop' in event['args']]
+        if not rows:
+            return pd.DataFrame()
+        data_frame = pd.DataFrame(rows).pivot_table(index='t_stop', columns='stage', values='wall_ms', aggfunc='sum',
+                                                    sort=False)
+        data_frame['total'] = data_frame.sum(axis=1)
+        return data_frame
+
+    def save(self, trace_path=None):
+        """
+        Saves events in Chrome trace format
+        :param trace_path: Path to the trace file (None -> path given in enable())
+        :return: Path to saved file
+        """
+        trace_path = trace_path or self.trace_path
+        if trace_path is None:
+            return None
+        with open(trace_path, 'w', encoding='utf-8') as trace_file:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, trace_file, default=str)
+        return trace_path
+
+
+profiler = StageProfiler()
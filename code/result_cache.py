@@ -0,0 +1,105 @@
+import os
+import hashlib
+import pickle
+import numpy as np
+
+
+CACHE_VERSION = 3  # Change when the analysis algorithms change (old results are not used anymore)
+DEFAULT_CACHE_FOLDER = os.path.join(os.path.expanduser('~'), '.spectratl_cache')
+DEFAULT_CACHE_SIZE = 512 * 1024 ** 2  # [B]
+
+
+class ResultCache:
+    """
+    Content-addressed cache of analysed spectra saved on disk.
+
+    The key is a hash of Temp and Int values of the spectrum and the analysis parameters, so the same curve gives the
+    same result regardless of its T_stop name or Data_set file. The heating rate is not a part of the key, because it is
+    only used for the frequency factor (s) in the summary table.
+    Each result is saved in a separate file. When the folder is bigger than max_size, the least recently used results
+    are removed.
+    """
+
+    def __init__(self, cache_folder=DEFAULT_CACHE_FOLDER, max_size=DEFAULT_CACHE_SIZE):
+        self.cache_folder = cache_folder
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_folder, exist_ok=True)
+
+    @staticmethod
+    def key(data_frame, parameters):
+        """
+        :param data_frame: DataFrame with 'Temp' and 'Int' columns
+        :param parameters: Dictionary with analysis parameters
+        :return: Hex digest of the spectrum and parameters
+        """
+        digest = hashlib.sha256()
+        digest.update(f'v{CACHE_VERSION}:{sorted(parameters.items())!r}'.encode())
+        for column in ('Temp', 'Int'):
+            digest.update(np.ascontiguousarray(data_frame[column].to_numpy(dtype=np.float64)).tobytes())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_folder, key + '.pkl')
+
+    def get(self, key):
+        """
+        :param key: Key from ResultCache.key
+        :return: Stored result or None
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as cache_file:
+                result = pickle.load(cache_file)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            self.misses += 1
+            return None
+
+        os.utime(path)  # Recently used
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        """
+        Saves the result (the file is written under temporary name and renamed, so it is never read half-written)
+        :param key: Key from ResultCache.key
+        :param result: Picklable result
+        """
+        path = self.path(key)
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'wb') as cache_file:
+            pickle.dump(result, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+
+    def evict(self):
+        """
+        Removes the least recently used results until the cache is not bigger than max_size
+        :return: Number of removed results
+        """
+        entries = []
+        for entry in os.scandir(self.cache_folder):
+            if entry.is_file() and entry.name.endswith('.pkl'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        """
+        Removes all results from the cache
+        """
+        for entry in os.scandir(self.cache_folder):
+            if entry.is_file() and entry.name.endswith('.pkl'):
+                os.remove(entry.path)
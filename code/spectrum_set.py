@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+from file_organization import load_data_set_file, save_data_set_file
+
+
+class Spectrum:
+    """
+    View of one T_stop spectrum in SpectrumSet (no data is copied)
+    """
+    __slots__ = ('t_stop', 'values')
+
+    def __init__(self, t_stop, values):
+        self.t_stop = t_stop
+        self.values = values  # (n, 2) view: Temp, Int
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def temperature(self):
+        return self.values[:, 0]
+
+    @property
+    def intensity(self):
+        return self.values[:, 1]
+
+    def data_frame(self):
+        """
+        :return: DataFrame with 'Temp' and 'Int' columns sharing memory with the spectrum set
+        """
+        return pd.DataFrame(self.values, columns=['Temp', 'Int'], copy=False)
+
+
+class SpectrumSet:
+    """
+    All T_stop spectra in one contiguous (N, 2) float buffer (Temp, Int). Spectrum i is saved in rows
+    offsets[i]:offsets[i + 1] and it is sorted by temperature, so every spectrum (and its DataFrame) is only a view of
+    the buffer. Empty cells of shorter spectra (Excel files) are not kept.
+
+    Spectra are sorted like DataFrame.sort_values(by='Temp'), already sorted spectra (e.g., saved by save()) are not
+    sorted again.
+    """
+
+    def __init__(self, t_stop_names, values, offsets, institute_apparatus=False):
+        self.t_stop_names = list(t_stop_names)
+        self.values = values
+        self.offsets = offsets
+        self.institute_apparatus = institute_apparatus
+
+    @classmethod
+    def from_arrays(cls, t_stop_names, temperatures, intensities, institute_apparatus=False):
+        """
+        :param t_stop_names: List of T_stop names
+        :param temperatures: List of temperature arrays (one for each T_stop)
+        :param intensities: List of intensity arrays (one for each T_stop)
+        :param institute_apparatus: True/False if data came from INTiBS (Only for chart title)
+        :return: SpectrumSet
+        """
+        temperatures = [np.asarray(temperature, dtype=float) for temperature in temperatures]
+        intensities = [np.asarray(intensity, dtype=float) for intensity in intensities]
+        kept = [~(np.isnan(temperature) & np.isnan(intensity))
+                for temperature, intensity in zip(temperatures, intensities)]
+        lengths = [int(np.count_nonzero(rows)) for rows in kept]
+        offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+
+        values = np.empty((offsets[-1], 2))
+        for start, stop, temperature, intensity, rows in zip(offsets[:-1], offsets[1:], temperatures, intensities,
+                                                            kept):
+            temperature = temperature[rows]
+            intensity = intensity[rows]
+            order = SpectrumSet.sort_order(temperature)
+            if order is not None:
+                temperature = temperature[order]
+                intensity = intensity[order]
+            values[start:stop, 0] = temperature
+            values[start:stop, 1] = intensity
+
+        return cls(t_stop_names, values, offsets, institute_apparatus)
+
+    @classmethod
+    def load(cls, path):
+        """
+        :param path: Path to Data_set.npz file
+        :return: SpectrumSet
+        """
+        t_stop_names, spectra, institute_apparatus = load_data_set_file(path)
+        return cls.from_arrays(t_stop_names, [temperature for temperature, _ in spectra],
+                               [intensity for _, intensity in spectra], institute_apparatus)
+
+    @staticmethod
+    def sort_order(temperature):
+        """
+        :param temperature: Array with temperatures
+        :return: Indexes sorting temperatures like pandas sort_values (NaN at the end), None if already sorted
+        """
+        missing = np.isnan(temperature)
+        if not missing.any() and np.all(temperature[1:] >= temperature[:-1]):
+            return None
+        indexes = np.arange(len(temperature))
+        present = indexes[~missing]
+        return np.concatenate((present[temperature[~missing].argsort(kind='quicksort')], indexes[missing]))
+
+    def save(self, path):
+        """
+        Saves spectra in Data_set.npz format (see save_data_set_file)
+        :param path: Path to new .npz file
+        """
+        save_data_set_file(path, self.t_stop_names, [spectrum.temperature for spectrum in self],
+                           [spectrum.intensity for spectrum in self], self.institute_apparatus)
+
+    def __len__(self):
+        return len(self.t_stop_names)
+
+    def __getitem__(self, index):
+        return Spectrum(self.t_stop_names[index], self.values[self.offsets[index]:self.offsets[index + 1]])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def data_frames(self):
+        """
+        :return: List of DataFrames ('Temp', 'Int') for each T_stop sharing memory with the spectrum set
+        """
+        return [spectrum.data_frame() for spectrum in self]
@@ -0,0 +1,231 @@
+import os
+import time
+import queue
+import threading
+from graph_analysis import CreatingFormatToAnalysis
+from file_organization import MeasurementFilesIndex, DividingRawDataToFolders, IngestManifest
+from plot_charts import PlotChart
+from result_cache import ResultCache
+from pipeline import analyse_spectra, create_summary_data_frame, extracted_spectrum_set, load_analysed_spectra, \
+    save_analysed_spectra, ANALYSIS_PARAMETERS
+
+
+class FolderWatcher:
+    """
+    Long-running mode that analyses INTiBS measurements while they are saved by the INTiBS software.
+
+    The folder is checked every poll_interval seconds. When all measurement files are complete (their size and
+    modification time did not change since the previous check and for at least settle_time seconds) and every PMT file
+    has its Heater_measured file, the update is put into a queue. The worker thread then extracts only new files
+    (incremental extraction) and analyses only new T_stops of each sub folder (Sequence_position / Irradiation). Results
+    of the other T_stops are kept from the previous update (analysed_spectra.pkl next to Data_set.npz), so they are
+    merged into summary_data_frame.xlsx and the summary chart saved into the 'Live' folder of the sub folder.
+
+    The queue is bounded: when an update is waiting already, new ones are not added, because one incremental update
+    takes all new files anyway. A failed update is not repeated until the files change, a sub folder whose analysis
+    failed is analysed again only when its Data_set file changes (new T_stops).
+    """
+
+    def __init__(self, folder_path, first_pmt, first_heat, heat_rate, poll_interval=5.0, settle_time=2.0,
+                 max_queue=1, time_alignment=None, cache=None, workers=1, parameters=None, callback=print):
+        """
+        :param folder_path: Folder with INTiBS measurement files
+        :param first_pmt: Number of first PMT file that contains the intensity data
+        :param first_heat: Number of first heat file that contains the temperature data corresponds to the first PMT
+        :param heat_rate: Heating rate used in the measurement
+        :param poll_interval: Time between checks of the folder [s]
+        :param settle_time: Time without changes after which the file is complete [s]
+        :param max_queue: Max number of updates waiting for the worker
+        :param time_alignment: TimeAlignment of PMT and heater data (None -> equal timestamps only)
+        :param cache: ResultCache or None
+        :param workers: Number of processes analysing spectra
+        :param parameters: Changed values of ANALYSIS_PARAMETERS (e.g., {'smoothing': 'chebyshev'})
+        :param callback: Function called with text messages (new results, errors)
+        """
+        self.folder_path = folder_path
+        self.first_pmt = int(first_pmt)
+        self.first_heat = int(first_heat)
+        self.heat_rate = float(heat_rate)
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.time_alignment = time_alignment
+        self.cache = cache
+        self.workers = workers
+        self.parameters = dict(ANALYSIS_PARAMETERS, **(parameters or {}))
+        self.callback = callback
+
+        self.updates = queue.Queue(maxsize=max_queue)
+        self.stop_event = threading.Event()
+        self.previous_snapshot = {}
+        self.lock = threading.Lock()  # queued_snapshot and failed_snapshot are used by the poll and worker threads
+        self.queued_snapshot = None  # Files of the last queued update
+        self.failed_snapshot = None  # Files of the last failed update
+        self.failed_data_sets = {}  # Sub folders with failed analysis: {path to Data_set.npz: data_set_state}
+        self.summary_data_frames = {}  # Live summary of each sub folder: {path to Data_set.npz: DataFrame}
+
+    def snapshot(self):
+        """
+        :return: {file name: (size, mtime)} of measurement files (names starting with the file number)
+        """
+        files = {}
+        for entry in os.scandir(self.folder_path):
+            if entry.is_file() and entry.name[:4].isdigit():
+                stat = entry.stat()
+                files[entry.name] = (stat.st_size, stat.st_mtime)
+        return files
+
+    def is_ready(self, snapshot):
+        """
+        :param snapshot: Actual snapshot of the folder
+        :return: True if all files are complete and every PMT file has its Heater_measured file
+        """
+        if snapshot != self.previous_snapshot:
+            return False
+        now = time.time()
+        if any(now - mtime < self.settle_time for _, mtime in snapshot.values()):
+            return False
+
+        files_index = MeasurementFilesIndex(list(snapshot))
+        pmt_files = [number for number in files_index.by_type['PMT'] if number >= self.first_pmt]
+        if not pmt_files:
+            return False
+        step_between_pmt_hm = self.first_heat - self.first_pmt
+        return all(number + step_between_pmt_hm in files_index.by_number for number in pmt_files)
+
+    def poll(self):
+        """
+        Checks the folder once and queues the update if there are new complete files
+        :return: True if the update was queued
+        """
+        snapshot = self.snapshot()
+        ready = self.is_ready(snapshot)
+        self.previous_snapshot = snapshot
+        with self.lock:
+            if not ready or snapshot == self.queued_snapshot or snapshot == self.failed_snapshot:
+                return False
+            try:
+                self.updates.put_nowait(snapshot)
+            except queue.Full:
+                return False
+            self.queued_snapshot = snapshot
+        return True
+
+    @staticmethod
+    def data_set_state(data_set_path):
+        """
+        :return: (size, mtime) of the Data_set file
+        """
+        stat = os.stat(data_set_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def update(self):
+        """
+        Incremental extraction and analysis of the folder. Every sub folder with new files is updated, sub folders
+        extracted before the watcher was started get their live summary in the first update.
+        :return: List of new T_stop names
+        """
+        manifest = IngestManifest(self.folder_path)
+        new_data = DividingRawDataToFolders(self.folder_path, self.time_alignment)
+        new_data.divide_data_TO_folders_sequence_position(self.first_pmt, self.first_heat, False, manifest)
+
+        data_sets = {}  # {path to Data_set.npz: SpectrumSet}
+        for path in new_data.paths_to_sub_folders:
+            data_set_path = os.path.dirname(path) + '/Data_set.npz'
+            data_sets[data_set_path] = extracted_spectrum_set(new_data, path)
+            data_sets[data_set_path].save(data_set_path)
+        manifest.save()  # After Data_set files are saved
+
+        for combine_path in manifest.combine_paths():
+            data_set_path = combine_path + '/Data_set.npz'
+            if data_set_path not in data_sets and data_set_path not in self.summary_data_frames and \
+                    os.path.exists(data_set_path) and \
+                    self.failed_data_sets.get(data_set_path) != self.data_set_state(data_set_path):
+                data_sets[data_set_path] = CreatingFormatToAnalysis(data_set_path).spectra
+
+        new_t_stops = []
+        for data_set_path, spectra in data_sets.items():
+            try:
+                new_t_stops += self.update_data_set(data_set_path, spectra)
+            except Exception as error:  # The other sub folders are still updated
+                self.failed_data_sets[data_set_path] = self.data_set_state(data_set_path)
+                sub_folder = os.path.relpath(os.path.dirname(data_set_path), self.folder_path)
+                self.callback(f'{sub_folder} analysis failed ({error}), waiting for new T_stops')
+            else:
+                self.failed_data_sets.pop(data_set_path, None)
+        return new_t_stops
+
+    def update_data_set(self, data_set_path, spectra):
+        """
+        Analyses T_stops of the sub folder that were not analysed before and saves its live summary
+        :param data_set_path: Path to Data_set.npz of the sub folder
+        :param spectra: SpectrumSet with all T_stops of the sub folder
+        :return: List of new T_stop names
+        """
+        live_path = os.path.dirname(data_set_path) + '/Live'
+        irm_path = live_path + '/IRM_results'
+        os.makedirs(irm_path, exist_ok=True)
+
+        data_frames = spectra.data_frames()
+        previous_results = load_analysed_spectra(data_set_path)
+        results = analyse_spectra(data_frames, spectra.t_stop_names, spectra.institute_apparatus, irm_path,
+                                  self.workers, self.cache, self.parameters, previous_results=previous_results)
+        save_analysed_spectra(data_set_path, spectra, results, self.parameters)
+
+        summary_data_frame = create_summary_data_frame(results, self.heat_rate)
+        summary_data_frame.to_excel(live_path + '/summary_data_frame.xlsx')
+        PlotChart(live_path).t_max_stop_energy(list(summary_data_frame['T_stop (value)']),
+                                               [result.t_max for result in results],
+                                               [result.energy for result in results])
+        self.summary_data_frames[data_set_path] = summary_data_frame
+
+        sub_folder = os.path.relpath(os.path.dirname(data_set_path), self.folder_path)
+        new_t_stops = []
+        for data_frame, result in zip(data_frames, results):
+            if ResultCache.key(data_frame, self.parameters) not in previous_results:
+                new_t_stops.append(result.t_stop)
+                self.callback(f'{sub_folder} {result.t_stop}: T_max = {result.t_max:.2f} [°C], '
+                              f'E = {result.energy:.3f} +/- {result.uncertain_energy:.3f} [eV]')
+        return new_t_stops
+
+    def worker(self):
+        """
+        Worker thread: runs queued updates until stop() is called and the queue is empty
+        """
+        while True:
+            try:
+                snapshot = self.updates.get(timeout=0.5)
+            except queue.Empty:
+                if self.stop_event.is_set():
+                    return
+                continue
+            try:
+                self.update()
+            except Exception as error:  # Files can be changed during extraction, the update is repeated after a change
+                self.callback(f'Update failed ({error}), waiting for the next change')
+                with self.lock:
+                    self.failed_snapshot = snapshot
+            finally:
+                self.updates.task_done()
+
+    def run(self, duration=None):
+        """
+        Watches the folder until stop() is called (or for duration seconds)
+        :param duration: Time of watching [s], None -> until stop() or KeyboardInterrupt
+        """
+        worker_thread = threading.Thread(target=self.worker, daemon=True)
+        worker_thread.start()
+        start = time.monotonic()
+        try:
+            while not self.stop_event.is_set():
+                self.poll()
+                if duration is not None and time.monotonic() - start >= duration:
+                    break
+                self.stop_event.wait(self.poll_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            worker_thread.join()
+
+    def stop(self):
+        self.stop_event.set()
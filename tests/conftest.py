@@ -0,0 +1,48 @@
+import os
+import sys
+import warnings
+import matplotlib
+import numpy as np
+import pytest
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules are run from the code folder (like main.py and cli.py)
+sys.path.insert(0, os.path.join(ROOT_FOLDER, 'code'))
+matplotlib.use('Agg')
+warnings.filterwarnings('ignore', category=RuntimeWarning)
+
+
+@pytest.fixture(scope='session')
+def example_data_set():
+    """
+    :return: Path to Data_set.xlsx from the Example folder (18 T_stop spectra)
+    """
+    return os.path.join(ROOT_FOLDER, 'Example', 'Data_set.xlsx')
+
+
+@pytest.fixture(scope='session')
+def example_data_frames(example_data_set):
+    """
+    :return: DataFrames with 'Temp' and 'Int' columns of Example/Data_set.xlsx spectra (shared, not to be changed)
+    """
+    from graph_analysis import CreatingFormatToAnalysis
+    return CreatingFormatToAnalysis(example_data_set).final_data_frames
+
+
+@pytest.fixture(scope='session')
+def generated_spectra():
+    """
+    :return: DataFrames of synthetic Tmax-Tstop series (one and two peaks, both kinetics orders, from 60 to 5000
+    points, also sparser than the 2 °C windows) and the true T_max of each spectrum (shared, not to be changed)
+    """
+    from glow_curve import GlowPeak, GlowCurveGenerator
+    series = [(['0.9:1e11:1000:1'], 60), (['0.9:1e11:1000:1', '1.1:1e11:600:2'], 500), (['1.2:1e12:800:2'], 2000),
+              (['0.9:1e11:1000:1', '1.1:1e11:600:2'], 3000), (['0.9:1e11:1000:1'], 5000)]
+    data_frames, t_maxes = [], []
+    for seed, (peaks, points) in enumerate(series):
+        generator = GlowCurveGenerator([GlowPeak.from_string(peak) for peak in peaks], points=points, seed=seed)
+        _, series_data_frames, truths = generator.tmax_tstop_series(np.linspace(30, 110, 4))
+        data_frames += series_data_frames
+        t_maxes += [truth['t_max'] for truth in truths]
+    return data_frames, t_maxes
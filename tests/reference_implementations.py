@@ -0,0 +1,494 @@
+"""
+Implementations from before the optimizations (DataFrame and loop versions), kept only to check that the optimized code
+gives the same results
+"""
+import numpy as np
+import pandas as pd
+
+
+def reference_mean_points(data_frame):
+    """
+    Mean points of PlotAnalysis.mean_of_intensity_points before mean_in_temperature_windows (one mask for each 2 °C
+    window), kept to check the one-pass binning
+    :return: Array with window centers, array with mean intensities
+    """
+    min_temperature = data_frame['Temp'].min()
+    max_temperature = data_frame['Temp'].max()
+
+    temp_range = np.arange(min_temperature, max_temperature + 1, dtype=int)
+
+    mean_intensity_points = []  # Mean Int Points
+    mean_temp_points = []  # Mean Temp points
+
+    for start, stop in list(
+            zip(range(temp_range[0], temp_range.max() + 2, 2), range(temp_range[1], temp_range.max() + 2, 2))):
+        intensities_in_temperature = data_frame[(data_frame['Temp'] >= start) & (data_frame['Temp'] < stop)]
+        mean_intensity = intensities_in_temperature['Int'].mean()
+        if np.isnan(mean_intensity):
+            continue
+        mean_intensity_points.append(mean_intensity)
+        mean_temp_points.append(np.mean([start, stop]))
+
+    df = pd.DataFrame({'Temp': mean_temp_points, 'Int': mean_intensity_points}).sort_values(by='Temp')
+    return df['Temp'].to_numpy(), df['Int'].to_numpy()
+
+
+def reference_peak_finder(data_frame, mean_df, fitted_df, dp=3, dn=5):
+    """
+    PlotAnalysis.peak_finder before find_t_max (DataFrame-based diff_anomaly and shelf_anomaly), kept to check that
+    the array version finds the same T_max
+    :return: T_max, Int_max, AlgoCode
+    """
+    def delta_plus_or_minus(data):
+        """
+        If there are values less than 0 in the entire expected range, then we have a peak between the maximum
+        value and the starting point => delta will be negative
+
+        DP => Clear peak between MaxIntensity and the starting point
+        DN => Growing function that can have a suspected flattened interval.
+
+        :param data: DataFrame
+        :return: Improved DataFrame with new columns
+        """
+
+        minus_indexes_mean = data[data['diff_Int_mean'] < 0]
+        minus_indexes_fit = data[data['diff_Int_fit'] < 0]
+        delta_value = False
+
+        if len(minus_indexes_mean) > 0:
+            if len(minus_indexes_fit) > 0:
+                delta_value = True
+
+        return delta_value
+
+    def diff_anomaly(data_version):
+        """
+        Calculate the difference between mean_intensity and over_fitted_value.
+        Also adds a new columns divOT ( T - 10% between points, O-no difference)
+        :param data_version: DataFrame to improve
+        :return: Data
+        """
+
+        # Delete the lowest values
+        data_version['c'] = pd.cut(data_version['Int_mean'], 7)  # 14%
+        drop_range_1 = data_version['c'].unique()[0]
+
+        # Create % difference between mean and over_fitted values
+        data_to_divide_1 = list(data_version['diff_Int_mean'])
+        data_to_divide_2 = data_to_divide_1.copy()[1:]
+        data_to_divide_2.append(0)
+
+        data_div = pd.DataFrame({'x': data_to_divide_1, 'y': data_to_divide_2})
+        data_div['div%'] = abs(data_div['y']) / data_div['x'] * 100
+        data_version['div%_mean'] = list(data_div['div%'])
+
+        # divOT_mean information to finding shelf's
+        data_version = data_version[data_version['c'] != drop_range_1].copy()
+        data_version['divOT_mean'] = data_version['div%_mean'].apply(lambda x: 'T' if x <= 10 else 'O')
+
+        # divOT_fit (like in divOT_mean)
+        data_to_divide_1 = list(data_version['diff_Int_fit'])
+        data_to_divide_2 = data_to_divide_1.copy()[1:]
+        data_to_divide_2.append(0)
+
+        data_div = pd.DataFrame({'x': data_to_divide_1, 'y': data_to_divide_2})
+        data_div['div%_fit'] = abs(data_div['y']) / data_div['x'] * 100
+        data_version['div%_fit'] = list(data_div['div%_fit'])
+        data_version['divOT_fit'] = data_version['div%_fit'].apply(lambda x: 'T' if x <= 10 else 'O')
+
+        return data_version
+
+    def shelf_anomaly(data, n):
+        """
+        Check if there is a shelf. If number of T repeats n times in series, then there is a shelf.
+        :param data: DataFrame with OT values
+        :param n: n times repeats
+        :return: Final temperature and (AlgoCode only for me)
+        """
+
+        code_number = 0
+        max_index_shelf_anomaly = data.index[-1]
+
+        data_with_T_shelf_anomaly = data[data['divOT_mean'] == 'T'].index
+        for index_T_shelf_anomaly in data_with_T_shelf_anomaly:
+            if index_T_shelf_anomaly + 4 > max_index_shelf_anomaly:
+                final_tmax_shelf_anomaly = data['Temp'][max_index_shelf_anomaly].copy()
+                break
+            else:
+                data_set_suspect_shelf_anomaly = data.loc[index_T_shelf_anomaly:index_T_shelf_anomaly + n + 1,
+                                                          :].copy()  # n=3 , N=5
+
+                num_of_T_shelf_anomaly = len(
+                    data_set_suspect_shelf_anomaly[data_set_suspect_shelf_anomaly['divOT_mean'] == 'T'])
+                # n+2, Example n=3 -> N=5 ->3/5
+                if num_of_T_shelf_anomaly >= n:
+                    final_tmax_shelf_anomaly = data_set_suspect_shelf_anomaly.sort_values(by=['diff_Int_fit'])
+                    final_tmax_shelf_anomaly = final_tmax_shelf_anomaly.reset_index()['Temp'][0]
+                    break
+                else:
+                    code_number += 1
+
+        return [final_tmax_shelf_anomaly, code_number]
+
+    def fit(t_max, code):
+        """
+        Calculate T_max and Int_max by fitting using the quadratic function
+        :param t_max: predicted T_max
+        :param code: Information (nothing important)
+        :return: T_max, Int_max
+        """
+        data = data_frame.reset_index(drop=True)
+        shift_number = code.split('-')[-1]
+        T_min = data['Temp'].min()
+        T_max = data['Temp'].max()
+        T_diff = T_max - T_min
+        T_8 = (8 * T_diff) / 100
+        delta_t = T_8 / 2
+        t_suspend = float(t_max)
+
+        # Fitting interval
+        if shift_number == '0' or shift_number == 'DPFM':
+            left_t = t_suspend - delta_t
+            right_t = t_suspend + delta_t
+        else:
+            left_t = t_suspend - (delta_t + float(shift_number))
+            right_t = t_suspend + delta_t
+
+        data_to_fit = data[(data['Temp'] >= left_t) & (data['Temp'] <= right_t)].copy()
+
+        # Creating fitting function
+        temp_points = data_to_fit['Temp']
+        coeff = np.polyfit(data_to_fit['Temp'], data_to_fit['Int'], 2)
+        polynomial_equation = np.poly1d(coeff)
+        fitted_intensity = [polynomial_equation(t) for t in temp_points]
+
+        data_fitted = pd.DataFrame({'Temp': temp_points, 'Int': fitted_intensity})
+        data_fitted = data_fitted.sort_values(by='Temp')
+
+        int_max = data_fitted[data_fitted['Int'] == data_fitted['Int'].max()].index[0]
+        T_fit = data_fitted.loc[int_max]['Temp']
+        I_fit = data_fitted.loc[int_max]['Int']
+
+        return T_fit, I_fit
+
+    # Main algorythm function
+
+    df_fitted = fitted_df
+    df_mean = mean_df
+
+    df_fitted = df_fitted.rename(columns={'Int': 'Int_fit'})
+    df_mean = df_mean.rename(columns={'Int': 'Int_mean'})
+
+    max_int = df_mean['Int_mean'].max()
+    index_max_int = df_mean[df_mean['Int_mean'] == max_int].index[0]
+    suspended_area = df_mean.iloc[:index_max_int + 1, :].copy()
+    suspended_area['Int_fit'] = df_fitted.loc[:index_max_int + 1, 'Int_fit']
+
+    alg_code = "None"
+    # Starts analysis if more than 10 data points otherwise T_max calculated by (DataFrame.max())
+    if len(suspended_area) <= 10:
+        final_tmax = suspended_area[suspended_area['Int_mean'] == max_int]['Temp']
+        alg_code = 'FM'  # First_max
+    else:
+        # Calculate difference between intensity values (mean_intensity and over_fitted)
+        suspended_area['diff_Int_mean'] = suspended_area['Int_mean'].diff()
+        suspended_area['diff_Int_fit'] = suspended_area['Int_fit'].diff()
+        suspended_area.fillna(0, inplace=True)
+
+        # New data_set that checked the anomaly
+        data_set = diff_anomaly(suspended_area)
+
+        # Estimating the DeltaPositive or Negative
+        minus_indexes = delta_plus_or_minus(data_set)
+
+        # Delta Positive (peak between max int and starting point)
+        if minus_indexes is False:
+            # Check if there is the shelf
+            divOT_mean = list(data_set['divOT_mean'])[:-1]
+            divOT_fit = list(data_set['divOT_fit'])[:-1]
+            divOT_fusion = divOT_mean + divOT_fit
+            # If there is no T (look at shelf anomaly for more details)
+            if 'T' not in divOT_fusion:
+                final_tmax = data_set[data_set['Int_mean'] == max_int]['Temp']
+                alg_code = 'DPFM'  # Delta-Positive-First-Max
+            else:
+                final_tmax_ = shelf_anomaly(data_set, dp)  # DP=3
+                final_tmax = final_tmax_[0]
+                code_n = final_tmax_[1]
+                alg_code = f'DP-{dp}-{code_n}'
+
+        # Delta Negative (No peak, checking for shelf)
+        else:
+
+            max_index = data_set.index[-1]
+            data_with_T = data_set[data_set['divOT_fit'] == 'T'].index
+
+            minus_code = 0
+            for index_T in data_with_T:
+
+                # When T is at the end of data set
+                if index_T + 4 > max_index:
+                    final_tmax = data_set.loc[index_T, 'Temp']
+                    alg_code = f'DN-FM-{minus_code}'  # Delta negative
+                    break
+
+                # T in the middle of dataset
+                else:
+                    suspected_shelf = data_set.loc[:index_T, :].copy()
+                    suspected_shelf_temp = suspected_shelf.loc[index_T, 'Temp']
+                    suspected_temp = shelf_anomaly(suspected_shelf, dn)  # 5
+
+                    if suspected_temp[0] != suspected_shelf_temp:
+                        final_tmax = suspected_temp[0]
+                        alg_code = f'DN-{dn}-SS-{minus_code}-{suspected_temp[1]}'
+                        break
+                    else:
+                        # Checking if T is continuously in next 3
+                        data_set_suspect_shelf = data_set.loc[index_T:index_T + 3, :].copy()  # 4
+                        num_of_T = len(data_set_suspect_shelf[data_set_suspect_shelf['divOT_fit'] == 'T'])
+                        if num_of_T >= 3:
+                            final_tmax = data_set.loc[index_T, 'Temp']
+                            alg_code = f'DN-{dn}-{minus_code}'
+                            break
+                        else:
+                            minus_code += 1
+
+    t_M, i_M = fit(final_tmax, alg_code)
+
+    return t_M, i_M, alg_code
+
+
+def reference_blind_fit(mean_points_blind_function):
+    """
+    blind_fit of InitialRise before blind_fit_curves (one DataFrame for each linear function), kept to check the
+    residual matrix version. The algorithm:
+
+    1. Determine all possible linear functions on a given interval
+    2. Fit these functions and calculate residuals
+    3. Create a DataFrame containing columns-- first: number of data taking part in fitting,
+    selected: data size with residues less or equal 0.1
+    4. Create 'p' parameter which is a fraction of p = selected/len(all_data) => Fraction of significant data
+    5. Create a difference between p values
+    6. The p value will be increasing all the time because every next fitting line is more accurate than
+    the previous one. However, when the fitted line has an L-shape we will observe a decreasing trend
+    which means that we should take this ‘p’ value.
+
+    :param mean_points_blind_function: Mean transformed data points
+    :return: slope and intercept of linear fitting
+    """
+
+    # Specify data length, max and min points in function
+    data_l = len(mean_points_blind_function) - 1
+    max_kT_value = mean_points_blind_function['1/kT'].loc[data_l]
+    min_kT_value = mean_points_blind_function['1/kT'].loc[0]
+    min_ln_value = mean_points_blind_function['ln(I)'].loc[0]
+
+    kT_range = np.linspace(min_kT_value, max_kT_value, data_l)
+    kT_range = kT_range[::-1]
+
+    diff_sum = []
+    a_values = []
+    b_values = []
+    kT_values = []
+
+    data_length = []
+    data_under1 = []
+
+    # Checking all possible linear functions for each linear function
+    # Calculate data length and residua
+    for x_2 in kT_range:
+
+        y_2 = mean_points_blind_function['ln(I)'].max()
+        y_1 = mean_points_blind_function['ln(I)'].min()
+        x_1 = mean_points_blind_function['1/kT'].min()
+
+        if x_1 == x_2:
+            continue
+
+        a = abs((y_2 - y_1) / (x_2 - x_1))
+        b = y_2 - (-a) * x_1
+
+        original = mean_points_blind_function.copy()
+
+        fitted = [-a * x + b for x in original['1/kT']]
+        df_fitted = pd.DataFrame(fitted, columns=['fitted'])
+        original = pd.concat([original, df_fitted], axis=1)
+        original['diff'] = abs(original['ln(I)'] - original['fitted'])
+
+        original = original[original['fitted'] > min_ln_value].copy()
+
+        data_all = len(original)
+        data_under = len(original[original['diff'] <= 0.1])
+
+        data_length.append(data_all)
+        data_under1.append(data_under)
+
+        diff_sum.append(original['diff'].sum())
+        a_values.append(a)
+        b_values.append(b)
+        kT_values.append(x_2)
+
+
+    # Data Frame with summary values
+    data_length_result = pd.DataFrame({'first': data_length, 'selected': data_under1,
+                                       'a': a_values, 'b': b_values, 'kT': kT_values,
+                                       'sum_error': diff_sum})
+    data_length_result['p'] = data_length_result['selected'] / len(kT_range)
+
+    data_length_result['p_diff'] = data_length_result['p'].diff()
+
+    max_value = data_length_result['p'].max()
+    max_p_index = data_length_result[data_length_result['p'] == max_value].index[0]
+
+    index_count = 0
+    for p_diff in data_length_result['p_diff']:
+        if p_diff < 0 and index_count < max_p_index:
+            max_value_supp = data_length_result['p'].loc[index_count - 1]
+            if max_value_supp > 0.05:
+                max_value = data_length_result['p'].loc[index_count - 1]
+                break
+        index_count += 1
+
+    highest_data = data_length_result[data_length_result['p'] == max_value].copy()
+    e_value = highest_data['a']
+
+    # Checking the optimal values
+    if len(highest_data) == 1:
+        max_value_up = max_value + 0.05
+        data_length_result = data_length_result[
+            (data_length_result['p'] <= max_value_up) & (data_length_result['p'] >= max_value)].copy()
+        min_error = data_length_result['sum_error'].min()
+        e_value = data_length_result[data_length_result['sum_error'] == min_error]['a']
+        b = data_length_result[data_length_result['sum_error'] == min_error]['b']
+        b_F = b.values[0]
+        a_F = e_value.values[0]
+        cof = [a_F, b_F]
+        return cof
+
+    else:
+        result_matrix = pd.DataFrame({'kT': kT_values, 'sum_error': diff_sum,
+                                      'a': a_values, 'b': b_values})
+
+        result_matrix = result_matrix[result_matrix['sum_error'] > 0].copy()
+        result_matrix = result_matrix[result_matrix['a'].isin(e_value.values)]
+        min_error = result_matrix['sum_error'].min()
+        e_value = result_matrix[result_matrix['sum_error'] == min_error]['a']
+        b_v = result_matrix[result_matrix['sum_error'] == min_error]['b']
+        a_F = e_value.values[0]
+        b_F = b_v.values[0]
+        cof = [a_F, b_F]
+        return cof
+
+
+class ReferenceInitialRise:
+    """
+    InitialRise before InitialRiseBatch (DataFrames of one spectrum), kept to check the batch version
+    """
+
+    def __init__(self, data, t_max):
+        self.k = 8.617333262145E-5  # Boltzmann constant [eV/K]
+
+        # Selecting data lower than T_max and transform data to log(I) and 1/kT
+        data = data.drop_duplicates()
+        data = data[data['Temp'] <= t_max].copy()
+        data.reset_index(drop=True, inplace=True)
+
+        raw_data = data.copy()
+        raw_data = raw_data[raw_data['Int'] > 1]  # Bo log
+        raw_data['1/kT'] = 1 / ((raw_data['Temp'] + 273.15) * self.k)
+        raw_data['ln(I)'] = np.log(raw_data['Int'])
+        raw_data['round_temp'] = round(raw_data['Temp'])
+        self.raw_data = raw_data
+
+        data_median = pd.DataFrame(raw_data.groupby(by='round_temp').median()['Int'])
+        data_median.reset_index(inplace=True)
+        data_median['1/kT'] = 1 / ((data_median['round_temp'] + 273.15) * self.k)
+        data_median['ln(I)'] = np.log(data_median['Int'])
+        self.data_median = data_median
+
+        # Data above 15% of max value
+
+        i_min = data_median['Int'].min()
+        i_max = data_median['Int'].max()
+        i_value = (i_max - i_min) * 0.15 + i_min
+
+        data_int_15 = raw_data[raw_data['Int'] <= i_value].copy()
+        data_int_15.reset_index(drop=True, inplace=True)
+
+        mean_points_chosen = data_median[data_median['Int'] <= i_value].copy()
+        mean_points_chosen.sort_values(by='round_temp', inplace=True)
+        mean_points_chosen.reset_index(drop=True, inplace=True)
+
+        self.mean_points_chosen = mean_points_chosen
+
+        def linear_function(x, a, b):
+            return a * x + b
+
+        def linear_fit_r2(data_frame):
+            """
+            A method that returns covariance matrix, r2, slope and the intercept
+            :param data_frame: DataFrame with values to calculate.
+            :return: r2, a, b, u(a)
+            """
+            results = data_frame.copy()
+
+            lin_cof, cov_matrix = np.polyfit(data_frame['1/kT'], data_frame['ln(I)'], 1, cov=True)
+            cov = np.sqrt(cov_matrix[0][0])
+
+            linear_equation = np.poly1d(lin_cof)
+            fitted_linear = [linear_equation(t) for t in data_frame['1/kT']]
+            results['fitted'] = fitted_linear
+
+            RSS = np.sum(np.square(results['ln(I)'] - results['fitted']))
+            TSS = np.sum(np.square(results['ln(I)'] - results['fitted'].mean()))
+
+            r2 = 1 - RSS / TSS
+            return r2, lin_cof[0], lin_cof[1], cov
+
+        # Finding blind coefficient for fitting function
+        cof_blind = reference_blind_fit(mean_points_chosen)
+        a_blind, b_blind = cof_blind[0], cof_blind[1]
+        fitted_blind = [linear_function(x, -a_blind, b_blind) for x in mean_points_chosen['1/kT']]
+
+        data_frame_fitted_blind = pd.DataFrame(
+            {'1/kT': mean_points_chosen['1/kT'], 'ln(I)': mean_points_chosen['ln(I)'], 'fitted_blind': fitted_blind})
+        data_frame_fitted_blind = data_frame_fitted_blind[data_frame_fitted_blind['fitted_blind'] > 0].copy()
+        data_frame_fitted_blind['perc'] = data_frame_fitted_blind['fitted_blind'] / data_frame_fitted_blind[
+            'ln(I)'] * 100
+        data_frame_chosen_from_blind = data_frame_fitted_blind[data_frame_fitted_blind['perc'] >= 90].copy()
+
+        if len(data_frame_chosen_from_blind) > 2:
+            r2_chosen, a_chosen, b_chosen, uncertain_a = linear_fit_r2(data_frame_chosen_from_blind)
+
+            a_mean = (a_chosen + (-a_blind)) / 2
+            b_mean = (b_chosen + b_blind) / 2
+            fitted_mean = [linear_function(x, a_mean, b_mean) for x in data_frame_chosen_from_blind['1/kT']]
+            x_line = data_frame_chosen_from_blind
+
+        else:
+            r2_chosen, a_chosen, b_chosen, uncertain_a = linear_fit_r2(data_frame_fitted_blind)
+            a_mean = (a_chosen + (-a_blind)) / 2
+            b_mean = (b_chosen + b_blind) / 2
+            fitted_mean = [linear_function(x, a_mean, b_mean) for x in data_frame_fitted_blind['1/kT']]
+            x_line = data_frame_fitted_blind
+
+        self.a_uncertain = uncertain_a
+        self.e = - a_mean
+        self.x_line = x_line
+        self.y_line = fitted_mean
+
+
+def reference_read_intibs_file(path, header_length):
+    """
+    INTiBS measurement file parsed like in DividingRawDataToFolders before INTiBSMeasurementFile (pd.read_table of the
+    whole file, the numbers split from text rows)
+    :return: List of header lines, list of times, list of last column values
+    """
+    data_table = pd.read_table(path, header=None, skip_blank_lines=True)
+    header = [str(line) for line in data_table.iloc[:header_length, 0]]
+    time = []
+    values = []
+    for data in data_table.iloc[header_length:, 0]:
+        time.append(float(str(data).split(',')[0]))
+        values.append(float(str(data).split(',')[-1]))
+    return header, time, values
@@ -0,0 +1,34 @@
+import json
+import numpy as np
+import benchmark
+from spectrum_set import SpectrumSet
+from glow_curve import GlowPeak, GlowCurveGenerator
+
+
+def test_benchmark_times_every_stage(tmp_path):
+    output_path = tmp_path / 'benchmark.json'
+    benchmark.main(['--sizes', '400', '--spectra', '3', '--work-folder', str(tmp_path), '--output', str(output_path)])
+
+    with open(output_path, encoding='utf-8') as output_file:
+        report = json.load(output_file)
+    timings = report['sizes'][0]['timings']
+    assert list(timings) == list(benchmark.STAGES)
+    assert all(seconds > 0 for seconds in timings.values())
+    assert (tmp_path / 'points_400' / 'Data_set.xlsx').exists()
+
+
+def test_extracted_intibs_folder_has_generated_spectra(tmp_path):
+    generator = GlowCurveGenerator([GlowPeak(0.9, 1e11)], points=300, seed=1)
+    t_stops = [30.0, 50.0, 70.0]
+    _, data_frames, _ = generator.tmax_tstop_series(t_stops)
+    benchmark.write_intibs_folder(str(tmp_path), t_stops, data_frames, 0.5)
+
+    new_data = benchmark.DividingRawDataToFolders(str(tmp_path))
+    new_data.divide_data_TO_folders_sequence_position(benchmark.FIRST_PMT, benchmark.FIRST_HEAT, save_excel=False)
+    new_data.create_data_set_file()
+
+    spectra = SpectrumSet.load(str(tmp_path) + '/Sequence_position_1/Irradiation_1/Data_set.npz')
+    assert spectra.t_stop_names == ['T_stop: 30', 'T_stop: 50', 'T_stop: 70']
+    for extracted, generated in zip(spectra.data_frames(), data_frames):
+        np.testing.assert_allclose(np.sort(extracted['Temp']), np.sort(generated['Temp']), rtol=1e-9)
+        np.testing.assert_allclose(np.sort(extracted['Int']), np.sort(generated['Int']), rtol=1e-9)
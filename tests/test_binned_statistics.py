@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+from binned_statistics import SortedBins
+from graph_analysis import CreatingFormatToAnalysis, mean_in_temperature_windows
+
+
+@pytest.fixture(params=['sorted', 'unsorted'])
+def binned_values(request):
+    """
+    :return: Bins (some empty, sizes around powers of two), values, number of bins
+    """
+    random = np.random.default_rng(4)
+    counts = np.array([1, 2, 3, 4, 5, 0, 7, 8, 9, 16, 17, 0, 31, 32, 33, 100])
+    bins = np.repeat(np.arange(len(counts)), counts)
+    values = np.round(random.normal(100, 20, len(bins)))  # Repeated values too
+    if request.param == 'unsorted':
+        order = random.permutation(len(bins))
+        bins, values = bins[order], values[order]
+    return bins, values, len(counts) + 2  # Two empty bins at the end
+
+
+def test_median_matches_pandas(binned_values):
+    bins, values, size = binned_values
+    reference = pd.Series(values).groupby(bins).median().reindex(range(size))
+    np.testing.assert_array_equal(SortedBins(bins, values, size).median(), reference.to_numpy())
+
+
+def test_percentile_matches_numpy(binned_values):
+    bins, values, size = binned_values
+    q = [0, 10, 25, 50, 90, 100]
+    percentiles = SortedBins(bins, values, size).percentile(q)
+    for number in range(size):
+        in_bin = values[bins == number]
+        if len(in_bin):
+            np.testing.assert_allclose(percentiles[:, number], np.percentile(in_bin, q), rtol=1e-12)
+        else:
+            assert np.isnan(percentiles[:, number]).all()
+
+
+def test_window_medians_match_masked_loop(example_data_set):
+    for data_frame in CreatingFormatToAnalysis(example_data_set).final_data_frames[:6]:
+        temperature = data_frame['Temp'].to_numpy(dtype=float)
+        intensity = data_frame['Int'].to_numpy(dtype=float)
+        centers, medians = mean_in_temperature_windows(temperature, intensity, statistic='median')
+        for center, median in zip(centers, medians):
+            inside = (temperature >= center - 0.5) & (temperature < center + 0.5)
+            assert median == np.median(intensity[inside])
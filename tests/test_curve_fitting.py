@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from graph_analysis import PlotAnalysis, mean_in_temperature_windows, mean_of_intensity_points, peak_finder
+from curve_fitting import smooth_curves, POLYNOMIAL_DEGREE
+
+
+@pytest.fixture(scope='module')
+def data_frames(example_data_frames, generated_spectra):
+    """
+    :return: Example/Data_set.xlsx spectra and synthetic spectra with other numbers of points (one batch of curves
+    with different lengths, without the sparsest spectra where T_max can not be fitted)
+    """
+    return example_data_frames + [data_frame for data_frame in generated_spectra[0] if len(data_frame) >= 500]
+
+
+@pytest.fixture(scope='module')
+def mean_points(data_frames):
+    return [mean_in_temperature_windows(data_frame['Temp'].to_numpy(dtype=float),
+                                        data_frame['Int'].to_numpy(dtype=float)) for data_frame in data_frames]
+
+
+@pytest.mark.parametrize('method', ['polyfit', 'chebyshev'])
+def test_batch_fit_matches_np_polyfit(mean_points, method):
+    fitted = smooth_curves([temperature for temperature, _ in mean_points],
+                           [intensity for _, intensity in mean_points], method)
+    for fitted_intensity, (temperature, intensity) in zip(fitted, mean_points):
+        reference = np.poly1d(np.polyfit(temperature, intensity, POLYNOMIAL_DEGREE))(temperature)
+        np.testing.assert_allclose(fitted_intensity, reference, rtol=0, atol=1e-7 * np.abs(intensity).max())
+
+
+def test_batch_peak_finder_matches_single_spectra(data_frames):
+    analyses = [PlotAnalysis(data_frame) for data_frame in data_frames]
+    mean_of_intensity_points(analyses)
+    batch_results = peak_finder(analyses)
+
+    for data_frame, analysis, batch_result in zip(data_frames, analyses, batch_results):
+        single = PlotAnalysis(data_frame)
+        single.mean_of_intensity_points()
+        assert single.peak_finder() == batch_result
+        assert single.alg_code == analysis.alg_code
@@ -0,0 +1,211 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from benchmark import write_intibs_folder, FIRST_PMT, FIRST_HEAT
+from file_organization import DividingRawDataToFolders, INTiBSMeasurementFile, IngestManifest, MeasurementFilesIndex, \
+    TimeAlignment
+from pipeline import extract_intibs_folder
+from spectrum_set import SpectrumSet
+from reference_implementations import reference_read_intibs_file
+
+
+def jittered_times(seed=0):
+    """
+    :return: PMT timestamps (step 0.1 s), heater timestamps moved by up to 0.02 s, temperatures linear in heater time
+    """
+    random = np.random.default_rng(seed)
+    pmt_time = np.arange(100) / 10
+    heater_time = pmt_time + random.uniform(-0.02, 0.02, len(pmt_time))
+    return pmt_time, heater_time, 20 + 2 * heater_time
+
+
+def test_nearest_alignment_takes_temperature_of_the_nearest_heater_sample():
+    pmt_time, heater_time, temperature = jittered_times()
+    data_frame, dropped = TimeAlignment('nearest', 0.02).align(pmt_time, np.arange(100.0), heater_time, temperature)
+    assert dropped == 0
+    np.testing.assert_array_equal(data_frame['Time'], pmt_time)
+    np.testing.assert_array_equal(data_frame['Temperature'], temperature)
+    np.testing.assert_array_equal(data_frame['Intensity'], np.arange(100.0))
+
+
+def test_linear_alignment_interpolates_inside_the_heater_time_range():
+    pmt_time, heater_time, temperature = jittered_times()
+    order = np.random.default_rng(1).permutation(len(heater_time))  # Heater samples do not have to be sorted
+    data_frame, dropped = TimeAlignment('linear', 0.02).align(pmt_time, np.arange(100.0), heater_time[order],
+                                                              temperature[order])
+    inside = (pmt_time >= heater_time.min()) & (pmt_time <= heater_time.max())
+    assert dropped == np.count_nonzero(~inside)
+    np.testing.assert_array_equal(data_frame['Time'], pmt_time[inside])
+    np.testing.assert_allclose(data_frame['Temperature'], 20 + 2 * pmt_time[inside], rtol=1e-12)
+
+
+@pytest.mark.parametrize('method', ['nearest', 'linear'])
+@pytest.mark.parametrize('tolerance, kept', [(0.0, [2.75]), (0.25, [0.0, 2.75, 3.0]),
+                                             (0.5, [0.0, 1.0, 2.0, 2.75, 3.0])])
+def test_samples_farther_than_tolerance_are_dropped(method, tolerance, kept):
+    pmt_time = np.array([0.0, 1.0, 2.0, 2.75, 3.0])
+    heater_time = np.array([0.25, 1.5, 2.75])  # Distances 0.25, 0.5, 0.5, 0, 0.25 (exact in binary)
+    data_frame, dropped = TimeAlignment(method, tolerance).align(pmt_time, np.ones(5), heater_time, heater_time)
+    if method == 'linear':  # Also outside of the heater time range
+        kept = [time for time in kept if heater_time[0] <= time <= heater_time[-1]]
+    np.testing.assert_array_equal(data_frame['Time'], kept)
+    assert dropped == len(pmt_time) - len(kept)
+
+
+def test_zero_tolerance_is_the_merge_on_equal_times():
+    pmt_time, heater_time, temperature = jittered_times()
+    heater_time[::3] = pmt_time[::3]
+    data_frame, dropped = TimeAlignment().align(pmt_time, np.arange(100.0), heater_time, temperature)
+    merged = pd.merge(pd.DataFrame({'Time': pmt_time, 'Intensity': np.arange(100.0)}),
+                      pd.DataFrame({'Time': heater_time, 'Temperature': temperature}), on='Time')
+    np.testing.assert_array_equal(data_frame['Time'], merged['Time'])
+    np.testing.assert_array_equal(data_frame['Temperature'], merged['Temperature'])
+    assert dropped == len(pmt_time) - len(merged)
+
+
+def test_without_heater_samples_all_are_dropped():
+    data_frame, dropped = TimeAlignment('linear', 1.0).align(np.arange(5.0), np.ones(5), [], [])
+    assert len(data_frame) == 0 and dropped == 5
+
+
+@pytest.fixture
+def two_irradiations(tmp_path, generated_spectra):
+    """
+    :return: INTiBS folder with the same T_stops measured after two irradiation times (two sub folders)
+    """
+    data_frames = generated_spectra[0][4:6]
+    write_intibs_folder(str(tmp_path), [30.0, 50.0], data_frames, 0.5, irradiation=60)
+    write_intibs_folder(str(tmp_path), [30.0, 50.0], data_frames, 0.5, irradiation=120, first_step=2)
+    return str(tmp_path)
+
+
+def test_dropped_samples_of_sub_folders_with_the_same_t_stops(two_irradiations):
+    new_data = DividingRawDataToFolders(two_irradiations)
+    new_data.divide_data_TO_folders_sequence_position(FIRST_PMT, FIRST_HEAT, save_excel=False)
+    assert len(new_data.paths_to_sub_folders) == 2
+    assert sorted(new_data.dropped_samples) == sorted(new_data.paths_to_sub_folders)
+    for path in new_data.paths_to_sub_folders:
+        assert new_data.dropped_samples[path] == {'30.00': 0, '50.00': 0}
+
+    new_data.save_excel_files()
+    for path in new_data.paths_to_sub_folders:
+        assert sorted(os.listdir(path)) == ['30.00.xlsx', '50.00.xlsx']
+
+
+def test_manifest_recognizes_unchanged_files(tmp_path, generated_spectra):
+    write_intibs_folder(str(tmp_path), [30.0], generated_spectra[0][4:5], 0.5)
+    pmt, heater = f'{FIRST_PMT:04d}_PMT_measured.csv', f'{FIRST_HEAT:04d}_Heater_measured.csv'
+    manifest = IngestManifest(str(tmp_path))
+    manifest.record(pmt, heater, '30.00', 'Irradiation_1/Excel_files')
+    manifest.save()
+
+    manifest = IngestManifest(str(tmp_path))  # Loaded from ingest_manifest.json
+    assert manifest.is_ingested(pmt, heater)
+    assert not manifest.is_ingested(pmt, None)
+    assert not manifest.is_ingested(f'{FIRST_PMT + 4:04d}_PMT_measured.csv', None)
+
+    # Only the modification time changed (a copy or 'touch') -> the same SHA-256
+    os.utime(tmp_path / pmt, (1e9, 1e9))
+    assert manifest.is_ingested(pmt, heater)
+
+    # The same size and another content
+    content = (tmp_path / pmt).read_bytes()
+    (tmp_path / pmt).write_bytes(content[:-2] + (b'8' if content[-2:-1] != b'8' else b'9') + content[-1:])
+    assert not manifest.is_ingested(pmt, heater)
+
+
+def test_incremental_extraction_processes_only_new_t_stops(tmp_path, generated_spectra):
+    data_frames = generated_spectra[0][4:8]
+    write_intibs_folder(str(tmp_path), [30.0, 50.0, 70.0], data_frames[:3], 0.5)
+    data_set_paths, dropped_samples = extract_intibs_folder(str(tmp_path), FIRST_PMT, FIRST_HEAT, save_excel=False,
+                                                            incremental=True)
+    assert [sorted(dropped) for dropped in dropped_samples.values()] == [['30.00', '50.00', '70.00']]
+
+    # Nothing new, the Data_set file of the sub folder is returned
+    assert extract_intibs_folder(str(tmp_path), FIRST_PMT, FIRST_HEAT, save_excel=False, incremental=True) == \
+        (data_set_paths, {})
+
+    write_intibs_folder(str(tmp_path), [90.0], data_frames[3:], 0.5, first_step=3)
+    new_paths, dropped_samples = extract_intibs_folder(str(tmp_path), FIRST_PMT, FIRST_HEAT, save_excel=False,
+                                                       incremental=True)
+    assert new_paths == data_set_paths
+    assert [sorted(dropped) for dropped in dropped_samples.values()] == [['90.00']]
+    assert SpectrumSet.load(data_set_paths[0]).t_stop_names == ['T_stop: 30', 'T_stop: 50', 'T_stop: 70',
+                                                                 'T_stop: 90']
+    assert len(IngestManifest(str(tmp_path)).entries) == 4
+
+
+def test_extraction_returns_data_set_of_each_sub_folder(two_irradiations):
+    data_set_paths, dropped_samples = extract_intibs_folder(two_irradiations, FIRST_PMT, FIRST_HEAT, save_excel=False)
+    assert [os.path.dirname(path) for path in data_set_paths] == [os.path.dirname(path) for path in dropped_samples]
+    assert sorted(path.split('/')[-2] for path in data_set_paths) == ['Irradiation_120', 'Irradiation_60']
+    for path in data_set_paths:
+        assert SpectrumSet.load(path).t_stop_names == ['T_stop: 30', 'T_stop: 50']
+
+
+def test_files_index_finds_numbers_across_padding_boundaries(tmp_path):
+    names = ['0008_Heat_stop.csv', '0009_Wait.csv', '0010_PMT_measured.csv', '0011_Heater_measured.csv',
+             '0098_PMT_measured.csv', '0099_Heater_measured.csv', '0100_Heat_stop.csv', '0101_Wait.csv',
+             '0102_PMT_measured.csv', '0103_Heater_measured.csv', 'notes.txt', IngestManifest.FILE_NAME]
+    for name in names:
+        (tmp_path / name).write_text('Header\n')
+
+    files_index = MeasurementFilesIndex(DividingRawDataToFolders(str(tmp_path)).list_of_files_in_folder)
+    assert files_index.by_number == {int(name[:4]): name for name in names if name[:4].isdigit()}
+    assert files_index.by_type == {'PMT': [10, 98, 102], 'Heater': [11, 99, 103], 'other': [8, 9, 100, 101]}
+    assert files_index.pmt_step() == 88
+    assert files_index.by_number.get(104) is None
+
+
+def test_extraction_across_file_numbers_10_and_100(tmp_path, generated_spectra):
+    # 26 steps: files 0001-0104, the PMT files 0011 and 0099 are next to 0010 and 0100
+    t_stops = [30.0 + index for index in range(26)]
+    data_frames = [data_frame.iloc[::10] for data_frame in generated_spectra[0][4:8]] * 7
+    write_intibs_folder(str(tmp_path), t_stops, data_frames[:26], 0.5)
+    data_set_paths, _ = extract_intibs_folder(str(tmp_path), FIRST_PMT, FIRST_HEAT, save_excel=False)
+
+    spectra = SpectrumSet.load(data_set_paths[0])
+    assert spectra.t_stop_names == [f'T_stop: {int(t_stop)}' for t_stop in t_stops]
+    for spectrum, data_frame in zip(spectra, data_frames):
+        np.testing.assert_allclose(spectrum.intensity, data_frame['Int'], rtol=1e-9)
+
+
+def handwritten_measurement_file(path, line_end):
+    """
+    :return: Path to PMT-like file with blank lines in the header, three columns and blank lines at the end
+    """
+    header = [f'Header line {index}' for index in range(44)]
+    header[15] = 'Sequence position;3'
+    header[28] = 'Irradiation;60'
+    header[2:2] = ['', '  ']  # Blank lines are not counted
+    rows = ['0,7,101', '0.25,7,1.5e3', '0.5,8,-2', '1e1,9,1234567.125']
+    path.write_bytes(line_end.join(header + rows + ['', '  ', '']).encode('utf-8'))
+    return str(path)
+
+
+@pytest.mark.parametrize('line_end', ['\n', '\r\n'])
+def test_measurement_file_matches_read_table(tmp_path, line_end):
+    path = handwritten_measurement_file(tmp_path / '0003_PMT_measured.csv', line_end)
+    measurement_file = INTiBSMeasurementFile(path, 44)
+    header, time, values = reference_read_intibs_file(path, 44)
+    assert len(measurement_file.header) == 44
+    assert measurement_file.header[15] == header[15] == 'Sequence position;3'
+    assert measurement_file.header[28] == header[28] == 'Irradiation;60'
+    np.testing.assert_array_equal(measurement_file.time, time)
+    np.testing.assert_array_equal(measurement_file.values, values)
+    np.testing.assert_array_equal(measurement_file.values, [101, 1500, -2, 1234567.125])
+
+
+def test_generated_measurement_files_match_read_table(tmp_path, generated_spectra):
+    write_intibs_folder(str(tmp_path), [30.0], generated_spectra[0][4:5], 0.5)
+    for number, header_length in ((FIRST_PMT, 44), (FIRST_HEAT, 41)):
+        path = str(next(tmp_path.glob(f'{number:04d}_*')))
+        measurement_file = INTiBSMeasurementFile(path, header_length)
+        header, time, values = reference_read_intibs_file(path, header_length)
+        assert measurement_file.header == header
+        np.testing.assert_array_equal(measurement_file.time, time)
+        np.testing.assert_array_equal(measurement_file.values, values)
+
+    t_stop_file = INTiBSMeasurementFile(str(tmp_path / f'{FIRST_PMT - 2:04d}_Heat_stop.csv'), 39, read_data=False)
+    assert t_stop_file.header[38] == 'Tstop,30.00' and len(t_stop_file.time) == 0
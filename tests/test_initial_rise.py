@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+import pytest
+from graph_analysis import PlotAnalysis, mean_of_intensity_points, peak_finder
+from initial_rise_method import InitialRise, InitialRiseBatch, blind_fit_curves, resample_indexes, segment_fitter, \
+    K_BOLTZMANN, RESAMPLE_MIN_POINTS, SEGMENT_MIN_POINTS
+from reference_implementations import ReferenceInitialRise, reference_blind_fit
+
+
+@pytest.fixture(scope='module')
+def example_spectra(example_data_frames):
+    """
+    :return: DataFrames of Example/Data_set.xlsx spectra and T_max of each one
+    """
+    analyses = [PlotAnalysis(data_frame) for data_frame in example_data_frames]
+    mean_of_intensity_points(analyses)
+    return example_data_frames, [t_max for t_max, _ in peak_finder(analyses)]
+
+
+def chosen_points(data_frames, t_maxes):
+    """
+    :return: mean_points_chosen (medians below the rise threshold) of each spectrum
+    """
+    return [InitialRise(data_frame, t_max).mean_points_chosen for data_frame, t_max in zip(data_frames, t_maxes)]
+
+
+def assert_blind_fit_matches_reference(points):
+    offsets = np.concatenate(([0], np.cumsum([len(chosen) for chosen in points])))
+    kT = np.concatenate([chosen['1/kT'].to_numpy() for chosen in points])
+    ln = np.concatenate([chosen['ln(I)'].to_numpy() for chosen in points])
+    # All curves at once and in small groups (the residual arrays are split by max_values)
+    for max_values in (2 ** 22, 2000):
+        a_blind, b_blind = blind_fit_curves(kT, ln, offsets, max_values=max_values)
+        for index, chosen in enumerate(points):
+            a_reference, b_reference = reference_blind_fit(chosen)
+            assert a_blind[index] == pytest.approx(a_reference, rel=1e-12)
+            assert b_blind[index] == pytest.approx(b_reference, rel=1e-12)
+
+
+def test_blind_fit_matches_reference_on_example_data_set(example_spectra):
+    assert_blind_fit_matches_reference(chosen_points(*example_spectra))
+
+
+def test_blind_fit_matches_reference_on_generated_spectra(generated_spectra):
+    assert_blind_fit_matches_reference(chosen_points(*generated_spectra))
+
+
+def assert_batch_matches_reference(data_frames, t_maxes):
+    batch = InitialRiseBatch(data_frames, t_maxes)
+    for index, (data_frame, t_max) in enumerate(zip(data_frames, t_maxes)):
+        try:
+            reference = ReferenceInitialRise(data_frame, t_max)
+        except Exception:  # Spectra where IRM failed before must still fail
+            assert batch.error(index) is not None
+            continue
+        initial_rise = InitialRise.from_batch(batch, index)
+        assert initial_rise.e == pytest.approx(reference.e, rel=1e-8)
+        assert initial_rise.a_uncertain == pytest.approx(reference.a_uncertain, rel=1e-6)
+        np.testing.assert_allclose(initial_rise.data_median['Int'], reference.data_median['Int'], rtol=1e-12)
+        np.testing.assert_array_equal(initial_rise.x_line['1/kT'], reference.x_line['1/kT'])
+        np.testing.assert_allclose(initial_rise.y_line, reference.y_line, rtol=1e-8)
+
+
+def test_initial_rise_batch_matches_reference_on_example_data_set(example_spectra):
+    assert_batch_matches_reference(*example_spectra)
+
+
+def test_initial_rise_batch_matches_reference_on_generated_spectra(generated_spectra):
+    assert_batch_matches_reference(*generated_spectra)
+
+
+def test_resample_indexes():
+    jackknife = resample_indexes(4, 'jackknife')
+    np.testing.assert_array_equal(jackknife, [[1, 2, 3], [0, 2, 3], [0, 1, 3], [0, 1, 2]])
+    bootstrap = resample_indexes(6, 'bootstrap', 100, np.random.default_rng(0))
+    assert bootstrap.shape == (100, 6)
+    assert (np.diff(bootstrap, axis=1) >= 0).all()  # The points stay in the temperature order
+
+
+@pytest.mark.parametrize('method', ['bootstrap', 'jackknife'])
+def test_resampled_energy_interval(example_spectra, method):
+    batch = InitialRiseBatch(*example_spectra)
+    batch.resample(method, 500)
+    fit_points = batch.table['fit points'].to_numpy()
+    enough = fit_points >= RESAMPLE_MIN_POINTS
+
+    assert np.isnan(batch.u_resampled[~enough]).all() and np.isnan(batch.e_low[~enough]).all()
+    assert (batch.e_low[enough] < batch.e[enough]).all() and (batch.e[enough] < batch.e_high[enough]).all()
+
+
+def rise_with_background(number, sigma=0.05, seed=0):
+    """
+    :return: Spectra with one point for each degree up to T_max = 120 °C, ln(I) is the initial rise (E = 0.9 eV) over
+    a flat background (0.1 eV) with Gaussian noise of sigma
+    """
+    random = np.random.default_rng(seed)
+    temperature = np.arange(20.0, 121.0)
+    kT = 1 / ((temperature + 273.15) * K_BOLTZMANN) - 1 / ((120 + 273.15) * K_BOLTZMANN)
+    ln = np.logaddexp(-0.9 * kT + np.log(1e7), -0.1 * kT + np.log(2e4))
+    return [pd.DataFrame({'Temp': temperature, 'Int': np.exp(ln + random.normal(0, sigma, len(ln)))})
+            for _ in range(number)]
+
+
+@pytest.mark.parametrize('fitter', ['blind', 'segment'])
+@pytest.mark.parametrize('method', ['bootstrap', 'jackknife'])
+def test_resampled_uncertainty_matches_spread_of_energy(fitter, method):
+    spectra = rise_with_background(200)
+    spread = np.nanstd(InitialRiseBatch(spectra, [120.0] * len(spectra), fitter=fitter).e, ddof=1)
+
+    # u(E) of single spectra is comparable with the spread of E of the same curve with other noise (not a half of it)
+    batch = InitialRiseBatch(spectra[:5], [120.0] * 5, fitter=fitter)
+    batch.resample(method, 1000)
+    assert 0.8 < np.mean(batch.u_resampled) / spread < 2.5
+
+
+def brute_force_segments(kT, ln, min_points=SEGMENT_MIN_POINTS):
+    """
+    :return: a, b and fit points of the steeper segment of the best split of one curve (every split fitted by
+    np.polyfit)
+    """
+    best = None
+    for split in range(min_points, len(kT) - min_points + 1):
+        lines = [np.polyfit(kT[points], ln[points], 1) for points in (slice(0, split), slice(split, None))]
+        rss = sum(np.sum((ln[points] - np.polyval(line, kT[points])) ** 2)
+                  for line, points in zip(lines, (slice(0, split), slice(split, None))))
+        if best is None or rss < best[0] - 1e-9:
+            best = rss, split, lines
+    _, split, (left, right) = best
+    points = np.arange(len(kT)) < split if left[0] <= right[0] else np.arange(len(kT)) >= split
+    slope, intercept = np.polyfit(kT[points], ln[points], 1)
+    return -slope, intercept, points
+
+
+def two_slope_curve(points, breakpoint, seed):
+    """
+    :return: 1/kT and ln(I) of a noisy curve with a steep initial rise (2 eV) before breakpoint and a flat part
+    (0.2 eV) after it (in the temperature order, so 1/kT is decreasing)
+    """
+    random = np.random.default_rng(seed)
+    kT = np.linspace(40, 30, points)
+    ln = np.where(kT > kT[breakpoint], -2.0 * (kT - kT[breakpoint]), -0.2 * (kT - kT[breakpoint]))
+    return kT, ln + random.normal(0, 0.05, points)
+
+
+def test_segment_fitter_matches_brute_force_search():
+    # The initial rise on the right (flat part first, like background) and on the left, curves of different lengths
+    curves = [two_slope_curve(40, 25, 0), two_slope_curve(17, 6, 1)]
+    curves.append((curves[0][0], curves[0][1][::-1].copy()))
+    offsets = np.concatenate(([0], np.cumsum([len(kT) for kT, _ in curves])))
+    a, b, points = segment_fitter(np.concatenate([kT for kT, _ in curves]),
+                                  np.concatenate([ln for _, ln in curves]), offsets)
+
+    for index, (kT, ln) in enumerate(curves):
+        a_reference, b_reference, points_reference = brute_force_segments(kT, ln)
+        np.testing.assert_array_equal(points[offsets[index]:offsets[index + 1]], points_reference)
+        assert a[index] == pytest.approx(a_reference, rel=1e-9)
+        assert b[index] == pytest.approx(b_reference, rel=1e-9)
+
+
+def test_segment_fitter_energy_is_the_fitter_line():
+    kT, ln = two_slope_curve(40, 25, 0)
+    temperature = 1 / (kT * K_BOLTZMANN) - 273.15
+    batch = InitialRiseBatch([pd.DataFrame({'Temp': temperature, 'Int': np.exp(ln + 10)})], [temperature.max()],
+                             rise_threshold=1.0, fitter='segment')
+    np.testing.assert_allclose(batch.e, batch.a_blind, rtol=1e-9)
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from graph_analysis import mean_in_temperature_windows
+from reference_implementations import reference_mean_points
+
+
+def assert_same_mean_points(data_frame):
+    temperature, intensity = mean_in_temperature_windows(data_frame['Temp'].to_numpy(dtype=float),
+                                                         data_frame['Int'].to_numpy(dtype=float))
+    reference_temperature, reference_intensity = reference_mean_points(data_frame)
+    np.testing.assert_array_equal(temperature, reference_temperature)
+    np.testing.assert_allclose(intensity, reference_intensity, rtol=1e-12)
+
+
+def test_mean_points_match_reference_on_example_data_set(example_data_frames):
+    for data_frame in example_data_frames:
+        assert_same_mean_points(data_frame)
+
+
+def test_mean_points_match_reference_on_generated_spectra(generated_spectra):
+    for data_frame in generated_spectra[0]:
+        assert_same_mean_points(data_frame)
+
+
+def test_empty_cells_are_skipped():
+    temperature = np.array([20.2, 21.5, np.nan, 24.1, 24.7, np.nan])
+    intensity = np.array([1.0, 3.0, np.nan, 5.0, 7.0, np.nan])
+    centers, means = mean_in_temperature_windows(temperature, intensity)
+    np.testing.assert_array_equal(centers, [20.5, 24.5])
+    np.testing.assert_array_equal(means, [1.0, 6.0])
+
+
+def test_windows_can_not_overlap():
+    with pytest.raises(ValueError):
+        mean_in_temperature_windows(np.arange(10.0), np.ones(10), bin_step=1, bin_width=2)
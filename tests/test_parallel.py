@@ -0,0 +1,56 @@
+import os
+import time
+import pytest
+from parallel import iterate_tasks, number_of_workers, run_tasks
+
+
+def delayed_square(number, delay):
+    time.sleep(delay)
+    return number ** 2, os.getpid()
+
+
+def failing_task(number):
+    if number == 2:
+        raise ValueError(f'task {number} failed')
+    return number
+
+
+def test_number_of_workers():
+    assert number_of_workers(3) == 3
+    assert number_of_workers(-2) == 1
+    assert number_of_workers(0) == number_of_workers(None) == (os.cpu_count() or 1)
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_results_are_in_task_order(workers):
+    # Later tasks finish first in the process pool
+    tasks = [(number, 0.05 * (5 - number)) for number in range(6)]
+    results = run_tasks(delayed_square, tasks, workers)
+
+    assert [square for square, _ in results] == [number ** 2 for number in range(6)]
+    processes = {pid for _, pid in results}
+    if workers == 1:
+        assert processes == {os.getpid()}
+    else:
+        assert os.getpid() not in processes and len(processes) <= workers
+
+
+def test_serial_iteration_calls_tasks_when_results_are_taken():
+    calls = []
+    results = iterate_tasks(calls.append, [(number,) for number in range(3)])
+    assert calls == []
+    next(results)
+    assert calls == [0]
+    results.close()
+    assert calls == [0]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_task_exception_is_raised_again(workers):
+    with pytest.raises(ValueError, match='task 2 failed'):
+        run_tasks(failing_task, [(number,) for number in range(4)], workers)
+
+    results = iterate_tasks(failing_task, [(number,) for number in range(4)], workers)
+    assert [next(results), next(results)] == [0, 1]
+    with pytest.raises(ValueError, match='task 2 failed'):
+        next(results)
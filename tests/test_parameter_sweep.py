@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+from cli import parse_arguments, sweep_values
+from initial_rise_method import InitialRiseBatch
+from parameter_sweep import BINNING_PARAMETERS, PEAK_PARAMETERS, IRM_PARAMETERS, parameter_grid, \
+    sweep_spectrum_group
+from pipeline import ANALYSIS_PARAMETERS, analyse_spectrum_group
+
+
+@pytest.fixture(scope='module')
+def spectra(generated_spectra):
+    """
+    :return: DataFrames and T_stop names of the two-peak series with 500 points
+    """
+    return generated_spectra[0][4:8], [f'T_stop: {t_stop}' for t_stop in (30, 57, 83, 110)]
+
+
+def test_parameter_grid():
+    grid = parameter_grid({'bin_step': [2, 3], 'bin_width': [1, 3], 'fitter': ['blind', 'segment']})
+
+    # bin_width 3 > bin_step 2 is skipped, the IRM parameters change the fastest
+    assert [(parameters['bin_step'], parameters['bin_width'], parameters['fitter']) for parameters in grid] == \
+        [(2, 1, 'blind'), (2, 1, 'segment'), (3, 1, 'blind'), (3, 1, 'segment'), (3, 3, 'blind'), (3, 3, 'segment')]
+    for parameters in grid:
+        assert set(parameters) == set(BINNING_PARAMETERS + PEAK_PARAMETERS + IRM_PARAMETERS)
+        assert parameters['dp'] == ANALYSIS_PARAMETERS['dp'] and parameters['smoothing'] == 'polyfit'
+
+    assert parameter_grid({}) == [{name: ANALYSIS_PARAMETERS[name] for name in grid[0]}]
+    with pytest.raises(ValueError, match='bin_size'):
+        parameter_grid({'bin_size': [2]})
+
+
+def test_cli_sweep_skips_parameters_without_sweep_options():
+    arguments = parse_arguments(['sweep', 'Data_set.npz', '--fitter', 'blind', 'segment', '--dp', '2', '3'])
+    values = sweep_values(arguments)
+
+    assert values == {'dp': [2, 3], 'fitter': ['blind', 'segment']}
+    assert not hasattr(arguments, 'uncertainty') and not hasattr(arguments, 'resamples')
+    assert len(parameter_grid(values)) == 4
+
+
+def test_with_parameters_shares_data_and_refits(spectra):
+    data_frames, t_stop_names = spectra
+    t_maxes = [data_frame['Temp'][data_frame['Int'].idxmax()] for data_frame in data_frames]
+    batch = InitialRiseBatch(data_frames, t_maxes, t_stop_names=t_stop_names)
+    table = batch.table.copy()
+
+    changed = batch.with_parameters(rise_threshold=0.3, fitter='segment')
+    expected = InitialRiseBatch(data_frames, t_maxes, 0.3, t_stop_names, fitter='segment')
+
+    assert changed.median_intensity is batch.median_intensity and changed.raw_ln is batch.raw_ln
+    assert (changed.rise_threshold, changed.residual_limit, changed.fitter) == (0.3, 0.1, 'segment')
+    pd.testing.assert_frame_equal(changed.table, expected.table)
+    pd.testing.assert_frame_equal(batch.table, table)  # The first batch is not changed
+
+
+def test_sweep_rows_match_analysis_with_each_combination(tmp_path, spectra):
+    data_frames, t_stop_names = spectra
+    combinations = parameter_grid({'bin_step': [2, 3], 'rise_threshold': [0.15, 0.3], 'fitter': ['blind', 'segment']})
+    table = sweep_spectrum_group(data_frames, t_stop_names, combinations)
+
+    assert len(table) == len(combinations) * len(data_frames)
+    for number, parameters in enumerate(combinations):
+        rows = table[table['combination'] == number]
+        assert list(rows['T_stop']) == t_stop_names
+        results = analyse_spectrum_group(data_frames, t_stop_names, True, str(tmp_path),
+                                         dict(ANALYSIS_PARAMETERS, **parameters))
+        np.testing.assert_allclose(rows['T_max [°C]'], [result.t_max for result in results])
+        np.testing.assert_allclose(rows['E [eV]'], [result.energy for result in results])
+        np.testing.assert_allclose(rows['u(E) [eV]'], [result.uncertain_energy for result in results])
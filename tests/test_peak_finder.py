@@ -0,0 +1,35 @@
+import pytest
+from graph_analysis import PlotAnalysis, mean_of_intensity_points, peak_finder
+from reference_implementations import reference_peak_finder
+
+
+pytestmark = pytest.mark.filterwarnings('ignore::FutureWarning')  # float(Series) in reference_peak_finder
+
+
+def test_peak_finder_matches_reference_on_example_data_set(example_data_frames):
+    analyses = [PlotAnalysis(data_frame) for data_frame in example_data_frames]
+    mean_of_intensity_points(analyses)
+    results = peak_finder(analyses)
+
+    for analysis, (t_max, i_max) in zip(analyses, results):
+        reference_t_max, reference_i_max, reference_code = reference_peak_finder(analysis.data_frame, analysis.mean_df,
+                                                                                 analysis.fitted_df)
+        assert analysis.alg_code == reference_code
+        assert t_max == pytest.approx(reference_t_max, rel=1e-12)
+        assert i_max == pytest.approx(reference_i_max, rel=1e-9)
+
+
+def test_peak_finder_matches_reference_on_generated_spectra(generated_spectra):
+    for data_frame in generated_spectra[0]:
+        analysis = PlotAnalysis(data_frame.reset_index(drop=True))
+        analysis.mean_of_intensity_points()
+        try:
+            reference = reference_peak_finder(analysis.data_frame, analysis.mean_df, analysis.fitted_df)
+        except Exception:  # Curves that the algorithm could not handle before must still fail
+            with pytest.raises(Exception):
+                analysis.peak_finder()
+            continue
+        t_max, i_max = analysis.peak_finder()
+        assert analysis.alg_code == reference[2]
+        assert t_max == pytest.approx(reference[0], rel=1e-12)
+        assert i_max == pytest.approx(reference[1], rel=1e-9)
@@ -0,0 +1,63 @@
+import os
+import pandas as pd
+import pytest
+import pipeline
+from benchmark import write_intibs_folder, FIRST_PMT, FIRST_HEAT
+from pipeline import AnalysisPipeline, extract_and_analyse, extract_intibs_folder
+
+
+@pytest.fixture
+def analysed_t_stops(monkeypatch):
+    """
+    :return: List filled with T_stop names of spectra analysed by analyse_spectrum_group (workers=1)
+    """
+    analysed = []
+
+    def analyse_spectrum_group(data_frames, t_stop_data, *args, **kwargs):
+        analysed.extend(t_stop_data)
+        return original(data_frames, t_stop_data, *args, **kwargs)
+
+    original = pipeline.analyse_spectrum_group
+    monkeypatch.setattr(pipeline, 'analyse_spectrum_group', analyse_spectrum_group)
+    return analysed
+
+
+def test_incremental_run_analyses_only_new_t_stops_of_each_sub_folder(tmp_path, generated_spectra,
+                                                                     analysed_t_stops):
+    data_frames = generated_spectra[0][12:16]
+    write_intibs_folder(str(tmp_path), [30.0, 50.0], data_frames[:2], 0.5, irradiation=60)
+    write_intibs_folder(str(tmp_path), [30.0, 50.0], data_frames[:2], 0.5, irradiation=120, first_step=2)
+    pipelines, _ = extract_and_analyse(str(tmp_path), FIRST_PMT, FIRST_HEAT, 0.5, save_excel=False, incremental=True,
+                                       chart_policy='none')
+    assert len(pipelines) == 2 and len(analysed_t_stops) == 4
+
+    # One new T_stop in each sub folder
+    write_intibs_folder(str(tmp_path), [70.0], data_frames[2:3], 0.5, irradiation=60, first_step=4)
+    write_intibs_folder(str(tmp_path), [90.0], data_frames[3:4], 0.5, irradiation=120, first_step=5)
+    analysed_t_stops.clear()
+    pipelines, dropped_samples = extract_and_analyse(str(tmp_path), FIRST_PMT, FIRST_HEAT, 0.5, save_excel=False,
+                                                     incremental=True, chart_policy='none')
+
+    assert sorted(analysed_t_stops) == ['T_stop: 70', 'T_stop: 90']
+    assert sorted(os.path.basename(os.path.dirname(path)) for path in dropped_samples) == ['Irradiation_120',
+                                                                                           'Irradiation_60']
+    summaries = {os.path.basename(os.path.dirname(run.excel_file_path)): list(run.summary_data_frame['T_stop [°C]'])
+                 for run in pipelines}
+    assert summaries == {'Irradiation_60': ['T_stop: 30', 'T_stop: 50', 'T_stop: 70'],
+                         'Irradiation_120': ['T_stop: 30', 'T_stop: 50', 'T_stop: 90']}
+
+
+@pytest.mark.parametrize('data_set_file', ['Data_set.npz', 'Data_set.xlsx'])
+def test_extract_and_analyse_matches_analysis_of_saved_data_set(tmp_path, generated_spectra, data_set_file):
+    t_stops = [30.0, 50.0, 70.0, 90.0]
+    for folder in ('saved', 'in_memory'):
+        write_intibs_folder(str(tmp_path / folder), t_stops, generated_spectra[0][12:16], 0.5)
+
+    data_set_paths, _ = extract_intibs_folder(str(tmp_path / 'saved'), FIRST_PMT, FIRST_HEAT, save_excel=True)
+    data_set_path = os.path.join(os.path.dirname(data_set_paths[0]), data_set_file)
+    saved = AnalysisPipeline(data_set_path, 0.5, chart_policy='none').run()
+    pipelines, _ = extract_and_analyse(str(tmp_path / 'in_memory'), FIRST_PMT, FIRST_HEAT, 0.5, save_excel=False,
+                                       chart_policy='none')
+
+    assert len(pipelines) == 1 and len(saved) == len(t_stops)
+    pd.testing.assert_frame_equal(pipelines[0].summary_data_frame, saved)
@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+from PIL import Image
+from matplotlib.figure import Figure
+from pdf_file import CreatePDFSummaryFile
+from plot_charts import PlotChart
+
+
+@pytest.mark.parametrize('file_format, signature', [('png', b'\x89PNG'), ('jpg', b'\xff\xd8'), ('pdf', b'%PDF'),
+                                                    ('svg', b'<?xml')])
+def test_save_writes_chart_in_chosen_format(tmp_path, file_format, signature):
+    fig = Figure(figsize=(15, 8))
+    fig.add_subplot().plot([20, 100, 180], [1, 5, 2])
+    path = PlotChart(str(tmp_path), dpi=40, file_format=file_format).save(fig, 'T_stop__30')
+
+    assert path == f'{tmp_path}/T_stop__30.{file_format}'
+    with open(path, 'rb') as chart_file:
+        assert chart_file.read(len(signature)) == signature
+    assert not fig.axes  # The figure is cleared after saving
+    if file_format in ('png', 'jpg'):
+        with Image.open(path) as image:
+            assert image.size == (15 * 40, 8 * 40)
+
+
+def test_report_embeds_png_charts_without_alpha_channel(tmp_path):
+    summary_path = str(tmp_path / 'summary_data_frame.xlsx')
+    pd.DataFrame({'T_stop [°C]': ['T_stop: 30'], 'T_max [°C]': [150.0], 'E [eV]': [0.9]}).to_excel(summary_path)
+    charts = PlotChart(str(tmp_path), dpi=40)
+    for file_name in ('TmaxTstopEnergy', 'T_stop__30_TSTOP', 'T_stop__30_IRM_lnkT'):
+        fig = Figure(figsize=(15, 8))
+        fig.add_subplot().plot([20, 100, 180], [1, 5, 2])
+        with Image.open(charts.save(fig, file_name)) as image:
+            assert image.mode == 'RGBA'
+
+    CreatePDFSummaryFile(summary_path, str(tmp_path), str(tmp_path))
+
+    with open(tmp_path / 'Report.pdf', 'rb') as report_file:
+        report = report_file.read()
+    assert report.count(b'/ColorSpace /DeviceRGB') == 3 and b'/SMask' not in report
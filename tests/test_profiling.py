@@ -0,0 +1,78 @@
+import os
+import json
+import pytest
+import profiling
+from parallel import run_tasks
+from profiling import DISABLED_STAGE, ENVIRONMENT_VARIABLE, StageProfiler, profiler
+
+
+@pytest.fixture
+def enabled_profiler(tmp_path, monkeypatch):
+    """
+    :return: StageProfiler enabled with the trace file in tmp_path (not saved at exit), the global profiler is disabled
+    again after the test
+    """
+    monkeypatch.delenv(ENVIRONMENT_VARIABLE, raising=False)
+    monkeypatch.setattr(profiling.atexit, 'register', lambda function: None)
+    stage_profiler = StageProfiler()
+    stage_profiler.enable(str(tmp_path / 'trace.json'))
+    yield stage_profiler
+    stage_profiler.disable()
+    profiler.disable()
+    profiler.events.clear()
+
+
+def profiled_task(number):
+    with profiler.stage('task', t_stop=f'T_stop: {number}'):
+        return number, os.getpid()
+
+
+def test_disabled_profiler_records_nothing(tmp_path, monkeypatch):
+    monkeypatch.delenv(ENVIRONMENT_VARIABLE, raising=False)
+    stage_profiler = StageProfiler()
+
+    with stage_profiler.stage('peak_finder', rows=10) as stage:
+        stage.set(t_stop='T_stop: 30')
+    assert stage is DISABLED_STAGE
+    assert stage_profiler.events == []
+    assert stage_profiler.summary().empty and stage_profiler.t_stop_summary().empty
+    assert stage_profiler.save() is None
+
+
+def test_chrome_trace_of_stages(enabled_profiler):
+    assert os.environ[ENVIRONMENT_VARIABLE] == enabled_profiler.trace_path
+    for t_stop in ('T_stop: 30', 'T_stop: 50'):
+        with enabled_profiler.stage('InitialRise', rows=100) as stage:
+            stage.set(t_stop=t_stop)
+    with pytest.raises(ValueError):
+        with enabled_profiler.stage('summary_data_frame'):
+            raise ValueError('The stage is recorded anyway')
+
+    with open(enabled_profiler.save(), encoding='utf-8') as trace_file:
+        trace = json.load(trace_file)
+    events = trace['traceEvents']
+    assert trace['displayTimeUnit'] == 'ms'
+    assert [event['name'] for event in events] == ['InitialRise', 'InitialRise', 'summary_data_frame']
+    for event in events:
+        assert (event['ph'], event['cat'], event['pid']) == ('X', 'stage', os.getpid())
+        assert event['dur'] >= 0 and event['args']['cpu_ms'] >= 0
+    assert events[1]['ts'] >= events[0]['ts'] + events[0]['dur']
+    assert events[1]['args']['t_stop'] == 'T_stop: 50' and events[1]['args']['rows'] == 100
+
+    summary = enabled_profiler.summary()
+    assert list(summary.index) == ['InitialRise', 'summary_data_frame']
+    assert list(summary['calls']) == [2, 1] and summary.loc['InitialRise', 'rows'] == 200
+    assert list(enabled_profiler.t_stop_summary().index) == ['T_stop: 30', 'T_stop: 50']
+
+    enabled_profiler.disable()
+    assert ENVIRONMENT_VARIABLE not in os.environ
+
+
+def test_events_of_worker_processes_are_collected(enabled_profiler):
+    profiler.enable(enabled_profiler.trace_path)
+    results = run_tasks(profiled_task, [(number,) for number in range(4)], workers=2)
+
+    events = [event for event in profiler.events if event['name'] == 'task']
+    assert [event['args']['t_stop'] for event in events] == [f'T_stop: {number}' for number in range(4)]
+    assert [event['pid'] for event in events] == [pid for _, pid in results]
+    assert os.getpid() not in {pid for _, pid in results}
@@ -0,0 +1,79 @@
+import os
+import filecmp
+import pandas as pd
+import pytest
+import pipeline
+import result_cache
+from pipeline import ANALYSIS_PARAMETERS, analyse_spectra
+from result_cache import ResultCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / 'cache'))
+
+
+def curve(shift=0.0):
+    return pd.DataFrame({'Temp': [20.0, 21.0, 22.0, 23.0], 'Int': [1.0, 2.0 + shift, 4.0, 3.0]})
+
+
+def test_key_depends_on_curve_values_and_parameters():
+    key = ResultCache.key(curve(), ANALYSIS_PARAMETERS)
+    # The index and other columns are not a part of the key
+    assert ResultCache.key(curve().set_index(pd.Index([5, 6, 7, 8])).assign(Other=1), ANALYSIS_PARAMETERS) == key
+    assert ResultCache.key(curve(), dict(reversed(ANALYSIS_PARAMETERS.items()))) == key
+    assert ResultCache.key(curve(1e-9), ANALYSIS_PARAMETERS) != key
+    assert ResultCache.key(curve(), {**ANALYSIS_PARAMETERS, 'fitter': 'segment'}) != key
+
+
+def test_get_counts_hits_and_misses(cache):
+    key = ResultCache.key(curve(), ANALYSIS_PARAMETERS)
+    assert cache.get(key) is None
+    cache.put(key, {'energy': 1.25})
+    assert cache.get(key) == {'energy': 1.25}
+    assert cache.get(ResultCache.key(curve(1.0), ANALYSIS_PARAMETERS)) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert not [name for name in os.listdir(cache.cache_folder) if name.endswith('.tmp')]
+
+
+def test_cache_version_change_invalidates_results(cache, monkeypatch):
+    cache.put(ResultCache.key(curve(), ANALYSIS_PARAMETERS), 'old result')
+    monkeypatch.setattr(result_cache, 'CACHE_VERSION', result_cache.CACHE_VERSION + 1)
+    assert cache.get(ResultCache.key(curve(), ANALYSIS_PARAMETERS)) is None
+
+
+def test_evict_removes_least_recently_used_results(cache):
+    keys = [f'{index:064x}' for index in range(4)]
+    for index, key in enumerate(keys):
+        cache.put(key, bytes(1000))
+        os.utime(cache.path(key), (1000 + index, 1000 + index))
+    assert cache.get(keys[0]) is not None  # Used again -> the newest
+    size = os.path.getsize(cache.path(keys[0]))
+    cache.max_size = 2 * size
+
+    assert cache.evict() == 2
+    assert sorted(name[:-len('.pkl')] for name in os.listdir(cache.cache_folder)) == sorted([keys[0], keys[3]])
+    assert cache.evict() == 0
+
+
+def test_cached_spectrum_copies_irm_results(tmp_path, cache, generated_spectra, monkeypatch):
+    data_frames = generated_spectra[0][4:6]
+    first_folder, second_folder = tmp_path / 'first', tmp_path / 'second'
+    first_folder.mkdir()
+    second_folder.mkdir()
+    results = analyse_spectra(data_frames, ['T_stop: 30', 'T_stop: 57'], True, str(first_folder), cache=cache)
+    assert cache.misses == 2 and len(os.listdir(cache.cache_folder)) == 2
+
+    def save_irm_results(*args):
+        raise AssertionError('IRM results of a cached spectrum are saved again')
+
+    monkeypatch.setattr(pipeline, 'save_irm_results', save_irm_results)
+    # Other T_stop names of the same curves
+    cached = analyse_spectra(data_frames, ['T_stop: 40', 'T_stop: 60'], True, str(second_folder), cache=cache)
+
+    assert cache.hits == 2
+    assert [result.energy for result in cached] == [result.energy for result in results]
+    assert [result.t_stop for result in cached] == ['T_stop: 40', 'T_stop: 60']
+    for result, t_stop, previous in zip(cached, ('40', '60'), ('30', '57')):
+        assert result.irm_file == f'{second_folder}/T_stop__{t_stop}_IRM.xlsx'
+        assert filecmp.cmp(result.irm_file, first_folder / f'T_stop__{previous}_IRM.xlsx', shallow=False)
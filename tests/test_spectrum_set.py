@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+from spectrum_set import SpectrumSet
+
+
+@pytest.fixture
+def ragged_spectra():
+    """
+    :return: T_stop names, temperatures and intensities of spectra with different lengths, NaN cells at the end of
+    shorter columns (like in Excel files), unsorted temperatures and one empty spectrum
+    """
+    t_stop_names = ['T_stop: 30', 'T_stop: 50', 'T_stop: 70', 'T_stop: 90']
+    temperatures = [[20.0, 21.0, 22.0, np.nan, np.nan], [24.0, 21.5, 22.5, np.nan, 20.5], [np.nan] * 5,
+                    [30.0, 31.0, 32.0, 33.0, 34.0]]
+    intensities = [[1.0, 2.0, 3.0, np.nan, np.nan], [4.0, 5.0, 6.0, 7.0, 8.0], [np.nan] * 5,
+                   [9.0, 10.0, 11.0, 12.0, 13.0]]
+    return t_stop_names, temperatures, intensities
+
+
+def test_from_arrays_keeps_ragged_spectra_sorted_in_one_buffer(ragged_spectra):
+    t_stop_names, temperatures, intensities = ragged_spectra
+    spectra = SpectrumSet.from_arrays(t_stop_names, temperatures, intensities, True)
+
+    assert len(spectra) == 4 and spectra.institute_apparatus
+    np.testing.assert_array_equal(spectra.offsets, [0, 3, 8, 8, 13])
+    assert spectra.values.shape == (13, 2)
+    assert [len(spectrum) for spectrum in spectra] == [3, 5, 0, 5]
+    assert [spectrum.t_stop for spectrum in spectra] == t_stop_names
+    for spectrum, temperature, intensity in zip(spectra, temperatures, intensities):
+        expected = pd.DataFrame({'Temp': temperature, 'Int': intensity}).dropna(how='all').sort_values(by='Temp')
+        np.testing.assert_array_equal(spectrum.temperature, expected['Temp'])
+        np.testing.assert_array_equal(spectrum.intensity, expected['Int'])
+    # Row with only the intensity is kept, missing temperature is sorted to the end
+    np.testing.assert_array_equal(spectra[1].values[-1], [np.nan, 7.0])
+
+
+def test_sort_order_of_sorted_temperatures_is_none():
+    assert SpectrumSet.sort_order(np.array([1.0, 1.0, 2.0])) is None
+    np.testing.assert_array_equal(SpectrumSet.sort_order(np.array([2.0, np.nan, 1.0])), [2, 0, 1])
+
+
+def test_npz_round_trip(tmp_path, ragged_spectra):
+    spectra = SpectrumSet.from_arrays(*ragged_spectra, institute_apparatus=True)
+    path = str(tmp_path / 'Data_set.npz')
+    spectra.save(path)
+    loaded = SpectrumSet.load(path)
+
+    assert loaded.t_stop_names == spectra.t_stop_names
+    assert loaded.institute_apparatus is True
+    np.testing.assert_array_equal(loaded.offsets, spectra.offsets)
+    np.testing.assert_array_equal(loaded.values, spectra.values)
+
+
+def test_data_frames_are_views_of_the_buffer(ragged_spectra):
+    spectra = SpectrumSet.from_arrays(*ragged_spectra)
+    data_frames = spectra.data_frames()
+
+    assert [list(data_frame.columns) for data_frame in data_frames] == [['Temp', 'Int']] * 4
+    assert [len(data_frame) for data_frame in data_frames] == [3, 5, 0, 5]
+    for data_frame, spectrum in zip(data_frames, spectra):
+        assert spectrum.values.base is spectra.values
+        if len(spectrum):
+            assert np.shares_memory(data_frame['Temp'].to_numpy(), spectra.values)
+            np.testing.assert_array_equal(data_frame.to_numpy(), spectrum.values)
+
+
+def test_empty_spectra():
+    spectra = SpectrumSet.from_arrays(['T_stop: 30'], [np.array([])], [np.array([])])
+    assert len(spectra) == 1 and len(spectra[0]) == 0
+    assert spectra.values.shape == (0, 2)
+    data_frame = spectra[0].data_frame()
+    assert data_frame.empty and list(data_frame.columns) == ['Temp', 'Int']
+
+    no_spectra = SpectrumSet.from_arrays([], [], [])
+    assert len(no_spectra) == 0 and no_spectra.data_frames() == []
+    np.testing.assert_array_equal(no_spectra.offsets, [0])
@@ -0,0 +1,108 @@
+import os
+import pytest
+from benchmark import write_intibs_folder, FIRST_PMT, FIRST_HEAT
+from watch_folder import FolderWatcher
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    messages = []
+    watcher = FolderWatcher(str(tmp_path), FIRST_PMT, FIRST_HEAT, 0.5, settle_time=0, callback=messages.append)
+    watcher.messages = messages
+    return watcher
+
+
+def run_queued_updates(watcher):
+    """
+    Runs the worker until the queue is empty
+    """
+    watcher.stop()
+    watcher.worker()
+    watcher.stop_event.clear()
+
+
+def test_poll_queues_complete_files_once(tmp_path, watcher, generated_spectra):
+    assert not watcher.poll()  # Empty folder
+    write_intibs_folder(str(tmp_path), [30.0], generated_spectra[0][4:5], 0.5)
+    assert not watcher.poll()  # Files changed since the previous check
+    assert watcher.poll()
+    assert not watcher.poll()  # The same files are queued already
+    assert watcher.updates.qsize() == 1
+
+
+def test_poll_waits_for_heater_file_and_settle_time(tmp_path, watcher, generated_spectra):
+    write_intibs_folder(str(tmp_path), [30.0], generated_spectra[0][4:5], 0.5)
+    heater_path = str(next(tmp_path.glob(f'{FIRST_HEAT:04d}_*')))
+    os.rename(heater_path, str(tmp_path / 'heater.csv'))
+    watcher.poll()
+    assert not watcher.poll()  # PMT file without its Heater_measured file
+
+    os.rename(str(tmp_path / 'heater.csv'), heater_path)
+    watcher.settle_time = 3600
+    watcher.poll()
+    assert not watcher.poll()
+    watcher.settle_time = 0
+    assert watcher.poll()
+
+
+def test_poll_does_not_queue_more_updates_than_max_queue(tmp_path, watcher, generated_spectra):
+    write_intibs_folder(str(tmp_path), [30.0], generated_spectra[0][4:5], 0.5)
+    watcher.poll()
+    assert watcher.poll()
+    write_intibs_folder(str(tmp_path), [50.0], generated_spectra[0][5:6], 0.5, first_step=1)
+    watcher.poll()
+    assert not watcher.poll()  # One update is waiting, it takes the new files too
+    assert watcher.updates.qsize() == 1
+
+
+def test_failed_update_is_repeated_only_after_files_change(tmp_path, watcher, generated_spectra, monkeypatch):
+    updates = []
+
+    def update():
+        updates.append(len(os.listdir(str(tmp_path))))
+        raise OSError('file is locked')
+
+    monkeypatch.setattr(watcher, 'update', update)
+    write_intibs_folder(str(tmp_path), [30.0], generated_spectra[0][4:5], 0.5)
+    watcher.poll()
+    assert watcher.poll()
+    run_queued_updates(watcher)
+    assert len(updates) == 1 and watcher.messages == ['Update failed (file is locked), waiting for the next change']
+
+    for _ in range(3):
+        assert not watcher.poll()
+    write_intibs_folder(str(tmp_path), [50.0], generated_spectra[0][5:6], 0.5, first_step=1)
+    watcher.poll()
+    assert watcher.poll()
+    run_queued_updates(watcher)
+    assert len(updates) == 2
+
+
+def test_failed_sub_folder_is_analysed_again_only_with_new_t_stops(tmp_path, watcher, generated_spectra,
+                                                                   monkeypatch):
+    data_frames = generated_spectra[0][12:16]
+    write_intibs_folder(str(tmp_path), [30.0], data_frames[:1], 0.5, irradiation=60)
+    write_intibs_folder(str(tmp_path), [30.0], data_frames[1:2], 0.5, irradiation=120, first_step=1)
+    update_data_set = watcher.update_data_set
+    analysed = []
+
+    def failing_update_data_set(data_set_path, spectra):
+        analysed.append(os.path.basename(os.path.dirname(data_set_path)))
+        if analysed[-1] == 'Irradiation_120':
+            raise ValueError('bad spectrum')
+        return update_data_set(data_set_path, spectra)
+
+    monkeypatch.setattr(watcher, 'update_data_set', failing_update_data_set)
+    assert watcher.update() == ['T_stop: 30']
+    assert sorted(analysed) == ['Irradiation_120', 'Irradiation_60']
+    assert watcher.messages[-1].endswith('analysis failed (bad spectrum), waiting for new T_stops')
+
+    analysed.clear()
+    assert watcher.update() == []  # Nothing new, the failed sub folder is not analysed again
+    assert analysed == []
+
+    write_intibs_folder(str(tmp_path), [50.0], data_frames[2:3], 0.5, irradiation=120, first_step=2)
+    monkeypatch.setattr(watcher, 'update_data_set', update_data_set)
+    assert sorted(watcher.update()) == ['T_stop: 30', 'T_stop: 50']
+    assert watcher.failed_data_sets == {}
+    assert len(watcher.summary_data_frames) == 2